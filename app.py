@@ -1,15 +1,59 @@
-from flask import Flask, request, jsonify, render_template
-import asyncio
-import nest_asyncio
-import io
+from flask import Flask, Response, request, jsonify, render_template
+import atexit
+import csv
+import json
 import sys
 import os
-import csv
-from scraper import scrape_ebay_from_csv, scrape_amazon_from_csv
-from utils.config_manager import get_chromium_path
+import threading
+import uuid
+from scraper import (
+    scrape_ebay_from_csv,
+    scrape_amazon_from_csv,
+    stream_ebay_from_csv,
+    stream_amazon_from_csv,
+    scrape_ebay_listings,
+    stream_ebay_listings,
+    scrape_amazon_matrix,
+    stream_amazon_matrix,
+)
+from scraper.identity_pool import identity_pool
+from scraper.jobs import FileScrapeJob, job_manager
+from scraper.logs import get_logger
+from scraper.metrics import registry
+from scraper.resource_governor import resource_governor
+from scraper.result_store import result_store
+from scraper.watchlist import watch_list, watch_monitor
+from scraper.browser_pool import configure_browser_pool, get_browser_pool, shutdown_browser_pool
+from utils.setup_browser import get_chromium_path
+from utils.event_loop import iterate_async, run_coroutine, submit_coroutine
+from utils.request_options import (
+    form_to_options,
+    get_batch_options,
+    get_listing_options,
+    get_matrix_options,
+    parse_job_request,
+    parse_matrix_request,
+    parse_request_urls,
+    parse_upload_request,
+    parse_watch_budget,
+    parse_watch_request,
+)
+from utils.responses import (
+    add_watch_items_body,
+    download_info,
+    error_body,
+    item_history_body,
+    job_body,
+    job_logs_body,
+    job_results_body,
+    latest_snapshots_body,
+    logs_body,
+    upload_body,
+    watch_items_body,
+    watch_monitor_body,
+)
 
-# Allow nested event loops (Flask + asyncio compatibility)
-nest_asyncio.apply()
+log = get_logger(__name__)
 
 # Determine base path for templates and static files
 if getattr(sys, 'frozen', False):  # Running as compiled EXE
@@ -25,8 +69,60 @@ app = Flask(
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-chromium_path = get_chromium_path()
-print("Chromium path is:", chromium_path)
+# Shared browser pool settings (browsers are started once, see start_browser_pool).
+# The Chromium path is resolved when the pool starts, not at import time:
+# under a WSGI server the pool starts lazily on the background loop thread,
+# where get_chromium_path() skips the setup dialog and falls back to
+# Playwright's bundled browser.
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_CONTEXT_USES = int(os.environ.get("BROWSER_MAX_CONTEXT_USES", "50"))
+configure_browser_pool(
+    size=BROWSER_POOL_SIZE,
+    max_context_uses=BROWSER_MAX_CONTEXT_USES,
+)
+
+
+def start_browser_pool():
+    """Launch the pooled browsers on the background loop and close them on exit."""
+    # Resolve on the main thread so the setup dialog (desktop only) can show;
+    # the pool then reuses the cached path
+    log.info("Chromium path resolved", path=get_chromium_path())
+    submit_coroutine(get_browser_pool())
+    atexit.register(lambda: run_coroutine(shutdown_browser_pool(), timeout=30))
+
+
+# Start the watch-list monitor with the app when a budget is configured
+WATCH_BUDGET_PER_HOUR = float(os.environ.get("WATCH_BUDGET_PER_HOUR", "0"))
+_watch_monitor_started = False
+_watch_monitor_lock = threading.Lock()
+
+
+def start_watch_monitor():
+    """Start the watch-list monitor once per process if WATCH_BUDGET_PER_HOUR is set."""
+    global _watch_monitor_started
+    if _watch_monitor_started:
+        return
+    with _watch_monitor_lock:
+        if _watch_monitor_started:
+            return
+        _watch_monitor_started = True
+    if WATCH_BUDGET_PER_HOUR > 0:
+        submit_coroutine(watch_monitor.start(WATCH_BUDGET_PER_HOUR))
+
+
+@app.before_request
+def start_watch_monitor_with_first_request():
+    # Under a WSGI server nothing runs app.py's __main__ block, so the
+    # first request served by the worker starts the monitor
+    start_watch_monitor()
+
+
+# Write any buffered snapshots before the process exits
+atexit.register(result_store.flush)
+
+
+def error(message: str, status: int = 400):
+    return jsonify(error_body(message)), status
 
 
 @app.route("/")
@@ -51,29 +147,59 @@ def health_check():
     return jsonify({"message": "✅ eBay Scraper API is running!"})
 
 
+@app.route("/metrics")
+def metrics():
+    """Per-stage timings and scrape counters in the Prometheus text format."""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/resources")
+def resources():
+    """Memory of the scraper and each pooled browser, pressure level and recycles (see resource_governor.py)."""
+    return jsonify({"status": "success", "resources": resource_governor.status()})
+
+
+@app.route("/identities")
+def identities():
+    """Every proxy identity with its health score, bench state and request counts (see identity_pool.py)."""
+    return jsonify({"status": "success", "identities": identity_pool.status()})
+
+
+@app.route("/logs")
+def logs():
+    """
+    Recent scraper log records, oldest first.
+    Query params: level (minimum, e.g. WARNING), correlationId, limit (max 2000).
+    """
+    return jsonify(logs_body(request.args))
+
+
 @app.route("/scrape-ebay", methods=["POST"])
 def scrape_ebay():
     """
     Accepts a JSON body with a 'urls' field containing a list of eBay URLs.
-    Scrapes them one by one and returns the results as JSON.
+    Optional 'concurrency', 'requestsPerSecond', 'burst' and 'minDelay'
+    override the eBay scheduler limits, 'fastPath' tries plain HTTP
+    before the browser and 'useCache': false bypasses the result cache.
+    'timings': true adds per-stage timings and request blocker stats
+    to freshly scraped items.
+    Duplicate items are scraped once; cache hits have 'cached': true.
+    Returns the results as JSON.
     """
     try:
         data = request.get_json()
-        if not data or "urls" not in data:
-            return jsonify({"status": "error", "message": "No URLs provided"}), 400
-
-        urls = [u.strip() for u in data["urls"] if u.strip()]
-        if not urls:
-            return jsonify({"status": "error", "message": "URL list is empty"}), 400
+        urls, failure = get_request_urls(data)
+        if failure:
+            return failure
 
-        # Run the async scraper directly with URLs
-        results = asyncio.run(scrape_ebay_from_csv(urls))
+        # Run the scraper on the shared background loop (owns the browser pool)
+        results = run_coroutine(scrape_ebay_from_csv(urls, **get_batch_options(data)))
 
         return jsonify({"status": "success", "results": results})
 
     except Exception as e:
-        print("❌ Error:", e)
-        return jsonify({"status": "error", "message": str(e)}), 500
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
 
 
 
@@ -82,26 +208,313 @@ def scrape_amazon():
     """
     Accepts JSON body with a list of URLs.
     Example: { "urls": ["https://amazon.com/dp/B00FR6XR9S", ...] }
+    Accepts the same optional batch options as /scrape-ebay.
     Scrapes them asynchronously and returns the results as JSON.
     """
     try:
         data = request.get_json()
-        if not data or "urls" not in data:
-            return jsonify({"status": "error", "message": "No URLs provided"}), 400
+        urls, failure = get_request_urls(data)
+        if failure:
+            return failure
 
-        urls = [u.strip() for u in data["urls"] if u.strip()]
-        if not urls:
-            return jsonify({"status": "error", "message": "URL list is empty"}), 400
-
-        # Run the async scraper directly
-        results = asyncio.run(scrape_amazon_from_csv(urls))
+        # Run the scraper on the shared background loop (owns the browser pool)
+        results = run_coroutine(scrape_amazon_from_csv(urls, **get_batch_options(data)))
 
         return jsonify({"status": "success", "data": results})
 
     except Exception as e:
-        print("❌ Error:", e)
-        return jsonify({"status": "error", "message": str(e)}), 500
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+
+
+
+def get_request_urls(data):
+    """Return (urls, error_response) for a scrape request body."""
+    urls, message = parse_request_urls(data)
+    if message:
+        return None, error(message)
+    return urls, None
+
+
+def ndjson_response(events):
+    """Stream scraper events as newline-delimited JSON, one line per event."""
+    def generate():
+        try:
+            for event in iterate_async(events):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            log.exception("Stream failed", error=str(e))
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/scrape-ebay/stream", methods=["POST"])
+def scrape_ebay_stream():
+    """
+    Streaming variant of /scrape-ebay (same request body).
+    Responds with NDJSON: one {"type": "result", ...} line per URL as soon
+    as it is scraped, then a final {"type": "summary", ...} line.
+    """
+    data = request.get_json(silent=True)
+    urls, failure = get_request_urls(data)
+    if failure:
+        return failure
+    return ndjson_response(stream_ebay_from_csv(urls, **get_batch_options(data)))
+
+
+@app.route("/scrape-amazon/stream", methods=["POST"])
+def scrape_amazon_stream():
+    """Streaming variant of /scrape-amazon (see /scrape-ebay/stream)."""
+    data = request.get_json(silent=True)
+    urls, failure = get_request_urls(data)
+    if failure:
+        return failure
+    return ndjson_response(stream_amazon_from_csv(urls, **get_batch_options(data)))
+
+
+@app.route("/scrape-ebay/listing", methods=["POST"])
+def scrape_ebay_listing():
+    """
+    Scrape every item card of eBay search or store pages, following the
+    pagination. Body: { "urls": [search/store URLs], "maxPages"?: 10,
+    "detailFields"?: ["stockCount"] } plus the batch options of /scrape-ebay.
+    Items missing a detailFields field are also scraped from their /itm/ page.
+    """
+    data = request.get_json(silent=True)
+    urls, failure = get_request_urls(data)
+    if failure:
+        return failure
+    try:
+        results = run_coroutine(scrape_ebay_listings(urls, **get_listing_options(data)))
+        return jsonify({"status": "success", "results": results})
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+
+
+@app.route("/scrape-ebay/listing/stream", methods=["POST"])
+def scrape_ebay_listing_stream():
+    """
+    Streaming variant of /scrape-ebay/listing: NDJSON with one "page" line
+    per results page (its new items), one "item" line per detail scrape,
+    then a "summary" line.
+    """
+    data = request.get_json(silent=True)
+    urls, failure = get_request_urls(data)
+    if failure:
+        return failure
+    return ndjson_response(stream_ebay_listings(urls, **get_listing_options(data)))
+
+
+@app.route("/scrape-amazon/matrix", methods=["POST"])
+def scrape_amazon_matrix_route():
+    """
+    Regional sweep: every ASIN in every ZIP code. Body: { "asins": [ASINs
+    or product URLs], "zipCodes": ["10001", "94105"], "zipConcurrency"?: 4 }
+    plus the batch options of /scrape-amazon. Returns an item x region
+    table; each cell records the ZIP the page was actually priced for.
+    """
+    data = request.get_json(silent=True)
+    items, zip_codes, message = parse_matrix_request(data)
+    if message:
+        return error(message)
+    try:
+        results = run_coroutine(scrape_amazon_matrix(items, zip_codes, **get_matrix_options(data)))
+        return jsonify({"status": "success", "results": results})
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+
+
+@app.route("/scrape-amazon/matrix/stream", methods=["POST"])
+def scrape_amazon_matrix_stream():
+    """Streaming variant of /scrape-amazon/matrix: NDJSON with one "cell" line per item and ZIP, then a "summary" line."""
+    data = request.get_json(silent=True)
+    items, zip_codes, message = parse_matrix_request(data)
+    if message:
+        return error(message)
+    return ndjson_response(stream_amazon_matrix(items, zip_codes, **get_matrix_options(data)))
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Submit a scrape job and return immediately with its id.
+    Body: { "site": "ebay" | "amazon", "urls": [...], "zipCode"?: "75007" }
+    plus the optional batch options accepted by /scrape-ebay.
+    """
+    site, urls, options, message = parse_job_request(request.get_json(silent=True))
+    if message:
+        return error(message)
+    job = run_coroutine(job_manager.submit(site, urls, **options))
+    return jsonify(job_body(job)), 202
+
+
+@app.route("/upload", methods=["POST"])
+def upload_csv():
+    """
+    Scrape every URL in an uploaded CSV as a background job.
+    Multipart form: file (CSV, one URL per row or a "url" column),
+    site ("ebay" | "amazon"), zipCode?, format? ("csv" | "jsonl"),
+    column?, chunkSize?, plus the optional batch options of /scrape-ebay.
+
+    Results are written to disk as they finish; download them (also while
+    the job is running) from /jobs/<id>/download. The uploaded CSV is
+    deleted when the job finishes, the results file when the job is pruned
+    (see MAX_FINISHED_JOBS and FINISHED_JOB_TTL in scraper/jobs.py).
+    """
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return error("No CSV file uploaded")
+    site, fmt, options, message = parse_upload_request(form_to_options(request.form))
+    if message:
+        return error(message)
+
+    upload_id = uuid.uuid4().hex
+    input_path = os.path.join(UPLOAD_FOLDER, f"{upload_id}.csv")
+    output_path = os.path.join(UPLOAD_FOLDER, f"{upload_id}_results.{fmt}")
+    try:
+        # Werkzeug spools large uploads to a temp file; save() copies it in chunks
+        upload.save(input_path)
+        job = run_coroutine(job_manager.submit_file(site, input_path, output_path, fmt=fmt, **options))
+    except (ValueError, csv.Error) as e:
+        # Not text, or not CSV (submit_file removes the saved upload)
+        log.warning("Rejected upload", filename=upload.filename, error=str(e))
+        return error(f"Could not read the CSV file: {e}")
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+    return jsonify(upload_body(job)), 202
+
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+def download_job_results(job_id):
+    """The results file of an /upload job; partial while the job is still running."""
+    job = job_manager.get(job_id)
+    if job is None or not isinstance(job, FileScrapeJob):
+        return error("Job not found", 404)
+    info = download_info(job)
+    if info is None:
+        return error("No results yet", 404)
+    # The file keeps growing while the job runs: send what is there right now
+    size, mimetype, headers = info
+
+    def generate():
+        remaining = size
+        with open(job.output_path, "rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return Response(generate(), mimetype=mimetype, headers=headers)
+
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"status": "success", "jobs": job_manager.list_jobs()})
+
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_progress(job_id):
+    """Progress of a job: done/failed/remaining counts and an ETA."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_body(job))
+
+
+@app.route("/jobs/<job_id>/results", methods=["GET"])
+def job_results(job_id):
+    """Results collected so far; '?offset=N' skips results already fetched."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_results_body(job, request.args))
+
+
+@app.route("/jobs/<job_id>/logs", methods=["GET"])
+def job_logs(job_id):
+    """The job's recent log records (bounded ring buffer); same query params as /logs."""
+    if job_manager.get(job_id) is None:
+        return error("Job not found", 404)
+    return jsonify(job_logs_body(job_id, request.args))
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = run_coroutine(job_manager.cancel(job_id))
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_body(job))
+
+
+@app.route("/history/latest", methods=["GET"])
+def latest_snapshots():
+    """
+    Latest stored snapshot per item, newest first, without re-scraping.
+    Query params: site, zipCode, limit (max 1000), offset.
+    """
+    return jsonify(latest_snapshots_body(request.args))
+
+
+@app.route("/history/<site>/<item_id>", methods=["GET"])
+def item_history(site, item_id):
+    """
+    Price/stock history of one item, newest first.
+    Query params: zipCode, limit (max 5000), includeFailed.
+    """
+    return jsonify(item_history_body(site, item_id, request.args))
+
+
+@app.route("/watch", methods=["POST"])
+def add_watch_items():
+    """
+    Add items to the watch list.
+    Body: { "site": "ebay" | "amazon", "urls": [...], "zipCode"?: "75007",
+            "minInterval"?: seconds, "maxInterval"?: seconds }
+    maxInterval is the freshness budget: the longest an item may go unchecked.
+    """
+    data = request.get_json(silent=True)
+    site, urls, message = parse_watch_request(data)
+    if message:
+        return error(message)
+    return jsonify(add_watch_items_body(site, urls, data))
+
+
+@app.route("/watch", methods=["GET"])
+def list_watch_items():
+    """Watched items, soonest due first. Query params: site, limit (max 1000), offset."""
+    return jsonify(watch_items_body(request.args))
+
+
+@app.route("/watch/<site>/<item_id>", methods=["DELETE"])
+def remove_watch_item(site, item_id):
+    """Stop watching an item. Query param: zipCode (Amazon, defaults to 75007)."""
+    zip_code = request.args.get("zipCode", "75007" if site == "amazon" else "")
+    if not watch_list.remove(site, item_id, zip_code):
+        return error("Item is not watched", 404)
+    return jsonify({"status": "success"})
+
+
+@app.route("/watch/monitor", methods=["GET", "POST"])
+def watch_monitor_settings():
+    """
+    GET: monitor status. POST { "budgetPerHour": 120 } starts the monitor
+    (or changes its budget); a budget of 0 stops it.
+    """
+    if request.method == "POST":
+        budget, message = parse_watch_budget(request.get_json(silent=True))
+        if message:
+            return error(message)
+        if budget > 0:
+            run_coroutine(watch_monitor.start(budget))
+        else:
+            run_coroutine(watch_monitor.stop())
+    return jsonify(watch_monitor_body())
 
 
 if __name__ == "__main__":
@@ -113,4 +526,9 @@ if __name__ == "__main__":
 
     # # Open browser shortly after server starts
     # Timer(1.5, lambda: webbrowser.open(url)).start()
+
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_browser_pool()
+        start_watch_monitor()
     app.run(debug=True)
@@ -0,0 +1,502 @@
+"""
+ASGI serving mode: the same routes as app.py, but every request runs as a
+task on the server's event loop instead of blocking a thread.
+
+All requests share one browser pool, result cache, rate limiters and job
+manager, so many simultaneous /scrape-* calls cost a coroutine each, not a
+thread each. Scrape requests past ASGI_MAX_ACTIVE_SCRAPES get a 503 with
+Retry-After instead of piling up in memory, and the non-streaming routes
+accept at most ASGI_MAX_URLS_PER_REQUEST URLs (use the /stream routes,
+/jobs or /upload for bigger lists). Request parsing and response bodies
+come from utils/request_options.py and utils/responses.py, shared with
+app.py; only admission and the async transport live here.
+
+    python asgi_app.py --port 8000
+    hypercorn asgi_app:app --bind 0.0.0.0:8000
+
+Run a single worker process: the shared runtime lives in the process.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import uuid
+from quart import Quart, Response, jsonify, render_template, request
+from scraper import (
+    scrape_ebay_from_csv,
+    scrape_amazon_from_csv,
+    stream_ebay_from_csv,
+    stream_amazon_from_csv,
+    scrape_ebay_listings,
+    stream_ebay_listings,
+    scrape_amazon_matrix,
+    stream_amazon_matrix,
+)
+from scraper.browser_pool import configure_browser_pool, get_browser_pool, shutdown_browser_pool
+from scraper.http_fast_path import close_http_client
+from scraper.identity_pool import identity_pool
+from scraper.jobs import FileScrapeJob, job_manager
+from scraper.logs import get_logger
+from scraper.metrics import registry
+from scraper.resource_governor import resource_governor
+from scraper.result_store import result_store
+from scraper.watchlist import watch_list, watch_monitor
+from utils.request_options import (
+    form_to_options,
+    get_batch_options,
+    get_listing_options,
+    get_matrix_options,
+    parse_job_request,
+    parse_matrix_request,
+    parse_request_urls,
+    parse_upload_request,
+    parse_watch_budget,
+    parse_watch_request,
+)
+from utils.responses import (
+    add_watch_items_body,
+    download_info,
+    error_body,
+    item_history_body,
+    job_body,
+    job_logs_body,
+    job_results_body,
+    latest_snapshots_body,
+    logs_body,
+    upload_body,
+    watch_items_body,
+    watch_monitor_body,
+)
+from utils.setup_browser import get_chromium_path
+
+log = get_logger(__name__)
+
+if getattr(sys, 'frozen', False):  # Running as compiled EXE
+    base_path = sys._MEIPASS
+else:
+    base_path = os.path.abspath(".")
+
+app = Quart(
+    __name__,
+    template_folder=os.path.join(base_path, "templates"),
+    static_folder=os.path.join(base_path, "static")
+)
+# Scrapes and streams run as long as they need; uploads are spooled to disk
+app.config["RESPONSE_TIMEOUT"] = None
+app.config["BODY_TIMEOUT"] = None
+app.config["MAX_CONTENT_LENGTH"] = None
+
+UPLOAD_FOLDER = "uploads"
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_CONTEXT_USES = int(os.environ.get("BROWSER_MAX_CONTEXT_USES", "50"))
+configure_browser_pool(
+    size=BROWSER_POOL_SIZE,
+    max_context_uses=BROWSER_MAX_CONTEXT_USES,
+)
+
+MAX_ACTIVE_SCRAPES = int(os.environ.get("ASGI_MAX_ACTIVE_SCRAPES", "64"))
+MAX_URLS_PER_REQUEST = int(os.environ.get("ASGI_MAX_URLS_PER_REQUEST", "1000"))
+WATCH_BUDGET_PER_HOUR = float(os.environ.get("WATCH_BUDGET_PER_HOUR", "0"))
+
+
+class ScrapeAdmission:
+    """
+    Counts scrape requests in flight. Past the limit new ones are turned
+    away at once; the ones admitted share the scheduler's global page slots.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+
+    def has_room(self) -> bool:
+        """Whether try_enter() would succeed now (counts a rejection if not)."""
+        if self.active >= self.limit:
+            self.rejected += 1
+            return False
+        return True
+
+    def try_enter(self) -> bool:
+        if not self.has_room():
+            return False
+        self.active += 1
+        return True
+
+    def leave(self):
+        self.active -= 1
+
+
+admission = ScrapeAdmission(MAX_ACTIVE_SCRAPES)
+_warmup = None
+
+
+def error(message: str, status: int = 400, headers: dict = None):
+    return jsonify(error_body(message)), status, headers or {}
+
+
+def busy():
+    return error("Server busy, retry later", 503, {"Retry-After": "5"})
+
+
+def _log_warmup_failure(task: asyncio.Task):
+    # Retrieve the exception so it isn't lost; the pool retries on first use
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("Browser pool warm-up failed", error=str(task.exception()))
+
+
+@app.before_serving
+async def startup():
+    """Resolve Chromium off the loop and start the pooled browsers in the background."""
+    global _warmup
+    log.info("Chromium path resolved", path=await asyncio.to_thread(get_chromium_path))
+    _warmup = asyncio.get_running_loop().create_task(get_browser_pool())
+    _warmup.add_done_callback(_log_warmup_failure)
+    if WATCH_BUDGET_PER_HOUR > 0:
+        await watch_monitor.start(WATCH_BUDGET_PER_HOUR)
+
+
+@app.after_serving
+async def shutdown():
+    await watch_monitor.stop()
+    await resource_governor.stop()
+    await shutdown_browser_pool()
+    await close_http_client()
+    await result_store.flush_async()
+
+
+@app.route("/")
+async def index():
+    return await render_template("index.html")
+
+
+@app.route("/ebay")
+async def ebay_page():
+    return await render_template("ebay.html")
+
+
+@app.route("/amazon")
+async def amazon_page():
+    return await render_template("amazon.html")
+
+
+@app.route("/health")
+async def health_check():
+    return jsonify({
+        "message": "✅ eBay Scraper API is running!",
+        "activeScrapes": admission.active,
+        "rejectedScrapes": admission.rejected,
+    })
+
+
+@app.route("/metrics")
+async def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/resources")
+async def resources():
+    return jsonify({"status": "success", "resources": resource_governor.status()})
+
+
+@app.route("/identities")
+async def identities():
+    return jsonify({"status": "success", "identities": identity_pool.status()})
+
+
+@app.route("/logs")
+async def logs():
+    """Same query params and response as app.py's /logs."""
+    return jsonify(logs_body(request.args))
+
+
+async def run_scrape(scrape, data, get_options):
+    """Shared body of the non-streaming scrape routes: (results, error_response)."""
+    urls, message = parse_request_urls(data)
+    if message:
+        return None, error(message)
+    if len(urls) > MAX_URLS_PER_REQUEST:
+        return None, error(
+            f"At most {MAX_URLS_PER_REQUEST} URLs per request; use the /stream route, /jobs or /upload"
+        )
+    if not admission.try_enter():
+        return None, busy()
+    try:
+        return await scrape(urls, **get_options(data)), None
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return None, error(str(e), 500)
+    finally:
+        admission.leave()
+
+
+@app.route("/scrape-ebay", methods=["POST"])
+async def scrape_ebay():
+    """Same body and response as app.py's /scrape-ebay."""
+    data = await request.get_json(silent=True)
+    results, failure = await run_scrape(scrape_ebay_from_csv, data, get_batch_options)
+    return failure or jsonify({"status": "success", "results": results})
+
+
+@app.route("/scrape-amazon", methods=["POST"])
+async def scrape_amazon():
+    """Same body and response as app.py's /scrape-amazon."""
+    data = await request.get_json(silent=True)
+    results, failure = await run_scrape(scrape_amazon_from_csv, data, get_batch_options)
+    return failure or jsonify({"status": "success", "data": results})
+
+
+@app.route("/scrape-ebay/listing", methods=["POST"])
+async def scrape_ebay_listing():
+    """Same body and response as app.py's /scrape-ebay/listing."""
+    data = await request.get_json(silent=True)
+    results, failure = await run_scrape(scrape_ebay_listings, data, get_listing_options)
+    return failure or jsonify({"status": "success", "results": results})
+
+
+def ndjson_response(events):
+    """
+    Stream scraper events as NDJSON. The admission slot is taken when the
+    body starts and freed when it ends, so a response that is never sent
+    holds none.
+    """
+    async def generate():
+        if not admission.try_enter():
+            # Filled up between the route's has_room() check and the body starting
+            await events.aclose()
+            yield (json.dumps({"type": "error", "message": "Server busy, retry later"}) + "\n").encode("utf-8")
+            return
+        try:
+            async for event in events:
+                yield (json.dumps(event) + "\n").encode("utf-8")
+        except Exception as e:
+            log.exception("Stream failed", error=str(e))
+            yield (json.dumps({"type": "error", "message": str(e)}) + "\n").encode("utf-8")
+        finally:
+            # Also runs when the client disconnects mid-stream
+            await events.aclose()
+            admission.leave()
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+async def stream_route(stream, get_options):
+    data = await request.get_json(silent=True)
+    urls, message = parse_request_urls(data)
+    if message:
+        return error(message)
+    if not admission.has_room():
+        return busy()
+    return ndjson_response(stream(urls, **get_options(data)))
+
+
+@app.route("/scrape-ebay/stream", methods=["POST"])
+async def scrape_ebay_stream():
+    return await stream_route(stream_ebay_from_csv, get_batch_options)
+
+
+@app.route("/scrape-amazon/stream", methods=["POST"])
+async def scrape_amazon_stream():
+    return await stream_route(stream_amazon_from_csv, get_batch_options)
+
+
+@app.route("/scrape-ebay/listing/stream", methods=["POST"])
+async def scrape_ebay_listing_stream():
+    return await stream_route(stream_ebay_listings, get_listing_options)
+
+
+@app.route("/scrape-amazon/matrix", methods=["POST"])
+async def scrape_amazon_matrix_route():
+    """Same body and response as app.py's /scrape-amazon/matrix."""
+    data = await request.get_json(silent=True)
+    items, zip_codes, message = parse_matrix_request(data)
+    if message:
+        return error(message)
+    if len(items) * len(zip_codes) > MAX_URLS_PER_REQUEST:
+        return error(f"At most {MAX_URLS_PER_REQUEST} cells per request; use /scrape-amazon/matrix/stream")
+    if not admission.try_enter():
+        return busy()
+    try:
+        results = await scrape_amazon_matrix(items, zip_codes, **get_matrix_options(data))
+        return jsonify({"status": "success", "results": results})
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+    finally:
+        admission.leave()
+
+
+@app.route("/scrape-amazon/matrix/stream", methods=["POST"])
+async def scrape_amazon_matrix_stream():
+    data = await request.get_json(silent=True)
+    items, zip_codes, message = parse_matrix_request(data)
+    if message:
+        return error(message)
+    if not admission.has_room():
+        return busy()
+    return ndjson_response(stream_amazon_matrix(items, zip_codes, **get_matrix_options(data)))
+
+
+@app.route("/jobs", methods=["POST"])
+async def submit_job():
+    """Same body and response as app.py's POST /jobs."""
+    site, urls, options, message = parse_job_request(await request.get_json(silent=True))
+    if message:
+        return error(message)
+    job = await job_manager.submit(site, urls, **options)
+    return jsonify(job_body(job)), 202
+
+
+@app.route("/upload", methods=["POST"])
+async def upload_csv():
+    """Same form fields and response as app.py's /upload."""
+    files = await request.files
+    upload = files.get("file")
+    if upload is None or not upload.filename:
+        return error("No CSV file uploaded")
+
+    site, fmt, options, message = parse_upload_request(form_to_options(await request.form))
+    if message:
+        return error(message)
+
+    upload_id = uuid.uuid4().hex
+    input_path = os.path.join(UPLOAD_FOLDER, f"{upload_id}.csv")
+    output_path = os.path.join(UPLOAD_FOLDER, f"{upload_id}_results.{fmt}")
+    try:
+        await upload.save(input_path)
+        job = await job_manager.submit_file(site, input_path, output_path, fmt=fmt, **options)
+    except (ValueError, csv.Error) as e:
+        # Not text, or not CSV (submit_file removes the saved upload)
+        log.warning("Rejected upload", filename=upload.filename, error=str(e))
+        return error(f"Could not read the CSV file: {e}")
+    except Exception as e:
+        log.exception("Request failed", route=request.path, error=str(e))
+        return error(str(e), 500)
+    return jsonify(upload_body(job)), 202
+
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+async def download_job_results(job_id):
+    """The results file of an /upload job; partial while the job is still running."""
+    job = job_manager.get(job_id)
+    if job is None or not isinstance(job, FileScrapeJob):
+        return error("Job not found", 404)
+    info = await asyncio.to_thread(download_info, job)
+    if info is None:
+        return error("No results yet", 404)
+    size, mimetype, headers = info
+
+    async def generate():
+        remaining = size
+        with open(job.output_path, "rb") as f:
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return Response(generate(), mimetype=mimetype, headers=headers)
+
+
+@app.route("/jobs", methods=["GET"])
+async def list_jobs():
+    return jsonify({"status": "success", "jobs": job_manager.list_jobs()})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def job_progress(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_body(job))
+
+
+@app.route("/jobs/<job_id>/results", methods=["GET"])
+async def job_results(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_results_body(job, request.args))
+
+
+@app.route("/jobs/<job_id>/logs", methods=["GET"])
+async def job_logs(job_id):
+    if job_manager.get(job_id) is None:
+        return error("Job not found", 404)
+    return jsonify(job_logs_body(job_id, request.args))
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+async def cancel_job(job_id):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        return error("Job not found", 404)
+    return jsonify(job_body(job))
+
+
+# SQLite reads run in a thread so they never stall the shared loop
+
+@app.route("/history/latest", methods=["GET"])
+async def latest_snapshots():
+    return jsonify(await asyncio.to_thread(latest_snapshots_body, request.args))
+
+
+@app.route("/history/<site>/<item_id>", methods=["GET"])
+async def item_history(site, item_id):
+    return jsonify(await asyncio.to_thread(item_history_body, site, item_id, request.args))
+
+
+@app.route("/watch", methods=["POST"])
+async def add_watch_items():
+    """Same body and response as app.py's POST /watch."""
+    data = await request.get_json(silent=True)
+    site, urls, message = parse_watch_request(data)
+    if message:
+        return error(message)
+    return jsonify(await asyncio.to_thread(add_watch_items_body, site, urls, data))
+
+
+@app.route("/watch", methods=["GET"])
+async def list_watch_items():
+    return jsonify(await asyncio.to_thread(watch_items_body, request.args))
+
+
+@app.route("/watch/<site>/<item_id>", methods=["DELETE"])
+async def remove_watch_item(site, item_id):
+    zip_code = request.args.get("zipCode", "75007" if site == "amazon" else "")
+    if not await asyncio.to_thread(watch_list.remove, site, item_id, zip_code):
+        return error("Item is not watched", 404)
+    return jsonify({"status": "success"})
+
+
+@app.route("/watch/monitor", methods=["GET", "POST"])
+async def watch_monitor_settings():
+    if request.method == "POST":
+        budget, message = parse_watch_budget(await request.get_json(silent=True))
+        if message:
+            return error(message)
+        if budget > 0:
+            await watch_monitor.start(budget)
+        else:
+            await watch_monitor.stop()
+    return jsonify(watch_monitor_body())
+
+
+if __name__ == "__main__":
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    parser = argparse.ArgumentParser(description="Serve the scraper API on one shared event loop.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    asyncio.run(serve(app, config))
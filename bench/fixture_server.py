@@ -0,0 +1,208 @@
+"""
+Local stand-in for eBay and Amazon product pages, used by the benchmarks.
+
+    python -m bench.fixture_server --port 8765 --latency-ms 50
+
+Routes:
+    /itm/<item id>          eBay item page
+    /sch/i.html?_nkw=<q>    eBay search results, LISTING_TOTAL items over
+                            pages of `_ipg` (default 60); page `_pgn`
+    /dp/<ASIN>              Amazon product page with the GLUX location modal;
+                            the delivery ZIP is kept in a cookie
+    /errors/validateCaptcha "Continue shopping" interstitial target
+    /img/*, /static/*       heavy assets the request blocker should drop
+
+Item data (title, price, stock) is derived from the item id, so every run
+sees the same pages. Requests that came through one of `blocked_proxies`
+(named in the Via header, see proxy_server.py) get eBay's captcha page or
+Amazon's interstitial every time, like a flagged IP.
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, urlparse
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+IMAGE_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 60 * 1024
+LISTING_TOTAL = 150
+STYLESHEET = b"body { font-family: Arial, sans-serif; } .a-offscreen { position: absolute; left: -9999px; }"
+
+
+def _load_page(name: str) -> str:
+    with open(os.path.join(PAGES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _render(template: str, **values) -> bytes:
+    for key, value in values.items():
+        template = template.replace("{{" + key + "}}", str(value))
+    return template.encode("utf-8")
+
+
+def item_values(item_id: str) -> dict:
+    """Deterministic fake product data for an item id."""
+    digest = int(hashlib.md5(item_id.encode()).hexdigest(), 16)
+    price = 5 + (digest % 20000) / 100
+    return {
+        "title": f"Benchmark Product {item_id}",
+        "price": f"{price:.2f}",
+        "list_price": f"{price * 1.25:.2f}",
+        "stock": 1 + digest % 40,
+    }
+
+
+def listing_item_id(query: str, position: int) -> str:
+    """Deterministic 12-digit item id for the `position`-th result of a search."""
+    digest = int(hashlib.md5(f"{query}:{position}".encode()).hexdigest(), 16)
+    return str(100000000000 + digest % 900000000000)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "FixtureServer/1.0"
+    latency = 0.0
+    interstitial_every = 0
+    blocked_proxies = frozenset()
+    templates = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _cookies(self) -> dict:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return {key: morsel.value for key, morsel in cookie.items()}
+
+    def _via_blocked_proxy(self) -> bool:
+        via = self.headers.get("Via", "")
+        return any(hop.split()[-1] in self.blocked_proxies for hop in via.split(",") if hop.strip())
+
+    def _send(self, body: bytes, content_type: str, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+
+        if parts[:1] == ["img"]:
+            return self._send(IMAGE_BYTES, "image/jpeg")
+        if parts[:1] == ["static"]:
+            return self._send(STYLESHEET, "text/css")
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if len(parts) >= 2 and parts[0] == "itm":
+            if self._via_blocked_proxy():
+                return self._send(self.templates["ebay_captcha"].encode("utf-8"), "text/html; charset=utf-8")
+            item_id = parts[-1]
+            body = _render(self.templates["ebay"], item_id=item_id, **item_values(item_id))
+            return self._send(body, "text/html; charset=utf-8")
+
+        if len(parts) >= 2 and parts[-2] == "dp":
+            return self._amazon_product(parts[-1], parsed.path)
+
+        if parts[:1] == ["sch"]:
+            return self._ebay_search(parse_qs(parsed.query))
+
+        if parsed.path == "/errors/validateCaptcha":
+            next_path = parse_qs(parsed.query).get("next", ["/"])[0]
+            return self._send(b"", "text/html", status=302, headers={
+                "Location": next_path,
+                "Set-Cookie": "bench-continue=1; Path=/",
+            })
+
+        self._send(b"Not found", "text/plain", status=404)
+
+    def _ebay_search(self, query: dict):
+        keywords = query.get("_nkw", ["item"])[0]
+        per_page = int(query.get("_ipg", ["60"])[0])
+        page = int(query.get("_pgn", ["1"])[0])
+        start = (page - 1) * per_page
+        cards = []
+        for position in range(start, min(start + per_page, LISTING_TOTAL)):
+            item_id = listing_item_id(keywords, position)
+            values = item_values(item_id)
+            cards.append(
+                f'      <li class="s-item"><a class="s-item__link" href="/itm/{item_id}?hash=item{position}">'
+                f'<div class="s-item__title"><span role="heading">{values["title"]}</span></div></a>'
+                f'<span class="s-item__price">${values["price"]}</span></li>'
+            )
+        next_link = ""
+        if start + per_page < LISTING_TOTAL:
+            next_link = (
+                f'      <a class="pagination__next" type="next" '
+                f'href="/sch/i.html?_nkw={quote_plus(keywords)}&amp;_ipg={per_page}&amp;_pgn={page + 1}">Next page</a>'
+            )
+        body = _render(
+            self.templates["ebay_search"],
+            query=keywords,
+            total=LISTING_TOTAL,
+            cards="\n".join(cards),
+            next=next_link,
+        )
+        self._send(body, "text/html; charset=utf-8")
+
+    def _amazon_product(self, asin: str, path: str):
+        cookies = self._cookies()
+        digest = int(hashlib.md5(asin.encode()).hexdigest(), 16)
+        flagged = self._via_blocked_proxy()
+        if flagged or (
+            self.interstitial_every and "bench-continue" not in cookies and digest % self.interstitial_every == 0
+        ):
+            body = _render(self.templates["amazon_interstitial"], next=path)
+            return self._send(body, "text/html; charset=utf-8")
+
+        zip_code = cookies.get("bench-zip")
+        location = f"Dallas {zip_code}" if zip_code else "Update location"
+        body = _render(self.templates["amazon"], asin=asin, location=location, **item_values(asin))
+        self._send(body, "text/html; charset=utf-8")
+
+
+def start_fixture_server(port: int = 0, latency_ms: float = 0, interstitial_every: int = 0, blocked_proxies=()):
+    """
+    Start the fixture server in a daemon thread.
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    handler = type("BoundFixtureHandler", (FixtureHandler,), {
+        "latency": latency_ms / 1000,
+        "interstitial_every": interstitial_every,
+        "blocked_proxies": frozenset(blocked_proxies),
+        "templates": {
+            "ebay": _load_page("ebay_item.html"),
+            "ebay_search": _load_page("ebay_search.html"),
+            "ebay_captcha": _load_page("ebay_captcha.html"),
+            "amazon": _load_page("amazon_product.html"),
+            "amazon_interstitial": _load_page("amazon_interstitial.html"),
+        },
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded eBay/Amazon pages locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every HTML response")
+    parser.add_argument("--interstitial-every", type=int, default=0,
+                        help="show 'Continue shopping' for roughly 1 in N Amazon items (0 = never)")
+    parser.add_argument("--blocked-proxy", action="append", default=[],
+                        help="serve captchas to requests via this proxy name (repeatable)")
+    args = parser.parse_args()
+    server, base_url = start_fixture_server(args.port, args.latency_ms, args.interstitial_every, args.blocked_proxy)
+    print(f"✅ Fixture server running at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,143 @@
+"""
+Identity pool test with local stand-in proxies.
+
+    python -m bench.identity --proxies 4 --blocked 1 --urls 200
+    python -m bench.identity --mode browser --proxies 3 --blocked 1
+
+Starts `--proxies` local proxies (proxy_server.py) and the fixture server,
+which treats the first `--blocked` proxies as flagged IPs and serves them
+captchas. One identity per proxy (each with its own user agent, `--rps`
+budget and `--concurrency` cap) then scrapes `--urls` eBay fixture
+items. The report gives URLs/sec and, per identity, its requests,
+successes, captchas, health and benches. Exits non-zero when a flagged identity was never benched or
+carried more than its fair share of the requests.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Keep test runs out of the real history database and ZIP session cache
+os.environ.setdefault("STORE_RESULTS", "0")
+os.environ.setdefault("AMAZON_SESSION_DIR", tempfile.mkdtemp(prefix="identity-sessions-"))
+
+from bench.fixture_server import start_fixture_server  # noqa: E402
+from bench.proxy_server import start_proxy_server  # noqa: E402
+from bench.run_bench import RESULTS_DIR, git_commit, make_urls  # noqa: E402
+from scraper.browser_pool import configure_browser_pool, shutdown_browser_pool  # noqa: E402
+from scraper.ebay_scraper import scrape_ebay, scrape_ebay_fast  # noqa: E402
+from scraper.http_fast_path import close_http_client  # noqa: E402
+from scraper.identity_pool import configure_identities  # noqa: E402
+from scraper.scheduler import run_scrape_batch  # noqa: E402
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0",
+]
+
+
+async def run_identities(args, base_url: str) -> dict:
+    urls = make_urls(base_url, "ebay", args.urls)
+    started = time.perf_counter()
+    summary = await run_scrape_batch(
+        urls,
+        scrape_ebay_fast if args.mode == "fast" else scrape_ebay,
+        "ebay",
+        use_cache=False,
+        concurrency=args.concurrency * args.proxies,
+        max_retries=args.max_retries,
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsedSeconds": round(elapsed, 3),
+        "urlsPerSecond": round(summary["successfulScrapes"] / elapsed, 3) if elapsed else None,
+        "successfulScrapes": summary["successfulScrapes"],
+        "failedScrapes": summary["failedScrapes"],
+        "retries": summary["retries"],
+        "failureReasons": summary["failureReasons"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spread scrapes over local proxy identities, some of them flagged.")
+    parser.add_argument("--mode", choices=["fast", "browser"], default="fast")
+    parser.add_argument("--proxies", type=int, default=4)
+    parser.add_argument("--blocked", type=int, default=1, help="how many of the proxies get captchas")
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--rps", type=float, default=5, help="rate budget of each identity")
+    parser.add_argument("--concurrency", type=int, default=2, help="requests in flight per identity")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--output", help="report path (default: bench/results/identities-<mode>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    proxies = [start_proxy_server(f"proxy-{i}") for i in range(args.proxies)]
+    blocked = {f"proxy-{i}" for i in range(min(args.blocked, args.proxies))}
+    fixtures, base_url = start_fixture_server(0, args.latency_ms, blocked_proxies=blocked)
+    pool = configure_identities([
+        {
+            "name": f"id-{i}",
+            "proxy": proxy_url,
+            "userAgent": USER_AGENTS[i % len(USER_AGENTS)],
+            "requestsPerSecond": args.rps,
+            "burst": 1,
+            "minDelay": 0,
+            "concurrency": args.concurrency,
+        }
+        for i, (_, proxy_url) in enumerate(proxies)
+    ])
+    # Without this Chromium would reach the loopback fixture server directly
+    configure_browser_pool(launch_args=["--headless=new", "--proxy-bypass-list=<-loopback>"])
+
+    async def run():
+        try:
+            return await run_identities(args, base_url)
+        finally:
+            await shutdown_browser_pool()
+            await close_http_client()
+
+    try:
+        metrics = asyncio.run(run())
+    finally:
+        fixtures.shutdown()
+        for server, _ in proxies:
+            server.shutdown()
+
+    identities = pool.status()
+    for identity, (server, _) in zip(identities, proxies):
+        identity["flagged"] = server.name in blocked
+        identity["proxyRequests"] = server.requests
+    metrics["identities"] = identities
+
+    fair_share = args.urls / max(1, args.proxies)
+    problems = [
+        f"{identity['name']} was flagged but never benched" if not identity["benches"]
+        else f"{identity['name']} was flagged but got {identity['requests']} requests (fair share {fair_share:.0f})"
+        for identity in identities
+        if identity["flagged"] and (not identity["benches"] or identity["requests"] > fair_share)
+    ]
+
+    report = {"timestamp": time.time(), "commit": git_commit(), "params": vars(args), "metrics": metrics}
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"identities-{args.mode}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(metrics, indent=2))
+    print(f"✅ Report written to {output}")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Load test of the HTTP API against the local fixture server.
+
+    python -m bench.load --clients 100 --requests 500
+    python -m bench.load --endpoint stream --urls-per-request 20
+    python -m bench.load --target http://127.0.0.1:5000   # an already running server (HOST_RATE_LIMITS=0)
+
+Starts the fixture pages and, unless --target is given, the ASGI app
+(asgi_app.py) in a subprocess. `--clients` concurrent clients then send
+`--requests` scrape calls in total, each for `--urls-per-request` items
+drawn from `--distinct-items` fixture items. Reports requests/sec,
+URLs/sec, per-request latency percentiles, status codes (503 = turned
+away by the server's admission limit) and the server's peak RSS (its
+browsers included).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+import psutil
+from bench.fixture_server import start_fixture_server
+from bench.run_bench import RESULTS_DIR, git_commit, percentile, tree_rss
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_asgi_server(port: int) -> subprocess.Popen:
+    # Request options can't raise the shared per-host rate limits, so turn them off
+    env = dict(os.environ, STORE_RESULTS="0", HOST_RATE_LIMITS="0", SCRAPER_NO_GUI="1", PYTHONUNBUFFERED="1")
+    return subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_DIR, "asgi_app.py"), "--port", str(port)],
+        cwd=PROJECT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient, target: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{target}/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {target} did not come up within {timeout:.0f}s")
+
+
+async def run_load(args, target: str, base_url: str, server_pid=None) -> dict:
+    items = [f"{base_url}/itm/{256100000000 + i}" for i in range(args.distinct_items)]
+    path = "/scrape-ebay/stream" if args.endpoint == "stream" else "/scrape-ebay"
+    # Lift this batch's limits; the server's shared per-host buckets are off
+    # (start a --target server with HOST_RATE_LIMITS=0 too)
+    options = {"fastPath": not args.browser, "requestsPerSecond": 1000, "burst": 1000, "minDelay": 0}
+
+    latencies, statuses = [], {}
+    urls_done = 0
+    remaining = args.requests
+    server = psutil.Process(server_pid) if server_pid else None
+    peak_rss = tree_rss(server) if server else None
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while True:
+            try:
+                peak_rss = max(peak_rss, tree_rss(server))
+            except psutil.Error:
+                return
+            await asyncio.sleep(0.2)
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal remaining, urls_done
+        while remaining > 0:
+            remaining -= 1
+            body = {"urls": random.sample(items, min(args.urls_per_request, len(items))), **options}
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{target}{path}", json=body)
+                status = str(response.status_code)
+                if response.status_code == 200:
+                    if args.endpoint == "stream":
+                        summary = json.loads(response.text.strip().splitlines()[-1])
+                    else:
+                        summary = response.json()["results"]
+                    urls_done += summary.get("successfulScrapes", 0)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+        await wait_until_up(client, target)
+        sampler = asyncio.create_task(sample_rss()) if server else None
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.cancel()
+
+    return {
+        "requests": args.requests,
+        "statuses": statuses,
+        "elapsedSeconds": round(elapsed, 3),
+        "requestsPerSecond": round(args.requests / elapsed, 3) if elapsed else None,
+        "urlsPerSecond": round(urls_done / elapsed, 3) if elapsed else None,
+        "latencySeconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "serverPeakRssBytes": peak_rss,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the scraper API against local fixture pages.")
+    parser.add_argument("--target", help="base URL of a running server (default: start asgi_app.py)")
+    parser.add_argument("--port", type=int, default=5055, help="port for the ASGI server this script starts")
+    parser.add_argument("--endpoint", choices=["batch", "stream"], default="batch")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--urls-per-request", type=int, default=5)
+    parser.add_argument("--distinct-items", type=int, default=500)
+    parser.add_argument("--browser", action="store_true", help="scrape with the browser instead of the HTTP fast path")
+    parser.add_argument("--latency-ms", type=float, default=20, help="server-side delay per fixture page")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request client timeout (seconds)")
+    parser.add_argument("--output", help="report path (default: bench/results/load-<endpoint>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    fixtures, base_url = start_fixture_server(0, args.latency_ms)
+    server = None if args.target else start_asgi_server(args.port)
+    target = (args.target or f"http://127.0.0.1:{args.port}").rstrip("/")
+    try:
+        metrics = asyncio.run(run_load(args, target, base_url, server.pid if server else None))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        fixtures.shutdown()
+
+    report = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "target": args.target or "asgi_app.py",
+        "params": vars(args),
+        "metrics": metrics,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{args.endpoint}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(metrics, indent=2))
+    print(f"✅ Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
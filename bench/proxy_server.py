@@ -0,0 +1,129 @@
+"""
+Local stand-in HTTP proxies for testing the identity pool.
+
+    python -m bench.proxy_server --count 3
+
+Each proxy forwards plain-HTTP requests (absolute-form GET/HEAD/POST) and
+tunnels CONNECT, and adds "Via: 1.1 <name>" so the fixture server can
+tell which proxy a request came through and play a flagged IP for some
+of them (see start_fixture_server's `blocked_proxies`).
+
+Chromium sends loopback traffic around any proxy; launch the browser pool
+with "--proxy-bypass-list=<-loopback>" to route fixture pages through these.
+"""
+
+import argparse
+import http.client
+import select
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authorization", "proxy-connection",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "BenchProxy/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self):
+        with self.server.lock:
+            self.server.requests += 1
+
+    def _forward(self):
+        self._count()
+        target = urlsplit(self.path)
+        if target.scheme != "http" or not target.hostname:
+            self.send_error(400, "Only absolute http:// URLs are forwarded")
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        headers = {key: value for key, value in self.headers.items() if key.lower() not in HOP_HEADERS}
+        headers["Via"] = f"1.1 {self.server.name}"
+        path = (target.path or "/") + (f"?{target.query}" if target.query else "")
+
+        upstream = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            upstream.request(self.command, path, body or None, headers)
+            response = upstream.getresponse()
+            data = response.read()
+        except OSError as e:
+            self.send_error(502, f"Upstream error: {e}")
+            return
+        finally:
+            upstream.close()
+
+        self.send_response(response.status, response.reason)
+        for key, value in response.getheaders():
+            if key.lower() not in HOP_HEADERS and key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_HEAD = do_POST = _forward
+
+    def do_CONNECT(self):
+        self._count()
+        host, _, port = self.path.rpartition(":")
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=30)
+        except (OSError, ValueError) as e:
+            self.send_error(502, f"Upstream error: {e}")
+            return
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        self.close_connection = True
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    return
+                for source in readable:
+                    chunk = source.recv(64 * 1024)
+                    if not chunk:
+                        return
+                    (upstream if source is self.connection else self.connection).sendall(chunk)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+
+def start_proxy_server(name: str, port: int = 0):
+    """
+    Start a proxy named `name` in a daemon thread.
+    Returns (server, proxy_url); `server.requests` counts requests served.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), ProxyHandler)
+    server.daemon_threads = True
+    server.name = name
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name=f"proxy-{name}", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local stand-in HTTP proxies.")
+    parser.add_argument("--count", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8800, help="port of the first proxy; the rest follow")
+    args = parser.parse_args()
+    servers = []
+    for i in range(args.count):
+        server, url = start_proxy_server(f"proxy-{i}", args.port + i)
+        servers.append(server)
+        print(f"✅ proxy-{i} running at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -0,0 +1,204 @@
+"""
+Offline scraper benchmark against the local fixture server.
+
+    python -m bench.run_bench --site ebay --urls 100 --concurrency 4
+    python -m bench.run_bench --site amazon --urls 50 --interstitial-every 5
+    python -m bench.run_bench --site ebay --mode fast --compare bench/results/previous.json
+
+Runs the real scrape paths (browser pool, readiness waits, request
+blocking, ZIP session, HTTP fast path) and writes a JSON report with
+URLs/sec, p50/p95/p99 per-URL latency, peak RSS of this process plus its
+browsers, and browser launches for the batch.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Keep benchmark runs out of the real history database and ZIP session cache
+os.environ.setdefault("STORE_RESULTS", "0")
+# The fixture server is local: no shared per-host rate limits
+os.environ.setdefault("HOST_RATE_LIMITS", "0")
+os.environ.setdefault("AMAZON_SESSION_DIR", tempfile.mkdtemp(prefix="bench-sessions-"))
+
+import psutil  # noqa: E402
+from bench.fixture_server import start_fixture_server  # noqa: E402
+from scraper.browser_pool import configure_browser_pool, get_browser_launches, shutdown_browser_pool  # noqa: E402
+from scraper.ebay_scraper import scrape_amazon, scrape_amazon_fast, scrape_ebay, scrape_ebay_fast  # noqa: E402
+from scraper.scheduler import run_scrape_batch  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def tree_rss(process=None) -> int:
+    """RSS of a process (default: this one) plus all its children (the browsers), in bytes."""
+    process = process or psutil.Process()
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+def make_urls(base_url: str, site: str, count: int, start: int = 0):
+    if site == "ebay":
+        return [f"{base_url}/itm/{256100000000 + i}" for i in range(start, start + count)]
+    return [f"{base_url}/dp/B0BENCH{i:03d}" for i in range(start, start + count)]
+
+
+async def run_benchmark(args, base_url: str) -> dict:
+    urls = make_urls(base_url, args.site, args.urls)
+    latencies = []
+    peak_rss = tree_rss()
+
+    if args.site == "ebay":
+        scrape = scrape_ebay_fast if args.mode == "fast" else scrape_ebay
+        scrape_one = scrape
+    else:
+        scrape = scrape_amazon_fast if args.mode == "fast" else scrape_amazon
+        scrape_one = lambda url: scrape(url, args.zip_code)
+
+    async def timed(url):
+        started = time.perf_counter()
+        try:
+            return await scrape_one(url)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, tree_rss())
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_rss())
+    launches_before = get_browser_launches()
+    started = time.perf_counter()
+    summary = await run_scrape_batch(
+        urls,
+        timed,
+        args.site,
+        use_cache=False,
+        concurrency=args.concurrency,
+        requests_per_second=1000,
+        burst=1000,
+        min_delay=0,
+    )
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    peak_rss = max(peak_rss, tree_rss())
+    sources = {}
+    for data in summary["results"]:
+        sources[data.get("source")] = sources.get(data.get("source"), 0) + 1
+
+    return {
+        "urls": len(urls),
+        "successful": summary["successfulScrapes"],
+        "failed": summary["failedScrapes"],
+        "elapsedSeconds": round(elapsed, 3),
+        "urlsPerSecond": round(len(urls) / elapsed, 3) if elapsed else None,
+        "latencySeconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "peakRssBytes": peak_rss,
+        "browserLaunches": get_browser_launches() - launches_before,
+        "sources": sources,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def print_comparison(report: dict, previous_path: str):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    rows = [
+        ("urlsPerSecond", report["metrics"]["urlsPerSecond"], previous["metrics"]["urlsPerSecond"]),
+        ("p50", report["metrics"]["latencySeconds"]["p50"], previous["metrics"]["latencySeconds"]["p50"]),
+        ("p95", report["metrics"]["latencySeconds"]["p95"], previous["metrics"]["latencySeconds"]["p95"]),
+        ("peakRssBytes", report["metrics"]["peakRssBytes"], previous["metrics"]["peakRssBytes"]),
+    ]
+    print(f"Compared with {previous_path} ({previous.get('commit')}):")
+    for name, now, before in rows:
+        if now is None or not before:
+            continue
+        print(f"  {name:>14}: {before:.4g} -> {now:.4g} ({(now - before) / before * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against local fixture pages.")
+    parser.add_argument("--site", choices=["ebay", "amazon"], default="ebay")
+    parser.add_argument("--mode", choices=["browser", "fast"], default="browser",
+                        help="'fast' tries the HTTP path before the browser")
+    parser.add_argument("--urls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=1)
+    parser.add_argument("--zip", dest="zip_code", default="75007")
+    parser.add_argument("--latency-ms", type=float, default=0, help="server-side delay per HTML page")
+    parser.add_argument("--interstitial-every", type=int, default=0)
+    parser.add_argument("--output", help="report path (default: bench/results/<site>-<mode>-<time>.json)")
+    parser.add_argument("--compare", help="previous report to compare against")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fixture_server(0, args.latency_ms, args.interstitial_every)
+    configure_browser_pool(size=args.pool_size)
+
+    async def run():
+        try:
+            return await run_benchmark(args, base_url)
+        finally:
+            await shutdown_browser_pool()
+
+    try:
+        metrics = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    report = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": vars(args),
+        "metrics": metrics,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.site}-{args.mode}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(metrics, indent=2))
+    print(f"✅ Report written to {output}")
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
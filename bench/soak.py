@@ -0,0 +1,169 @@
+"""
+Long-run memory soak test against the local fixture server.
+
+    python -m bench.soak --minutes 30
+    python -m bench.soak --minutes 10 --browser-max-rss-mb 400 --context-max-age 60
+
+Scrapes fixture pages through the browser pool in back-to-back batches for
+`--minutes`, with the resource governor running, and samples the RSS of
+this process plus its browsers every `--sample-every` seconds. After a
+warm-up (first 10% of the run) memory should stay flat: the report gives
+the fitted growth rate in MB/hour and the change between the median of
+the first and last quarter of samples, plus browser launches and governor
+recycles. Exits non-zero when the growth passes `--max-growth-mb`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Keep soak runs out of the real history database and ZIP session cache
+os.environ.setdefault("STORE_RESULTS", "0")
+# The fixture server is local: no shared per-host rate limits
+os.environ.setdefault("HOST_RATE_LIMITS", "0")
+os.environ.setdefault("AMAZON_SESSION_DIR", tempfile.mkdtemp(prefix="soak-sessions-"))
+
+from bench.fixture_server import start_fixture_server  # noqa: E402
+from bench.run_bench import RESULTS_DIR, git_commit, make_urls, tree_rss  # noqa: E402
+from scraper.browser_pool import configure_browser_pool, get_browser_launches, shutdown_browser_pool  # noqa: E402
+from scraper.ebay_scraper import scrape_amazon, scrape_amazon_fast, scrape_ebay, scrape_ebay_fast  # noqa: E402
+from scraper.resource_governor import MB, resource_governor  # noqa: E402
+from scraper.scheduler import run_scrape_batch  # noqa: E402
+
+
+def growth_per_hour(samples) -> float:
+    """Least-squares slope of RSS over time, in MB per hour."""
+    if len(samples) < 2:
+        return 0.0
+    times = [t for t, _ in samples]
+    values = [rss / MB for _, rss in samples]
+    mean_t, mean_v = statistics.fmean(times), statistics.fmean(values)
+    spread = sum((t - mean_t) ** 2 for t in times)
+    if not spread:
+        return 0.0
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / spread
+    return slope * 3600
+
+
+async def run_soak(args, base_url: str) -> dict:
+    if args.site == "ebay":
+        scrape_one = scrape_ebay_fast if args.mode == "fast" else scrape_ebay
+    else:
+        scrape = scrape_amazon_fast if args.mode == "fast" else scrape_amazon
+        scrape_one = lambda url: scrape(url, "75007")
+
+    samples = []
+    started = time.monotonic()
+    deadline = started + args.minutes * 60
+
+    async def sample_rss():
+        while True:
+            samples.append((time.monotonic() - started, tree_rss()))
+            await asyncio.sleep(args.sample_every)
+
+    sampler = asyncio.create_task(sample_rss())
+    launches_before = get_browser_launches()
+    scraped = failed = batches = 0
+    try:
+        while time.monotonic() < deadline:
+            # Fresh item ids every batch, like a real catalog crawl
+            urls = make_urls(base_url, args.site, args.batch_size, start=batches * args.batch_size)
+            summary = await run_scrape_batch(
+                urls,
+                scrape_one,
+                args.site,
+                use_cache=False,
+                concurrency=args.concurrency,
+                requests_per_second=1000,
+                burst=1000,
+                min_delay=0,
+            )
+            batches += 1
+            scraped += summary["successfulScrapes"]
+            failed += summary["failedScrapes"]
+            print(f"⏱️ {(time.monotonic() - started) / 60:.1f} min: {scraped} scraped, "
+                  f"RSS {samples[-1][1] / MB:.0f} MB, pressure {resource_governor.pressure}")
+    finally:
+        sampler.cancel()
+
+    steady = [s for s in samples if s[0] >= args.minutes * 60 * 0.1] or samples
+    quarter = max(1, len(steady) // 4)
+    first = statistics.median(rss for _, rss in steady[:quarter])
+    last = statistics.median(rss for _, rss in steady[-quarter:])
+    return {
+        "minutes": args.minutes,
+        "batches": batches,
+        "scraped": scraped,
+        "failed": failed,
+        "samples": len(samples),
+        "startRssBytes": samples[0][1] if samples else None,
+        "peakRssBytes": max(rss for _, rss in samples) if samples else None,
+        "steadyGrowthMbPerHour": round(growth_per_hour(steady), 1),
+        "firstToLastQuarterMb": round((last - first) / MB, 1),
+        "browserLaunches": get_browser_launches() - launches_before,
+        "governor": {key: value for key, value in resource_governor.status().items() if key != "browsers"},
+        "rssSamples": [(round(t, 1), rss) for t, rss in samples],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that memory stays flat over a long scrape run.")
+    parser.add_argument("--site", choices=["ebay", "amazon"], default="ebay")
+    parser.add_argument("--mode", choices=["browser", "fast"], default="browser")
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=1)
+    parser.add_argument("--sample-every", type=float, default=5, help="seconds between RSS samples")
+    parser.add_argument("--browser-max-rss-mb", type=float, help="governor: recycle browsers past this RSS")
+    parser.add_argument("--browser-max-age", type=float, help="governor: recycle browsers older than this (s)")
+    parser.add_argument("--context-max-age", type=float, help="pool: recycle contexts older than this (s)")
+    parser.add_argument("--max-growth-mb", type=float, default=100,
+                        help="fail if memory grew more than this between the first and last quarter")
+    parser.add_argument("--output", help="report path (default: bench/results/soak-<site>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fixture_server(0)
+    pool_options = {"size": args.pool_size}
+    if args.context_max_age:
+        pool_options["max_context_age"] = args.context_max_age
+    configure_browser_pool(**pool_options)
+    if args.browser_max_rss_mb:
+        resource_governor.configure(browser_max_rss=args.browser_max_rss_mb * MB)
+    if args.browser_max_age:
+        resource_governor.configure(browser_max_age=args.browser_max_age)
+
+    async def run():
+        try:
+            return await run_soak(args, base_url)
+        finally:
+            await resource_governor.stop()
+            await shutdown_browser_pool()
+
+    try:
+        metrics = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    report = {"timestamp": time.time(), "commit": git_commit(), "params": vars(args), "metrics": metrics}
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"soak-{args.site}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({key: value for key, value in metrics.items() if key != "rssSamples"}, indent=2))
+    print(f"✅ Report written to {output}")
+    if metrics["firstToLastQuarterMb"] > args.max_growth_mb:
+        print(f"❌ Memory grew {metrics['firstToLastQuarterMb']} MB (limit {args.max_growth_mb} MB)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,22 @@ Each scraper module should expose an async function named `scrape_<site>()`
 that accepts a URL and returns a dictionary of scraped data.
 """
 
-from .ebay_scraper import scrape_ebay_from_csv, scrape_amazon_from_csv
+from .ebay_scraper import (
+    scrape_ebay_from_csv,
+    scrape_amazon_from_csv,
+    stream_ebay_from_csv,
+    stream_amazon_from_csv,
+)
+from .ebay_listing import scrape_ebay_listings, stream_ebay_listings
+from .amazon_matrix import scrape_amazon_matrix, stream_amazon_matrix
 
 __all__ = [
     "scrape_ebay_from_csv",
     "scrape_amazon_from_csv",
+    "stream_ebay_from_csv",
+    "stream_amazon_from_csv",
+    "scrape_ebay_listings",
+    "stream_ebay_listings",
+    "scrape_amazon_matrix",
+    "stream_amazon_matrix",
 ]
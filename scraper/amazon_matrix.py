@@ -0,0 +1,222 @@
+"""
+Amazon ASIN x ZIP matrix: regional price and stock for many items in one sweep.
+
+    python -m scraper.amazon_matrix B0194WDVHI B00FR6XR9S --zip 10001 --zip 94105 --zip 75007
+
+The sweep is planned per ZIP. A ZIP without a saved location session
+scrapes its first item alone, which runs the location modal once and
+saves the session; the rest of its items then reuse it (and can take the
+HTTP fast path). Up to `zip_concurrency` ZIP groups run at once. They
+share the Amazon host rate limit, the global page slots and the result
+cache with every other batch.
+
+Each cell records the ZIP the page actually showed (its "Deliver to"
+line), not just the one asked for. A browser page priced for another ZIP
+fails with reason "zip_code" and is retried; successful cells whose page
+didn't show the requested ZIP (usually: showed none) are counted in the
+summary's `unconfirmedZips`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+from typing import List, Optional
+from .browser_pool import shutdown_browser_pool
+from .ebay_scraper import stream_amazon_from_csv
+from .logs import get_logger
+from .result_cache import canonical_key
+from .scheduler import RetryStats
+from .zip_session import load_zip_session
+
+log = get_logger(__name__)
+
+# ZIP groups swept at once (each keeps its own browser context)
+MATRIX_ZIP_CONCURRENCY = int(os.environ.get("MATRIX_ZIP_CONCURRENCY", "4"))
+
+_ASIN = re.compile(r"^[A-Z0-9]{10}$", re.I)
+
+# Item fields that vary by region; the rest go on the row once
+CELL_FIELDS = ("discountedPrice", "actualPrice", "inStock", "numberInStock")
+
+
+def amazon_product_url(item: str, domain: str = "www.amazon.com") -> str:
+    """A bare ASIN becomes https://<domain>/dp/<ASIN>; URLs are kept as they are."""
+    item = item.strip()
+    return f"https://{domain}/dp/{item.upper()}" if _ASIN.match(item) else item
+
+
+def item_id(url: str) -> str:
+    key = canonical_key(url)
+    return key[2] if key else url
+
+
+async def _sweep_zip(urls: List[str], zip_code: str, **options):
+    """Result events for every URL in one ZIP, the location session set up first."""
+    first = 0
+    if len(urls) > 1 and load_zip_session(zip_code) is None:
+        # One page runs the location modal; the others wait for its session
+        first = 1
+        async for event in stream_amazon_from_csv(urls[:1], zip_code, **options):
+            if event["type"] == "result":
+                yield event
+    async for event in stream_amazon_from_csv(urls[first:], zip_code, **options):
+        if event["type"] == "result":
+            yield {**event, "index": event["index"] + first}
+
+
+def _cell(event: dict) -> dict:
+    if not event["success"]:
+        return {"zip": None, "error": event.get("error"), "reason": event.get("reason")}
+    data = event["data"]
+    cell = {"zip": data.get("deliveryZip")}
+    cell.update({field: data.get(field) for field in CELL_FIELDS})
+    cell["source"] = data.get("source")
+    cell["cached"] = data.get("cached", False)
+    return cell
+
+
+async def stream_amazon_matrix(
+    items: List[str],
+    zip_codes: List[str],
+    fast_path: bool = False,
+    use_cache: bool = True,
+    include_timings: bool = False,
+    zip_concurrency: Optional[int] = None,
+    **limits,
+):
+    """
+    Scrape every item (ASIN or product URL) in every ZIP, yielding one
+    event per cell as it finishes:
+
+        {"type": "cell", "row": 0, "itemId": "B0194WDVHI", "zipCode": "10001", "success": True,
+         "title": "...", "cell": {"zip": "10001", "discountedPrice": 21.99, "actualPrice": 29.99,
+         "inStock": True, "numberInStock": 7, "source": "http", "cached": False},
+         "retries": 0, "retryReasons": []}
+
+    then a {"type": "summary", ...} event. `limits` takes the scheduler
+    overrides of stream_amazon_from_csv and apply to each ZIP group.
+    """
+    urls = [amazon_product_url(item) for item in items]
+    zip_codes = list(dict.fromkeys(str(z).strip() for z in zip_codes if str(z).strip()))
+    options = {"fast_path": fast_path, "use_cache": use_cache, "include_timings": include_timings, **limits}
+    slots = asyncio.Semaphore(max(1, zip_concurrency or MATRIX_ZIP_CONCURRENCY))
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run_zip(zip_code: str):
+        try:
+            async with slots:
+                log.info("Sweeping ZIP", zip=zip_code, items=len(urls))
+                async for event in _sweep_zip(urls, zip_code, **options):
+                    await events.put((zip_code, event))
+        except Exception as e:
+            await events.put((zip_code, e))
+        finally:
+            await events.put((zip_code, None))
+
+    tasks = [asyncio.create_task(run_zip(zip_code)) for zip_code in zip_codes]
+    successful = 0
+    failed_cells = []
+    unconfirmed = 0
+    retry_stats = RetryStats()
+    try:
+        running = len(tasks)
+        while running:
+            zip_code, event = await events.get()
+            if event is None:
+                running -= 1
+                continue
+            if isinstance(event, Exception):
+                raise event
+
+            retry_stats.add(event)
+            cell = _cell(event)
+            url = urls[event["index"]]
+            if event["success"]:
+                successful += 1
+                unconfirmed += cell["zip"] != zip_code
+            else:
+                failed_cells.append({"url": url, "zipCode": zip_code})
+            cell_event = {
+                "type": "cell",
+                "row": event["index"],
+                "itemId": item_id(url),
+                "zipCode": zip_code,
+                "success": event["success"],
+                "title": (event.get("data") or {}).get("title"),
+                "cell": cell,
+                "retries": event.get("retries", 0),
+                "retryReasons": event.get("retryReasons", []),
+            }
+            if include_timings and event["success"] and "timings" in event["data"]:
+                cell_event["timings"] = event["data"]["timings"]
+            yield cell_event
+    finally:
+        # Also runs when the consumer stops early
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield {
+        "type": "summary",
+        "items": len(urls),
+        "zipCodes": zip_codes,
+        "cells": len(urls) * len(zip_codes),
+        "successfulCells": successful,
+        "failedCells": failed_cells,
+        "unconfirmedZips": unconfirmed,
+        **retry_stats.to_dict(),
+    }
+
+
+async def scrape_amazon_matrix(items: List[str], zip_codes: List[str], **options) -> dict:
+    """
+    Collect stream_amazon_matrix into an item x region table:
+
+        {"zipCodes": ["10001", "94105"],
+         "rows": [{"itemId": "B0194WDVHI", "url": "...", "title": "...",
+                   "regions": {"10001": {cell}, "94105": {cell}}}, ...],
+         **summary}
+    """
+    urls = [amazon_product_url(item) for item in items]
+    rows = [{"itemId": item_id(url), "url": url, "title": None, "regions": {}} for url in urls]
+    summary = {}
+    async for event in stream_amazon_matrix(items, zip_codes, **options):
+        if event["type"] == "cell":
+            row = rows[event["row"]]
+            row["title"] = row["title"] or event["title"]
+            row["regions"][event["zipCode"]] = event["cell"]
+        else:
+            summary = {key: value for key, value in event.items() if key != "type"}
+    zip_order = summary.get("zipCodes", [])
+    for row in rows:
+        row["regions"] = {zip_code: row["regions"].get(zip_code) for zip_code in zip_order}
+    return {"rows": rows, **summary}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Amazon price/stock for every item in every ZIP code.")
+    parser.add_argument("items", nargs="+", help="ASINs or Amazon product URLs")
+    parser.add_argument("--zip", action="append", dest="zip_codes", required=True, help="ZIP code (repeatable)")
+    parser.add_argument("--fast-path", action="store_true")
+    parser.add_argument("--zip-concurrency", type=int, default=MATRIX_ZIP_CONCURRENCY)
+    parser.add_argument("--stream", action="store_true", help="print each cell as a JSON line as it finishes")
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            options = {"fast_path": args.fast_path, "zip_concurrency": args.zip_concurrency}
+            if args.stream:
+                async for event in stream_amazon_matrix(args.items, args.zip_codes, **options):
+                    print(json.dumps(event), flush=True)
+            else:
+                print(json.dumps(await scrape_amazon_matrix(args.items, args.zip_codes, **options), indent=2))
+        finally:
+            await shutdown_browser_pool()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from utils.setup_browser import get_chromium_path
+from .identity_pool import current_identity
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Contexts are also recycled once they are this old (seconds), whatever their use count
+CONTEXT_MAX_AGE = float(os.environ.get("BROWSER_CONTEXT_MAX_AGE", "900"))
+
+
+class _PooledContext:
+    """A BrowserContext plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.active = 0
+        self.retired = False
+
+
+class _BrowserSlot:
+    """One long-lived Chromium process and the contexts opened on it."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser: Optional[Browser] = None
+        self.contexts: Dict[str, _PooledContext] = {}
+        self.active = 0
+        self.lock = asyncio.Lock()
+        # Set at launch; `marker` is a command line flag that identifies the
+        # Chromium process, so its memory can be measured (see resource_governor.py)
+        self.marker: Optional[str] = None
+        self.launched_at = 0.0
+        self.open_pages = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.recycle_reason: Optional[str] = None
+
+    def is_alive(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.launched_at if self.browser is not None else 0.0
+
+
+class BrowserPool:
+    """
+    Keeps `size` Chromium browsers running for the lifetime of the app.
+
+    Each scrape borrows a fresh page from a pooled BrowserContext instead of
+    launching a whole browser. Contexts are recycled after `max_context_uses`
+    pages or `max_context_age` seconds, and a browser that has crashed or
+    disconnected is relaunched the next time a page is requested from it.
+    recycle_browser() drains a browser and relaunches it (used by the
+    resource governor when a browser grows too big or too old).
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        max_context_uses: int = 50,
+        executable_path: Optional[str] = None,
+        launch_args: Optional[List[str]] = None,
+        max_context_age: float = CONTEXT_MAX_AGE,
+    ):
+        self.size = max(1, size)
+        self.max_context_uses = max(1, max_context_uses)
+        self.max_context_age = max_context_age
+        self.executable_path = executable_path
+        self.launch_args = launch_args or ["--headless=new"]
+        self._playwright: Optional[Playwright] = None
+        self._slots: List[_BrowserSlot] = []
+        self._start_lock = asyncio.Lock()
+        self.launches = 0
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    @property
+    def slots(self) -> List[_BrowserSlot]:
+        return list(self._slots)
+
+    async def start(self):
+        """Start Playwright and launch every browser in the pool."""
+        async with self._start_lock:
+            if self.started:
+                return
+            if self.executable_path is None:
+                # Cached after the first call; may read config.json once
+                self.executable_path = await asyncio.to_thread(get_chromium_path)
+            self._playwright = await async_playwright().start()
+            self._slots = [_BrowserSlot(i) for i in range(self.size)]
+            for slot in self._slots:
+                await self._launch(slot)
+            log.info("Browser pool started", browsers=self.size)
+
+    async def close(self):
+        """Close every context and browser, then stop Playwright."""
+        async with self._start_lock:
+            for slot in self._slots:
+                await self._close_slot(slot)
+            self._slots = []
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _launch(self, slot: _BrowserSlot):
+        slot.contexts = {}
+        # Chromium ignores switches it doesn't know; this one names the process
+        slot.marker = f"--scraper-pool-browser={os.getpid()}-{id(self)}-{slot.index}-{self.launches}"
+        slot.browser = await self._playwright.chromium.launch(
+            executable_path=self.executable_path,
+            args=self.launch_args + [slot.marker],
+        )
+        slot.launched_at = time.monotonic()
+        slot.recycle_reason = None
+        self.launches += 1
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        for pooled in slot.contexts.values():
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+        slot.contexts = {}
+        if slot.browser is not None:
+            try:
+                await slot.browser.close()
+            except Exception:
+                pass
+            slot.browser = None
+
+    def _pick_slot(self) -> _BrowserSlot:
+        # Least busy browser first, skipping ones being recycled if possible
+        return min(self._slots, key=lambda s: (s.recycle_reason is not None, s.active))
+
+    async def recycle_browser(self, slot: _BrowserSlot, reason: str):
+        """
+        Close `slot`'s browser so the next page relaunches it. With pages
+        still open on it, new pages for it wait until those are closed.
+        """
+        if slot.recycle_reason is not None or slot.browser is None:
+            return
+        slot.recycle_reason = reason
+        log.info("Recycling browser", browser=slot.index, reason=reason)
+        if slot.open_pages <= 0 and not slot.lock.locked():
+            async with slot.lock:
+                if slot.open_pages <= 0 and slot.recycle_reason is not None:
+                    await self._close_slot(slot)
+                    slot.recycle_reason = None
+
+    async def close_idle_contexts(self) -> int:
+        """Close every context with no open pages (frees renderer memory). Returns how many."""
+        closed = 0
+        for slot in self._slots:
+            async with slot.lock:
+                for key, pooled in list(slot.contexts.items()):
+                    if pooled.active <= 0:
+                        slot.contexts.pop(key, None)
+                        pooled.retired = True
+                        try:
+                            await pooled.context.close()
+                        except Exception:
+                            pass
+                        closed += 1
+        return closed
+
+    async def _get_context(
+        self, slot: _BrowserSlot, key: str, context_options: Optional[dict]
+    ) -> _PooledContext:
+        async with slot.lock:
+            if slot.recycle_reason is not None and slot.is_alive():
+                # Holding the lock keeps new pages off this browser while it drains
+                await slot.idle.wait()
+                await self._close_slot(slot)
+            if not slot.is_alive():
+                if slot.browser is not None:
+                    log.warning("Browser disconnected, relaunching", browser=slot.index)
+                await self._close_slot(slot)
+                await self._launch(slot)
+
+            pooled = slot.contexts.get(key)
+            if pooled is not None and time.monotonic() - pooled.created_at > self.max_context_age:
+                pooled.retired = True
+                slot.contexts.pop(key, None)
+                if pooled.active <= 0:
+                    try:
+                        await pooled.context.close()
+                    except Exception:
+                        pass
+            if pooled is None or pooled.retired:
+                options = {"user_agent": DEFAULT_USER_AGENT}
+                options.update(context_options or {})
+                context = await slot.browser.new_context(**options)
+                pooled = _PooledContext(context)
+                slot.contexts[key] = pooled
+
+            pooled.uses += 1
+            pooled.active += 1
+            slot.open_pages += 1
+            slot.idle.clear()
+            if pooled.uses >= self.max_context_uses:
+                # Hand out this last page, then let the next request build a new context
+                pooled.retired = True
+                slot.contexts.pop(key, None)
+            return pooled
+
+    async def _release_context(self, pooled: _PooledContext):
+        pooled.active -= 1
+        if pooled.retired and pooled.active <= 0:
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def page(self, context_key: str = "default", context_options: Optional[dict] = None):
+        """
+        Borrow a new page from the pool.
+
+        Pages sharing a `context_key` share cookies and storage until the
+        context is recycled. `context_options` are passed to `new_context()`
+        when a context for that key has to be created. Inside a scheduler
+        scrape, the current identity's proxy, user agent, viewport and
+        locale apply and its pages get contexts of their own.
+        """
+        if not self.started:
+            await self.start()
+
+        identity = current_identity.get()
+        if identity is not None:
+            context_key = f"{identity.name}:{context_key}"
+            context_options = {**identity.context_options(), **(context_options or {})}
+
+        slot = self._pick_slot()
+        slot.active += 1
+        pooled = None
+        page = None
+        try:
+            pooled = await self._get_context(slot, context_key, context_options)
+            page = await pooled.context.new_page()
+            yield page
+        finally:
+            slot.active -= 1
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            if pooled is not None:
+                await self._release_context(pooled)
+                slot.open_pages -= 1
+                if slot.open_pages <= 0:
+                    slot.idle.set()
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def configure_browser_pool(**kwargs) -> BrowserPool:
+    """Create the shared pool with custom settings (call before first use)."""
+    global _pool
+    _pool = BrowserPool(**kwargs)
+    return _pool
+
+
+async def get_browser_pool() -> BrowserPool:
+    """Return the shared pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    if not _pool.started:
+        await _pool.start()
+    return _pool
+
+
+def get_browser_pool_if_started() -> Optional[BrowserPool]:
+    """The shared pool if its browsers are running, without starting it."""
+    return _pool if _pool is not None and _pool.started else None
+
+
+def get_browser_launches() -> int:
+    """Number of browser launches so far (0 if the pool was never started)."""
+    return _pool.launches if _pool is not None else 0
+
+
+async def shutdown_browser_pool():
+    """Close the shared pool if it was started."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
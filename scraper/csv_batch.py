@@ -0,0 +1,215 @@
+"""
+Stream a CSV of product URLs through the scraper.
+
+Rows are read as the scraper needs them, at most `chunk_size` of them in
+flight (scraping or waiting their turn) at a time, and every result is
+appended (and flushed) to a CSV or JSONL file as soon as it is scraped,
+so the file can be downloaded while the batch is still running and
+inputs of hundreds of thousands of rows use constant memory.
+
+    python -m scraper.csv_batch --site ebay --input urls.csv --output results.csv
+    python -m scraper.csv_batch --site amazon --zip 10001 --input product_urls.csv --output results.jsonl
+
+Rows need full product URLs; bare ASINs are skipped like any other
+non-URL cell (scraper.amazon_matrix takes ASINs).
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+from itertools import chain
+from typing import Iterator, Optional
+from .browser_pool import shutdown_browser_pool
+from .ebay_scraper import stream_amazon_from_csv, stream_ebay_from_csv
+from .logs import get_logger
+from .scheduler import RetryStats
+from .sites import get_site
+
+log = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+URL_HEADERS = ("url", "urls", "link", "product url", "item url", "product_url", "item_url")
+
+STREAMS = {"ebay": stream_ebay_from_csv, "amazon": stream_amazon_from_csv}
+
+
+def iter_csv_urls(path: str, column: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the URLs in a CSV file one row at a time.
+
+    The URL column is `column` (a header name or 0-based index), else the
+    first column whose header looks like "url"/"link", else the first
+    column. Cells that aren't http(s) URLs (headers, blanks) are skipped.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is None:
+            return
+
+        headers = [cell.strip().lower() for cell in first]
+        if column is not None and str(column).isdigit():
+            index = int(column)
+        elif column is not None and column.strip().lower() in headers:
+            index = headers.index(column.strip().lower())
+        else:
+            index = next((i for i, header in enumerate(headers) if header in URL_HEADERS), 0)
+
+        for row in chain([first], reader):
+            if index < len(row):
+                value = row[index].strip()
+                if value.lower().startswith(("http://", "https://")):
+                    yield value
+
+
+def count_csv_urls(path: str, column: Optional[str] = None) -> int:
+    return sum(1 for _ in iter_csv_urls(path, column))
+
+
+class ResultWriter:
+    """Appends scrape result events to a CSV or JSONL file, flushing each row."""
+
+    def __init__(self, path: str, site: str, fmt: str = "csv"):
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError("format must be 'csv' or 'jsonl'")
+        self.path = path
+        self.fmt = fmt
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if fmt == "csv":
+            fields = list(get_site(site)["fields"])
+            if site == "amazon":
+                fields.append("locationZipCode")
+            columns = ["index", "url", "success"] + fields + ["source", "cached", "retries", "reason", "error"]
+            self._csv = csv.DictWriter(self._file, fieldnames=columns, extrasaction="ignore")
+            self._csv.writeheader()
+            self._file.flush()
+
+    def write(self, event: dict):
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps({k: v for k, v in event.items() if k != "type"}) + "\n")
+        else:
+            row = dict(event.get("data") or {})
+            row.update(
+                index=event["index"],
+                url=row.get("url") or event.get("url"),
+                success=event["success"],
+                retries=event.get("retries", 0),
+                reason=event.get("reason"),
+                error=event.get("error"),
+            )
+            self._csv.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+async def stream_csv_batch(
+    site: str,
+    input_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    column: Optional[str] = None,
+    **options,
+):
+    """
+    Like stream_<site>_from_csv, but reads the URLs from `input_path` as
+    it goes, keeping up to `chunk_size` rows in flight: a new row starts
+    as soon as any earlier one finishes. Result events carry their row
+    position in the file as `index`; the final summary event covers the
+    whole file.
+    """
+    stream = STREAMS[site]
+    successful = failed = cache_hits = 0
+    retry_stats = RetryStats()
+    urls = iter_csv_urls(input_path, column)
+    async for event in stream(urls, window=max(1, chunk_size), **options):
+        if event["type"] != "result":
+            continue
+        retry_stats.add(event)
+        if event["success"]:
+            successful += 1
+            cache_hits += bool(event["data"].get("cached"))
+        else:
+            failed += 1
+        yield event
+
+    yield {
+        "type": "summary",
+        "totalUrls": successful + failed,
+        "successfulScrapes": successful,
+        "failedScrapes": failed,
+        "cacheHits": cache_hits,
+        **retry_stats.to_dict(),
+    }
+
+
+async def scrape_csv_file(
+    site: str,
+    input_path: str,
+    output_path: str,
+    fmt: str = "csv",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    column: Optional[str] = None,
+    **options,
+) -> dict:
+    """Scrape every URL in `input_path` into `output_path` and return the summary."""
+    writer = ResultWriter(output_path, site, fmt)
+    summary = {}
+    written = 0
+    try:
+        async for event in stream_csv_batch(site, input_path, chunk_size, column, **options):
+            if event["type"] == "result":
+                writer.write(event)
+                written += 1
+                # Results arrive in completion order, so count them rather than read their index
+                if written % 100 == 0:
+                    log.info("Rows written", rows=written, output=output_path)
+            else:
+                summary = event
+    finally:
+        writer.close()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the URLs in a CSV file into a CSV/JSONL file.")
+    parser.add_argument("--site", choices=sorted(STREAMS), required=True)
+    parser.add_argument("--input", required=True, help="CSV with one URL per row")
+    parser.add_argument("--output", required=True, help="results file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the output file's extension")
+    parser.add_argument("--column", help="URL column name or 0-based index (default: auto-detect)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--zip", dest="zip_code", help="Amazon delivery ZIP code")
+    parser.add_argument("--fast-path", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--requests-per-second", type=float)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.output.lower().endswith(".jsonl") else "csv")
+    options = {"fast_path": args.fast_path, "use_cache": not args.no_cache}
+    if args.zip_code and args.site == "amazon":
+        options["zip_code"] = args.zip_code
+    if args.concurrency:
+        options["concurrency"] = args.concurrency
+    if args.requests_per_second:
+        options["requests_per_second"] = args.requests_per_second
+
+    async def run():
+        try:
+            return await scrape_csv_file(
+                args.site, args.input, args.output, fmt, args.chunk_size, args.column, **options
+            )
+        finally:
+            await shutdown_browser_pool()
+
+    summary = asyncio.run(run())
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
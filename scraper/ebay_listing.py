@@ -0,0 +1,260 @@
+"""
+eBay search and store listing pages.
+
+One search page shows 50-240 result cards, so catalog monitoring walks
+the pagination of a search (a seller's items are a search too:
+/sch/i.html?_ssn=<seller>) or store URL instead of opening every /itm/
+page. Each card gives itemNumber, title, price and url.
+
+Items only get a full detail scrape (scrape_ebay) when the listing data
+isn't enough: pass `detail_fields` (e.g. ["stockCount"]) and every item
+missing one of them is scraped through the usual batch scheduler, with
+its cache, rate limits and retries.
+
+    python -m scraper.ebay_listing "https://www.ebay.com/sch/i.html?_nkw=mx+master" --max-pages 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import List, Optional
+from .browser_pool import shutdown_browser_pool
+from .ebay_scraper import goto_and_wait_ready, open_page, raise_if_interstitial, stream_ebay_from_csv
+from .extractors import get_extractor
+from .http_fast_path import clean_listing_data, fetch_ebay_listing_http
+from .logs import get_logger
+from .metrics import StageTimer, http_fallbacks
+from .request_blocker import install_request_blocking
+from .retry_policy import ScrapeError, classify_error
+from .identity_pool import scrape_captchas
+from .scheduler import RetryStats, iter_scrape_batch, scrape_with_fresh_identity
+
+log = get_logger(__name__)
+
+# Pages followed per listing URL unless the caller asks for more
+DEFAULT_MAX_PAGES = int(os.environ.get("LISTING_MAX_PAGES", "10"))
+
+# Scheduler overrides that also apply to the listing pages themselves
+PAGE_LIMIT_KEYS = ("requests_per_second", "burst", "min_delay", "max_retries")
+
+
+async def scrape_ebay_listing_page(page_url: str, timer: Optional[StageTimer] = None) -> dict:
+    """Extract every result card (and the next page link) from one search/store page."""
+    timer = timer or StageTimer("ebay_listing")
+    try:
+        async with open_page(timer) as page:
+            block_stats = await install_request_blocking(page, "ebay_listing")
+
+            with timer.stage("goto"):
+                ready = await goto_and_wait_ready(page, page_url, "ebay_listing")
+            await raise_if_interstitial(page, "ebay_listing")
+            if not ready:
+                raise ScrapeError(f"No result cards on {page_url}", "timeout")
+
+            with timer.stage("extract"):
+                data = clean_listing_data(await get_extractor("ebay_listing").extract_page(page), page.url)
+
+            data["url"] = page_url
+            data["source"] = "browser"
+            return {
+                "success": True,
+                "data": data,
+                "blocked": block_stats.to_dict(),
+                "timings": timer.finish("browser"),
+            }
+
+    except Exception as e:
+        log.warning("Scrape failed", url=page_url, error=str(e))
+        return {
+            "success": False,
+            "url": page_url,
+            "error": str(e),
+            "reason": classify_error(e),
+            "timings": timer.finish("browser"),
+        }
+
+
+async def scrape_ebay_listing_page_fast(page_url: str) -> dict:
+    """Try plain HTTP first; use the browser only if that finds no items."""
+    timer = StageTimer("ebay_listing")
+    with timer.stage("http"):
+        result = await fetch_ebay_listing_http(page_url)
+    if result is not None:
+        result["timings"] = timer.finish("http")
+        return result
+    http_fallbacks.inc("ebay_listing")
+    if scrape_captchas.get():
+        # The captcha flagged this identity: fall back through another one
+        return await scrape_with_fresh_identity(
+            page_url, "ebay_listing", lambda: scrape_ebay_listing_page(page_url, timer)
+        )
+    return await scrape_ebay_listing_page(page_url, timer)
+
+
+def needs_detail(item: dict, detail_fields: Optional[List[str]]) -> bool:
+    return any(item.get(field) in (None, "") for field in detail_fields or [])
+
+
+async def stream_ebay_listings(
+    listing_urls: List[str],
+    max_pages: int = DEFAULT_MAX_PAGES,
+    detail_fields: Optional[List[str]] = None,
+    fast_path: bool = False,
+    use_cache: bool = True,
+    include_timings: bool = False,
+    **limits,
+):
+    """
+    Walk each listing URL's pagination (up to `max_pages` pages each) and
+    yield one event per page with the items first seen on it:
+
+        {"type": "page", "listingUrl": "...", "page": 1, "url": "...", "success": True,
+         "items": [{"index": 0, "itemNumber": ..., "title": ..., "price": ..., "url": ...}, ...],
+         "nextPage": "...", "totalResults": 1284, "source": "http", "retries": 0, "retryReasons": []}
+
+    Items seen on an earlier page or listing are skipped. With
+    `detail_fields`, items missing any of those fields are then detail
+    scraped and yielded as {"type": "item", "index": ..., "success": ...,
+    "data": {listing fields + detail fields}}; a failed detail scrape keeps
+    the listing fields in `data`. Ends with a {"type": "summary", ...} event.
+    `limits` takes the scheduler overrides of stream_ebay_from_csv.
+    """
+    scrape_page = scrape_ebay_listing_page_fast if fast_path else scrape_ebay_listing_page
+    page_limits = {key: limits[key] for key in PAGE_LIMIT_KEYS if key in limits}
+    items, seen = [], set()
+    pages = 0
+    failed_pages = []
+    page_retries = RetryStats()
+
+    for listing_url in listing_urls:
+        page_url, visited = listing_url, set()
+        for page_number in range(1, max(1, max_pages) + 1):
+            if not page_url or page_url in visited:
+                break
+            visited.add(page_url)
+
+            # One URL at a time, but with the scheduler's rate limits, breaker and retries
+            async for _, result in iter_scrape_batch(
+                [page_url],
+                scrape_page,
+                "ebay_listing",
+                use_cache=False,
+                include_timings=include_timings,
+                store_results=False,
+                **page_limits,
+            ):
+                pass
+            page_retries.add(result)
+            retries = {"retries": result.get("retries", 0), "retryReasons": result.get("retryReasons", [])}
+            event = {"type": "page", "listingUrl": listing_url, "page": page_number, "url": page_url}
+
+            if not result.get("success"):
+                failed_pages.append(page_url)
+                yield {**event, "success": False, "error": result.get("error"), "reason": result.get("reason"), **retries}
+                break
+
+            pages += 1
+            data = result["data"]
+            new_items = []
+            for item in data["items"]:
+                if item["itemNumber"] in seen:
+                    continue
+                seen.add(item["itemNumber"])
+                item = {"index": len(items), **item}
+                items.append(item)
+                new_items.append(item)
+            page_event = {
+                **event,
+                "success": True,
+                "items": new_items,
+                "nextPage": data.get("nextPage"),
+                "totalResults": data.get("totalResults"),
+                "source": data.get("source"),
+                **retries,
+            }
+            if include_timings and "timings" in data:
+                page_event["timings"] = data["timings"]
+            yield page_event
+            page_url = data.get("nextPage")
+
+    detail_items = [item for item in items if needs_detail(item, detail_fields)]
+    failed_details = []
+    detail_retries = RetryStats()
+    if detail_items:
+        log.info("Listing items need a detail scrape", items=len(items), detail=len(detail_items))
+        async for event in stream_ebay_from_csv(
+            [item["url"] for item in detail_items],
+            fast_path=fast_path,
+            use_cache=use_cache,
+            include_timings=include_timings,
+            **limits,
+        ):
+            if event["type"] != "result":
+                continue
+            detail_retries.add(event)
+            item = detail_items[event["index"]]
+            if event["success"]:
+                detail = {key: value for key, value in event["data"].items() if value is not None}
+                item.update(detail)
+            else:
+                failed_details.append(item["url"])
+            yield {
+                "type": "item",
+                "index": item["index"],
+                "success": event["success"],
+                "data": item,
+                **{key: event[key] for key in ("error", "reason", "retries", "retryReasons") if key in event},
+            }
+
+    yield {
+        "type": "summary",
+        "listingUrls": len(listing_urls),
+        "pages": pages,
+        "failedPages": failed_pages,
+        "totalItems": len(items),
+        "detailScrapes": len(detail_items),
+        "failedDetails": failed_details,
+        "pageRetries": page_retries.retries,
+        **detail_retries.to_dict(),
+    }
+
+
+async def scrape_ebay_listings(listing_urls: List[str], **options) -> dict:
+    """Collect stream_ebay_listings into {"items": [...], "pages": [...], **summary}."""
+    items, pages, summary = {}, [], {}
+    async for event in stream_ebay_listings(listing_urls, **options):
+        if event["type"] == "page":
+            for item in event.get("items", []):
+                items[item["index"]] = item
+            pages.append({key: value for key, value in event.items() if key not in ("type", "items")})
+        elif event["type"] == "item":
+            items[event["index"]] = event["data"]
+        else:
+            summary = {key: value for key, value in event.items() if key != "type"}
+    return {"items": [items[index] for index in sorted(items)], "pageResults": pages, **summary}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape every item card of eBay search/store pages as JSON lines.")
+    parser.add_argument("urls", nargs="+", help="eBay search or store URLs")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument("--detail-field", action="append", dest="detail_fields",
+                        help="detail scrape items missing this field (repeatable), e.g. stockCount")
+    parser.add_argument("--fast-path", action="store_true")
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            async for event in stream_ebay_listings(
+                args.urls, max_pages=args.max_pages, detail_fields=args.detail_fields, fast_path=args.fast_path
+            ):
+                print(json.dumps(event), flush=True)
+        finally:
+            await shutdown_browser_pool()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
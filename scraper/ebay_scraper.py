@@ -1,357 +1,449 @@
-import asyncio
-from typing import List
-from playwright.async_api import async_playwright, Page
-from utils.setup_browser import get_chromium_path
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import List, Optional
+from playwright.async_api import Page
+from .browser_pool import get_browser_pool
+from .extractors import get_extractor
+from .http_fast_path import fetch_amazon_http, fetch_ebay_http, missing_fields
+from .identity_pool import identity_pool, scrape_captchas
+from .logs import get_logger, log_page_console
+from .metrics import StageTimer, captcha_hits, http_fallbacks, zip_modal_runs
+from .request_blocker import install_request_blocking
+from .result_cache import canonical_key
+from .retry_policy import ScrapeError, classify_error
+from .scheduler import run_scrape_batch, scrape_with_fresh_identity, stream_scrape_batch
+from .sites import NAVIGATION_TIMEOUT, get_site
+from .zip_session import get_zip_lock, invalidate_zip_session, load_zip_session, save_zip_session
 import re
 
+log = get_logger(__name__)
+
+_READY_CHECK = """({ ready, interstitial }) => {
+    if (interstitial.some((sel) => document.querySelector(sel))) return true;
+    return ready.every((group) => group.some((sel) => document.querySelector(sel)));
+}"""
+
+_INTERSTITIAL_CHECK = "(selectors) => selectors.some((sel) => document.querySelector(sel))"
+
+# Statuses that mean "you've been rate limited / flagged", not a broken page
+BLOCKED_STATUSES = {403, 429, 503}
+
+
+async def wait_for_page_ready(page: Page, site: str) -> bool:
+    """
+    Wait until the site's readiness selectors are present (see sites.SITES).
+
+    Returns False if the capped timeout ran out first; callers still extract
+    whatever is on the page in that case.
+    """
+    settings = get_site(site)
+    try:
+        await page.wait_for_function(
+            _READY_CHECK,
+            arg={"ready": settings["ready"], "interstitial": settings["interstitial"]},
+            timeout=settings["ready_timeout"],
+        )
+        return True
+    except Exception:
+        log.warning("Page not ready", site=site, url=page.url, timeout_ms=settings["ready_timeout"])
+        return False
+
+
+@asynccontextmanager
+async def open_page(timer: StageTimer, **page_options):
+    """
+    Borrow a pooled page (BrowserPool.page options). Starting the pool and
+    opening the context and page is timed as the "browser" stage.
+    """
+    async with AsyncExitStack() as stack:
+        with timer.stage("browser"):
+            pool = await get_browser_pool()
+            page = await stack.enter_async_context(pool.page(**page_options))
+        yield page
+
+
+async def goto_and_wait_ready(page: Page, url: str, site: str) -> bool:
+    """
+    Navigate to `url` and return as soon as the page is ready to extract.
+    404s and blocked responses raise ScrapeError right away.
+    """
+    response = await page.goto(url, wait_until="domcontentloaded", timeout=NAVIGATION_TIMEOUT)
+    if response is not None:
+        if response.status == 404:
+            raise ScrapeError(f"Not found (HTTP 404): {url}", "not_found")
+        if response.status in BLOCKED_STATUSES:
+            raise ScrapeError(f"Blocked (HTTP {response.status}): {url}", "blocked")
+    return await wait_for_page_ready(page, site)
+
+
+async def raise_if_interstitial(page: Page, site: str, counted: bool = False):
+    """
+    Raise ScrapeError if the page is still a captcha/interstitial, counting
+    a captcha hit unless one was already `counted` for this page.
+    """
+    if await page.evaluate(_INTERSTITIAL_CHECK, get_site(site)["interstitial"]):
+        if not counted:
+            captcha_hits.inc(site)
+        raise ScrapeError(f"Captcha page instead of the product: {page.url}", "blocked")
+
+
+def raise_if_incomplete(site: str, data: dict, url: str, ready: bool):
+    """Raise ScrapeError if a required field is missing from the extracted data."""
+    missing = missing_fields(site, data)
+    if missing:
+        # A page that never became ready timed out rather than changed layout
+        reason = "missing_fields" if ready else "timeout"
+        raise ScrapeError(f"Missing {missing} on {url}", reason)
+
+
 # --- Reusable single-URL scraper ---
-async def scrape_ebay(item_url: str):
-    chromium_path = get_chromium_path()
+async def scrape_ebay(item_url: str, timer: Optional[StageTimer] = None):
+    timer = timer or StageTimer("ebay")
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(executable_path=chromium_path,
-                                              args=["--headless=new"],
-                                              )
-            page = await browser.new_page()
-
-            # Log browser console messages
-            page.on("console", lambda msg: print("PAGE LOG:", msg.text))
-
-            # Set realistic user-agent
-            await page.context.set_extra_http_headers({
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                )
-            })
-
-            # Navigate and wait for network to be idle
-            await page.goto(item_url, wait_until="load", timeout=60000)
-            await asyncio.sleep(3)
-
-            ebay_data = await page.evaluate(
-                """() => {
-                    const urlMatch = window.location.href.match(/\\/itm\\/(\\d+)/);
-                    const itemNumber = urlMatch ? urlMatch[1] : null;
-
-                    let titleElement =
-                        document.querySelector('h1[data-testid="vi-VR-cvipPrice-title"]') ||
-                        document.querySelector("h1") ||
-                        document.querySelector('[role="heading"]');
-                    const title = titleElement?.textContent?.trim() || null;
-
-                    let price = null;
-                    const priceElement =
-                        document.querySelector('[data-testid="x-price-primary"]') ||
-                        document.querySelector(".x-price-primary") ||
-                        document.querySelector(".x-bin-price__content");
-                    if (priceElement) {
-                        const priceText = priceElement.textContent?.trim() || "";
-                        const priceMatch = priceText.match(/[\\d,.]+/);
-                        if (priceMatch) {
-                            price = parseFloat(priceMatch[0].replace(/,/g, ""));
-                        }
-                    }
-
-                    let stockCount = null;
-                    const stockElements = document.querySelectorAll("span");
-                    for (const element of stockElements) {
-                        const text = element.textContent?.toLowerCase() || "";
-                        if (text.includes("in stock") || text.includes("available")) {
-                            const match = text.match(/(\\d+)\\s*(in stock|available)/i);
-                            if (match) {
-                                stockCount = parseInt(match[1]);
-                                break;
-                            }
-                        }
-                    }
-
-                    if (!stockCount) {
-                        const allText = document.body.textContent || "";
-                        const stockMatch = allText.match(/only\\s+(\\d+)\\s+left/i);
-                        if (stockMatch) {
-                            stockCount = parseInt(stockMatch[1]);
-                        }
-                    }
-
-                    return { title, price, stockCount, itemNumber };
-                }"""
-            )
-
-            await browser.close()
+        async with open_page(timer) as page:
+            # Sampled browser console messages (off unless PAGE_CONSOLE_SAMPLE_RATE is set)
+            log_page_console(page, "ebay")
+
+            # Skip images, fonts, media and trackers - the extractor needs none of them
+            block_stats = await install_request_blocking(page, "ebay")
+
+            # Navigate and wait for the price/title to render
+            with timer.stage("goto"):
+                ready = await goto_and_wait_ready(page, item_url, "ebay")
+            await raise_if_interstitial(page, "ebay")
+
+            with timer.stage("extract"):
+                ebay_data = await get_extractor("ebay").extract_page(page)
+            raise_if_incomplete("ebay", ebay_data, item_url, ready)
 
             ebay_data["url"] = item_url
-            return {"success": True, "data": ebay_data}
+            ebay_data["source"] = "browser"
+            log.debug("Blocked requests", url=item_url, blocked=block_stats.blocked_requests)
+            return {
+                "success": True,
+                "data": ebay_data,
+                "blocked": block_stats.to_dict(),
+                "timings": timer.finish("browser"),
+            }
 
     except Exception as e:
-        print(f"❌ Error scraping {item_url}: {e}")
-        return {"success": False, "url": item_url, "error": str(e)}
+        log.warning("Scrape failed", url=item_url, error=str(e))
+        return {
+            "success": False,
+            "url": item_url,
+            "error": str(e),
+            "reason": classify_error(e),
+            "timings": timer.finish("browser"),
+        }
 
-async def scrape_ebay_from_csv(urls: List[str]):
-    results = []
-    failed_urls = []
+async def scrape_ebay_fast(item_url: str):
+    """Try plain HTTP first; use the browser only if that can't get every field."""
+    timer = StageTimer("ebay")
+    with timer.stage("http"):
+        result = await fetch_ebay_http(item_url)
+    if result is not None:
+        result["timings"] = timer.finish("http")
+        return result
+    http_fallbacks.inc("ebay")
+    if scrape_captchas.get():
+        # The captcha flagged this identity: fall back through another one
+        return await scrape_with_fresh_identity(item_url, "ebay", lambda: scrape_ebay(item_url, timer))
+    return await scrape_ebay(item_url, timer)
 
-    # Scrape sequentially (safer for eBay — avoids blocking)
-    for url in urls:
-        print(f"🔍 Scraping: {url}")
-        result = await scrape_ebay(url)
 
-        if result.get("success"):
-            results.append(result["data"])
-        else:
-            failed_urls.append(result.get("url", url))
-
-    return {
-        "results": results,
-        "totalUrls": len(urls),
-        "successfulScrapes": len(results),
-        "failedScrapes": len(failed_urls),
-        "failedUrls": failed_urls,
-    }
+async def scrape_ebay_from_csv(
+    urls: List[str],
+    fast_path: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    requests_per_second: Optional[float] = None,
+    burst: Optional[int] = None,
+    min_delay: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    include_timings: bool = False,
+):
+    # Concurrent, but rate limited per host (see scheduler.SITE_LIMITS["ebay"]).
+    # Duplicate items are fetched once and recent results come from the cache.
+    return await run_scrape_batch(
+        urls,
+        scrape_ebay_fast if fast_path else scrape_ebay,
+        "ebay",
+        cache_key=canonical_key,
+        use_cache=use_cache,
+        include_timings=include_timings,
+        concurrency=concurrency,
+        requests_per_second=requests_per_second,
+        burst=burst,
+        min_delay=min_delay,
+        max_retries=max_retries,
+    )
 
 async def set_amazon_zip_code(page: Page, zip_code: str = "75007"):
     """Set the delivery zip code on Amazon product page"""
     try:
-        print(f"Setting zip code to {zip_code}...")
+        log.debug("Setting zip code", zip=zip_code)
         
         # Click the "Deliver to" link in the header
         deliver_button = page.locator('#nav-global-location-popover-link')
         await deliver_button.click(timeout=5000)
-        await asyncio.sleep(2)  # Wait for modal to fully load
-        print("Clicked deliver button, modal opening...")
+        log.debug("Clicked deliver button, modal opening")
         
         # Wait for the zip input field to appear
         zip_input = page.locator('#GLUXZipUpdateInput')
         await zip_input.wait_for(timeout=5000, state="visible")
-        print("Modal opened, found zip input")
+        log.debug("Modal opened, found zip input")
         
         # Clear and enter the zip code
         await zip_input.fill(zip_code)
-        await asyncio.sleep(0.5)
-        print(f"Entered zip code: {zip_code}")
+        log.debug("Entered zip code", zip=zip_code)
         
         # Click Apply button
         apply_button = page.locator('#GLUXZipUpdate')
         await apply_button.click(timeout=5000)
-        await asyncio.sleep(3)  # Wait longer for confirmation/response
-        print("Applied zip code")
+        log.debug("Applied zip code", zip=zip_code)
         
-        # Check for the confirmation modal "You're now shopping for delivery to:"
-        # Look for the header text to confirm modal is visible
+        # Amazon answers with either the "You're now shopping for delivery to:"
+        # confirmation or a modal with a Done button - wait for whichever shows first
+        confirmation_button = page.locator('.a-popover-footer input#GLUXConfirmClose').first
+        done_button = page.locator('button[name="glowDoneButton"]')
         try:
-            print("Checking for confirmation modal...")
-            confirmation_header = page.locator('h4:has-text("You\'re now shopping for delivery to:")')
-            await confirmation_header.wait_for(timeout=5000, state="visible")
-            print("Found confirmation modal header")
-            
+            log.debug("Waiting for confirmation modal")
+            await confirmation_button.or_(done_button).first.wait_for(timeout=5000, state="visible")
+        except Exception as e:
+            log.warning("No confirmation or Done button appeared", zip=zip_code, error=str(e))
+
+        if await confirmation_button.is_visible():
             # Click the actual input button, not the span
-            confirmation_button = page.locator('.a-popover-footer input#GLUXConfirmClose').first
             await confirmation_button.click(timeout=5000, force=True)
-            await asyncio.sleep(2)  # Wait for page to update
-            print("Clicked Continue on confirmation modal")
-            return True
-        except Exception as e:
-            print(f"No confirmation modal found: {e}, trying Done button...")
-        
-        # If no confirmation modal, try to close with Done button
-        done_button = page.locator('button[name="glowDoneButton"]')
-        try:
+            log.debug("Clicked Continue on confirmation modal")
+        elif await done_button.is_visible():
             await done_button.click(timeout=5000)
-            await asyncio.sleep(2)  # Wait for modal to close and page to update
-            print("Closed modal with Done button")
-        except Exception as e:
-            print(f"⚠️ Could not find Done button, trying close icon: {e}")
+            log.debug("Closed modal with Done button")
+        else:
             # Try clicking the close icon as fallback
             close_button = page.locator('button[aria-label="Close"]').first
             try:
-                await close_button.click(timeout=5000)
-                await asyncio.sleep(2)
-                print("Closed modal with close icon")
+                await close_button.click(timeout=2000)
+                log.debug("Closed modal with close icon")
             except:
-                print("⚠️ Could not close modal, it may have auto-closed")
-        
+                log.debug("Could not close modal, it may have auto-closed")
+
+        # Amazon reloads the page with the new location; wait for it to settle
+        try:
+            await zip_input.wait_for(timeout=5000, state="hidden")
+            await page.wait_for_load_state("domcontentloaded")
+        except Exception as e:
+            log.warning("Modal still open after applying zip code", zip=zip_code, error=str(e))
         return True
         
     except Exception as e:
-        print(f"⚠️ Error setting zip code: {e}")
+        log.warning("Error setting zip code", zip=zip_code, url=page.url, error=str(e))
         return False
 
 
 async def handle_captcha_or_continue(page: Page):
-    """Handle Amazon's 'Continue shopping' button if it appears"""
+    """
+    Click Amazon's 'Continue shopping' button if it appears. Returns True
+    when it appeared (the hit is counted here, whether or not the click got
+    through); wait for the page to be ready again after that.
+    """
     try:
-        print("Checking for captcha/continue shopping button...")
-        
-        # Check if the continue shopping button exists
-        continue_button = page.locator('button.a-button-text:has-text("Continue shopping")')
-        
-        # Wait a short time to see if it appears
-        try:
-            await continue_button.wait_for(timeout=3000, state="visible")
-            print("Found 'Continue shopping' button, clicking...")
-            await continue_button.click()
-            await asyncio.sleep(2)  # Wait for navigation
-            print("Clicked 'Continue shopping' successfully")
-            return True
-        except:
-            print("No captcha/continue button found, proceeding normally")
+        # The page is already ready (or showing the interstitial), so check once
+        continue_button = page.locator(
+            'form[action*="validateCaptcha"] button:has-text("Continue shopping")'
+        )
+        if not await continue_button.is_visible():
             return False
-            
+
+        log.info("Clicking 'Continue shopping' interstitial", url=page.url)
+        captcha_hits.inc("amazon")
+        identity_pool.record_captcha()
     except Exception as e:
-        print(f"⚠️ Error checking for continue button: {e}")
+        log.warning("Error checking for the 'Continue shopping' button", url=page.url, error=str(e))
         return False
 
-async def scrape_amazon(product_url: str, zip_code: str = "75007"):
-    chromium_path = get_chromium_path()
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                executable_path=chromium_path,
-                args=["--headless=new"],
-            )
-            page = await browser.new_page()
-            
-            # Log browser console messages
-            page.on("console", lambda msg: print("PAGE LOG:", msg.text))
-            
-            # Set realistic user-agent
-            await page.context.set_extra_http_headers({
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                )
-            })
-            
-            # Navigate and wait for network to be idle
-            await page.goto(product_url, wait_until="load", timeout=60000)
-            await asyncio.sleep(2)
-            
-            # === HANDLE CAPTCHA/CONTINUE BUTTON ===
-            await handle_captcha_or_continue(page)
-            
-            # === SET ZIP CODE ===
-            zip_set = await set_amazon_zip_code(page, zip_code)
-            if not zip_set:
-                await browser.close()
-                return {"success": False, "url": product_url, "error": "Failed to set zip code"}
-            
-            # === SCRAPE DATA ===
-            await asyncio.sleep(2)  # Extra wait for content to load
-            
-            amazon_data = await page.evaluate(
-                """() => {
-                    // Extract ASIN from URL
-                    const urlMatch = window.location.href.match(/\\/dp\\/([A-Z0-9]+)/);
-                    const itemNumber = urlMatch ? urlMatch[1] : null;
-                    
-                    // Extract title from the specific productTitle span
-                    let title = null;
-                    const titleElement = document.querySelector("#productTitle");
-                    if (titleElement) {
-                        title = titleElement.textContent?.trim() || null;
-                    }
-                    
-                    // Extract price - get the offscreen text which has the full price
-                    let discountedPrice = null;
-                    const priceContainer = document.querySelector(".a-price.aok-align-center.reinventPricePriceToPayMargin");
-                    if (!priceContainer) {
-                        // Fallback for different price structure
-                        const altPriceContainer = document.querySelector(".a-price[data-a-size='xl']");
-                        if (altPriceContainer) {
-                            const offscreenPrice = altPriceContainer.querySelector(".a-offscreen");
-                            if (offscreenPrice) {
-                                const priceText = offscreenPrice.textContent?.trim() || "";
-                                const priceMatch = priceText.match(/\\$(\\d+[.,]?\\d*)/);
-                                if (priceMatch) {
-                                    discountedPrice = parseFloat(priceMatch[1].replace(/,/g, ""));
-                                }
-                            }
-                        }
-                    } else {
-                        const offscreenPrice = priceContainer.querySelector(".a-offscreen");
-                        if (offscreenPrice) {
-                            const priceText = offscreenPrice.textContent?.trim() || "";
-                            const priceMatch = priceText.match(/\\$(\\d+[.,]?\\d*)/);
-                            if (priceMatch) {
-                                discountedPrice = parseFloat(priceMatch[1].replace(/,/g, ""));
-                            }
-                        }
-                    }
-                    
-                    // Extract actual price - look for list/typical price
-                    let actualPrice = null;
-                    const allText = document.body.innerText;
-                    const typicalPriceMatch = allText.match(/Typical price[:\\s]+\\$(\\d+[.,]?\\d*)/i);
-                    if (typicalPriceMatch) {
-                        actualPrice = parseFloat(typicalPriceMatch[1].replace(/,/g, ""));
-                    }
-                    
-                    // If no typical price found, use discounted price
-                    if (!actualPrice) {
-                        actualPrice = discountedPrice;
-                    }
-                    
-                    // === Extract stock info from availability-string div ===
-                    let inStock = false;
-                    let numberInStock = null;
-                    
-                    const availabilityDiv = document.querySelector("#availability-string");
-                    if (availabilityDiv) {
-                        const availText = availabilityDiv.textContent?.trim() || "";
-                        
-                        // Check if "In Stock" text is present
-                        if (availText.toLowerCase().includes("in stock")) {
-                            inStock = true;
-                            numberInStock = 999; // In stock, quantity not specified
-                        }
-                        
-                        // Check for "Only X left in stock"
-                        const onlyMatch = availText.match(/only\\s+(\\d+)\\s+left/i);
-                        if (onlyMatch) {
-                            inStock = true;
-                            numberInStock = parseInt(onlyMatch[1]);
-                        }
-                    }
-                    
-                    return { 
-                        itemNumber, 
-                        title, 
-                        discountedPrice, 
-                        actualPrice, 
-                        inStock,
-                        numberInStock,
-                        locationZipCode: "75007"
-                    };
-                }"""
-            )
-            
-            await browser.close()
-            amazon_data["url"] = product_url
-            return {"success": True, "data": amazon_data}
-            
+        async with page.expect_navigation(wait_until="domcontentloaded", timeout=15000):
+            await continue_button.click()
     except Exception as e:
-        print(f"❌ Error scraping {product_url}: {e}")
-        return {"success": False, "url": product_url, "error": str(e)}
-
-async def scrape_amazon_from_csv(urls: List[str], zip_code: str = "75007"):
-    results = []
-    failed_urls = []
-    
-    # Scrape sequentially (safer for Amazon — avoids blocking)
-    for url in urls:
-        print(f"🔍 Scraping: {url}")
-        result = await scrape_amazon(url, zip_code)
-        if result.get("success"):
-            results.append(result["data"])
-        else:
-            failed_urls.append(result.get("url", url))
-    
-    return {
-        "results": results,
-        "totalUrls": len(urls),
-        "successfulScrapes": len(results),
-        "failedScrapes": len(failed_urls),
-        "failedUrls": failed_urls,
-    }
\ No newline at end of file
+        log.warning("Error handling 'Continue shopping' button", url=page.url, error=str(e))
+    return True
+
+async def amazon_location_matches(page: Page, zip_code: str) -> bool:
+    """Check the header's 'Deliver to' line already shows `zip_code`."""
+    try:
+        location_text = await page.locator('#glow-ingress-line2').inner_text(timeout=2000)
+    except Exception:
+        return False
+    return zip_code in location_text
+
+
+async def scrape_amazon(product_url: str, zip_code: str = "75007", timer: Optional[StageTimer] = None):
+    timer = timer or StageTimer("amazon")
+    try:
+        # Only the first page for a ZIP without a saved session runs the modal;
+        # pages queued behind it pick up the session it saved.
+        zip_lock = None
+        storage_state = load_zip_session(zip_code)
+        if storage_state is None:
+            zip_lock = get_zip_lock(zip_code)
+            with timer.stage("zip_wait"):
+                await zip_lock.acquire()
+            storage_state = load_zip_session(zip_code)
+            if storage_state is not None:
+                zip_lock.release()
+                zip_lock = None
+
+        try:
+            result = await _scrape_amazon_page(product_url, zip_code, storage_state, timer)
+        finally:
+            if zip_lock is not None:
+                zip_lock.release()
+
+    except Exception as e:
+        log.warning("Scrape failed", url=product_url, zip=zip_code, error=str(e))
+        result = {"success": False, "url": product_url, "error": str(e), "reason": classify_error(e)}
+
+    result["timings"] = timer.finish("browser")
+    return result
+
+
+async def _scrape_amazon_page(product_url: str, zip_code: str, storage_state: Optional[dict], timer: StageTimer):
+    # One context per ZIP, seeded from the saved session when we have one
+    context_options = {"storage_state": storage_state} if storage_state else None
+    async with open_page(timer, context_key=f"amazon:{zip_code}", context_options=context_options) as page:
+        # Sampled browser console messages (off unless PAGE_CONSOLE_SAMPLE_RATE is set)
+        log_page_console(page, "amazon")
+        
+        # Skip images, fonts, media and trackers - the extractor needs none of them
+        block_stats = await install_request_blocking(page, "amazon")
+        
+        # Navigate and wait for the title/availability to render
+        with timer.stage("goto"):
+            ready = await goto_and_wait_ready(page, product_url, "amazon")
+        
+        # === HANDLE CAPTCHA/CONTINUE BUTTON ===
+        with timer.stage("captcha"):
+            captcha_counted = await handle_captcha_or_continue(page)
+            if captcha_counted:
+                # The product page should have replaced the interstitial: wait for it again
+                ready = await wait_for_page_ready(page, "amazon")
+        await raise_if_interstitial(page, "amazon", counted=captcha_counted)
+        
+        # === SET ZIP CODE (only if the saved session didn't already) ===
+        if not await amazon_location_matches(page, zip_code):
+            with timer.stage("zip"):
+                zip_set = await set_amazon_zip_code(page, zip_code)
+                if not zip_set:
+                    zip_modal_runs.inc("failed")
+                    invalidate_zip_session(zip_code)
+                    return {"success": False, "url": product_url, "error": "Failed to set zip code", "reason": "zip_code"}
+                zip_modal_runs.inc("success")
+                save_zip_session(zip_code, await page.context.storage_state())
+                # Changing the location reloads prices and availability
+                ready = await wait_for_page_ready(page, "amazon")
+        elif storage_state is None:
+            # Already delivering to this ZIP (e.g. geolocated): save it so later
+            # pages skip the ZIP lock and the HTTP fast path gets the cookies
+            save_zip_session(zip_code, await page.context.storage_state())
+        
+        # === SCRAPE DATA ===
+        
+        with timer.stage("extract"):
+            amazon_data = await get_extractor("amazon").extract_page(page)
+        raise_if_incomplete("amazon", amazon_data, product_url, ready)
+        delivery_zip = amazon_data.get("deliveryZip")
+        if delivery_zip and delivery_zip != zip_code:
+            # Prices and stock would be for the wrong region
+            invalidate_zip_session(zip_code)
+            raise ScrapeError(f"Page shows ZIP {delivery_zip} instead of {zip_code}: {product_url}", "zip_code")
+
+        amazon_data["locationZipCode"] = zip_code
+        amazon_data["url"] = product_url
+        amazon_data["source"] = "browser"
+        log.debug("Blocked requests", url=product_url, blocked=block_stats.blocked_requests)
+        return {"success": True, "data": amazon_data, "blocked": block_stats.to_dict()}
+
+
+def stream_ebay_from_csv(urls: List[str], fast_path: bool = False, use_cache: bool = True, **limits):
+    """
+    Async generator version of scrape_ebay_from_csv: yields each item's
+    result as it finishes, then a summary (see scheduler.stream_scrape_batch).
+    `limits` takes the same scheduler overrides as scrape_ebay_from_csv.
+    """
+    return stream_scrape_batch(
+        urls,
+        scrape_ebay_fast if fast_path else scrape_ebay,
+        "ebay",
+        cache_key=canonical_key,
+        use_cache=use_cache,
+        **limits,
+    )
+
+
+async def scrape_amazon_fast(product_url: str, zip_code: str = "75007"):
+    """
+    Try plain HTTP with the saved ZIP session first; use the browser when
+    there is no session yet or the page is incomplete or blocked (through
+    another identity after a captcha).
+    """
+    timer = StageTimer("amazon")
+    with timer.stage("http"):
+        result = await fetch_amazon_http(product_url, zip_code)
+    if result is not None:
+        result["timings"] = timer.finish("http")
+        return result
+    http_fallbacks.inc("amazon")
+    if scrape_captchas.get():
+        # The captcha flagged this identity: fall back through another one
+        return await scrape_with_fresh_identity(
+            product_url, "amazon", lambda: scrape_amazon(product_url, zip_code, timer)
+        )
+    return await scrape_amazon(product_url, zip_code, timer)
+
+
+async def scrape_amazon_from_csv(
+    urls: List[str],
+    zip_code: str = "75007",
+    fast_path: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    requests_per_second: Optional[float] = None,
+    burst: Optional[int] = None,
+    min_delay: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    include_timings: bool = False,
+):
+    # Concurrent, but rate limited per host (see scheduler.SITE_LIMITS["amazon"]).
+    # Duplicate ASINs are fetched once per ZIP and recent results come from the cache.
+    return await run_scrape_batch(
+        urls,
+        lambda url: (scrape_amazon_fast if fast_path else scrape_amazon)(url, zip_code),
+        "amazon",
+        cache_key=lambda url: canonical_key(url, zip_code),
+        use_cache=use_cache,
+        include_timings=include_timings,
+        concurrency=concurrency,
+        requests_per_second=requests_per_second,
+        burst=burst,
+        min_delay=min_delay,
+        max_retries=max_retries,
+    )
+
+
+def stream_amazon_from_csv(
+    urls: List[str],
+    zip_code: str = "75007",
+    fast_path: bool = False,
+    use_cache: bool = True,
+    **limits,
+):
+    """Async generator version of scrape_amazon_from_csv (see stream_ebay_from_csv)."""
+    scrape_one = scrape_amazon_fast if fast_path else scrape_amazon
+    return stream_scrape_batch(
+        urls,
+        lambda url: scrape_one(url, zip_code),
+        "amazon",
+        cache_key=lambda url: canonical_key(url, zip_code),
+        use_cache=use_cache,
+        **limits,
+    )
@@ -0,0 +1,220 @@
+"""
+Site extractors built from the declarative `fields` in sites.SITES.
+
+Each field is a list of rules; the first rule that yields a value wins.
+
+    {"selectors": [...], "all": False, "attr": "href", "regex": "...", "flags": "i",
+     "group": 1, "type": "text" | "float" | "int", "value": <constant>}
+    {"url": True, "regex": "...", "group": 1}
+    {"field": "otherField"}
+    {"value": <constant>}
+
+A selector rule reads the text (or the `attr` attribute) of the first
+element matched by each selector in turn (every matched element with
+`"all": True`) until one gives a value. `regex` picks `group` out of that text and `type` converts
+it; `value` is returned instead when the rule matches. A `url` rule reads
+the page URL, a `field` rule copies an earlier field, and a bare `value`
+is a default. Rules only look at the elements their selectors point to,
+never the whole document's text.
+
+Listing pages (search results, store pages) also set `cards`:
+
+    "cards": {"selectors": [...], "fields": {...}}
+
+Every element matched by the card selectors is run through the card
+`fields`, with selectors relative to the card, and the list goes into the
+extracted data as `items`.
+
+Every site is compiled once: into a single JavaScript function for
+page.evaluate() and into precompiled lxml selectors and regexes for the
+HTTP fast path. Both run the same rules, so they return the same fields.
+"""
+
+import json
+import re
+from typing import Dict, Optional
+from lxml.cssselect import CSSSelector
+from lxml import html as lxml_html
+from .sites import get_site
+
+_PAGE_FUNCTION = """() => {
+    const fields = __FIELDS__;
+    const cards = __CARDS__;
+    const compile = (fieldList) => {
+        for (const [, rules] of fieldList) {
+            for (const rule of rules) {
+                if (rule.regex) rule.re = new RegExp(rule.regex, rule.flags || "");
+            }
+        }
+    };
+    compile(fields);
+    if (cards) compile(cards.fields);
+
+    const convert = (text, type) => {
+        if (type === "float" || type === "int") {
+            const clean = text.replace(/,/g, "");
+            const number = type === "float" ? parseFloat(clean) : parseInt(clean, 10);
+            return Number.isNaN(number) ? null : number;
+        }
+        return text || null;
+    };
+
+    const apply = (rule, text) => {
+        let match = text;
+        if (rule.re) {
+            const found = text.match(rule.re);
+            if (!found) return null;
+            match = found[rule.group || 0] || "";
+        }
+        if ("value" in rule) return rule.value;
+        return convert(match.trim(), rule.type);
+    };
+
+    const extract = (fieldList, root) => {
+        const data = {};
+        for (const [name, rules] of fieldList) {
+            let value = null;
+            for (const rule of rules) {
+                if (rule.field) {
+                    value = data[rule.field] ?? null;
+                } else if (rule.url) {
+                    value = apply(rule, window.location.href);
+                } else if (rule.selectors) {
+                    for (const selector of rule.selectors) {
+                        const elements = rule.all
+                            ? root.querySelectorAll(selector)
+                            : [root.querySelector(selector)].filter(Boolean);
+                        for (const element of elements) {
+                            const text = rule.attr ? element.getAttribute(rule.attr) : element.textContent;
+                            value = apply(rule, (text || "").trim());
+                            if (value !== null) break;
+                        }
+                        if (value !== null) break;
+                    }
+                } else if ("value" in rule) {
+                    value = rule.value;
+                }
+                if (value !== null) break;
+            }
+            data[name] = value;
+        }
+        return data;
+    };
+
+    const data = extract(fields, document);
+    if (cards) {
+        const elements = document.querySelectorAll(cards.selectors.join(", "));
+        data.items = Array.from(elements, (card) => extract(cards.fields, card));
+    }
+    return data;
+}"""
+
+_NUMBER = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)")
+
+
+def _convert(text: str, value_type: Optional[str]):
+    """Same conversion as the in-page function (parseFloat/parseInt semantics)."""
+    if value_type in ("float", "int"):
+        match = _NUMBER.match(text.replace(",", ""))
+        if not match:
+            return None
+        number = float(match.group(0))
+        return number if value_type == "float" else int(number)
+    return text or None
+
+
+class _Rule:
+    """One field rule with its selectors and regex compiled for lxml."""
+
+    def __init__(self, rule: dict):
+        self.rule = rule
+        self.selectors = [CSSSelector(selector) for selector in rule.get("selectors", [])]
+        flags = re.I if "i" in rule.get("flags", "") else 0
+        self.regex = re.compile(rule["regex"], flags) if rule.get("regex") else None
+
+    def apply(self, text: str):
+        match = text
+        if self.regex is not None:
+            found = self.regex.search(text)
+            if not found:
+                return None
+            match = found.group(self.rule.get("group", 0)) or ""
+        if "value" in self.rule:
+            return self.rule["value"]
+        return _convert(match.strip(), self.rule.get("type"))
+
+    def extract(self, doc, url: str, data: dict):
+        if self.rule.get("field"):
+            return data.get(self.rule["field"])
+        if self.rule.get("url"):
+            return self.apply(url)
+        if self.selectors:
+            for selector in self.selectors:
+                elements = selector(doc) if self.rule.get("all") else selector(doc)[:1]
+                for element in elements:
+                    text = element.get(self.rule["attr"]) if self.rule.get("attr") else element.text_content()
+                    value = self.apply((text or "").strip())
+                    if value is not None:
+                        return value
+            return None
+        return self.rule.get("value")
+
+
+def _compile_fields(fields: dict) -> list:
+    return [(name, [_Rule(rule) for rule in rules]) for name, rules in fields.items()]
+
+
+def _extract_fields(compiled: list, root, url: str) -> dict:
+    data = {}
+    for name, rules in compiled:
+        value = None
+        for rule in rules:
+            value = rule.extract(root, url, data)
+            if value is not None:
+                break
+        data[name] = value
+    return data
+
+
+class SiteExtractor:
+    """The compiled form of one site's `fields` (and `cards`, for listing pages)."""
+
+    def __init__(self, site: str, fields: dict, cards: Optional[dict] = None):
+        self.site = site
+        self._rules = _compile_fields(fields)
+        self._card_selector = CSSSelector(", ".join(cards["selectors"])) if cards else None
+        self._card_rules = _compile_fields(cards["fields"]) if cards else None
+        # Built once; page.evaluate() gets the same source string every time
+        cards_json = json.dumps(
+            {"selectors": cards["selectors"], "fields": list(cards["fields"].items())} if cards else None
+        )
+        self.page_function = (
+            _PAGE_FUNCTION
+            .replace("__FIELDS__", json.dumps(list(fields.items())))
+            .replace("__CARDS__", cards_json)
+        )
+
+    def extract_html(self, page_html, url: str) -> dict:
+        """Run the rules on an HTML string (or an already parsed lxml document)."""
+        doc = lxml_html.fromstring(page_html) if isinstance(page_html, (str, bytes)) else page_html
+        data = _extract_fields(self._rules, doc, url)
+        if self._card_selector is not None:
+            data["items"] = [_extract_fields(self._card_rules, card, url) for card in self._card_selector(doc)]
+        return data
+
+    async def extract_page(self, page) -> dict:
+        """Run the rules inside a Playwright page."""
+        return await page.evaluate(self.page_function)
+
+
+_extractors: Dict[str, SiteExtractor] = {}
+
+
+def get_extractor(site: str) -> SiteExtractor:
+    """Return the compiled extractor for `site`, building it on first use."""
+    extractor = _extractors.get(site)
+    if extractor is None:
+        settings = get_site(site)
+        extractor = SiteExtractor(site, settings["fields"], settings.get("cards"))
+        _extractors[site] = extractor
+    return extractor
@@ -0,0 +1,289 @@
+"""
+HTTP-only fast path.
+
+Fetches product pages with a pooled httpx client and runs the site's
+extractor (see extractors.py) on lxml, so most items never need a
+browser. Callers fall back to Playwright when a captcha is detected or a
+required field is missing.
+
+Check the extractors against the saved pages in fixtures/:
+
+    python -m scraper.http_fast_path --check fixtures
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Optional
+from urllib.parse import urljoin, urlparse
+import httpx
+from lxml import html as lxml_html
+from .browser_pool import DEFAULT_USER_AGENT
+from .extractors import get_extractor
+from .identity_pool import current_identity, identity_pool
+from .logs import get_logger
+from .metrics import captcha_hits
+from .zip_session import load_zip_session
+
+log = get_logger(__name__)
+
+REQUIRED_FIELDS = {
+    "ebay": ["title", "price"],
+    "amazon": ["title", "discountedPrice"],
+}
+
+# Interstitial-specific only: "Continue shopping" alone also shows up on normal product and cart pages
+CAPTCHA_MARKERS = [
+    "validateCaptcha",
+    "captcha_form",
+    "splashui/challenge",
+    "Enter the characters you see below",
+]
+
+# One client per identity (proxy + headers), see identity_pool.py
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client of the current identity (connection pooled, keep-alive)."""
+    identity = current_identity.get()
+    name = identity.name if identity is not None else "direct"
+    client = _clients.get(name)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers={
+                "User-Agent": (identity and identity.user_agent) or DEFAULT_USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": identity.accept_language if identity is not None else "en-US,en;q=0.9",
+            },
+            proxy=identity.proxy if identity is not None else None,
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        _clients[name] = client
+    return client
+
+
+async def close_http_client():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+# --- Extraction (same rules as the in-page extractors, see extractors.py) ---
+
+def _text(element) -> str:
+    return (element.text_content() or "").strip() if element is not None else ""
+
+
+def _first(doc, *selectors):
+    for selector in selectors:
+        found = doc.cssselect(selector)
+        if found:
+            return found[0]
+    return None
+
+
+def extract_ebay_html(page_html, url: str) -> dict:
+    return get_extractor("ebay").extract_html(page_html, url)
+
+
+def extract_amazon_html(page_html, url: str, zip_code: str) -> dict:
+    data = get_extractor("amazon").extract_html(page_html, url)
+    data["locationZipCode"] = zip_code
+    return data
+
+
+def clean_listing_data(data: dict, page_url: str) -> dict:
+    """
+    Tidy what the ebay_listing extractor returned: drop ad/placeholder
+    cards (no item number) and repeats, reduce item links to the plain
+    /itm/<id> URL and make `nextPage` absolute.
+    """
+    base = urlparse(page_url)
+    items, seen = [], set()
+    for item in data.get("items") or []:
+        item_id = item.get("itemNumber")
+        if not item_id or item_id in seen:
+            continue
+        seen.add(item_id)
+        link = urlparse(urljoin(page_url, item.get("url") or ""))
+        item["url"] = f"{link.scheme or base.scheme}://{link.netloc or base.netloc}/itm/{item_id}"
+        items.append(item)
+    data["items"] = items
+    if data.get("nextPage"):
+        data["nextPage"] = urljoin(page_url, data["nextPage"])
+    return data
+
+
+def extract_ebay_listing_html(page_html, url: str) -> dict:
+    return clean_listing_data(get_extractor("ebay_listing").extract_html(page_html, url), url)
+
+
+def amazon_html_location(page_html) -> str:
+    """Text of the header's 'Deliver to' line, or '' if it isn't there."""
+    doc = lxml_html.fromstring(page_html) if isinstance(page_html, str) else page_html
+    return _text(_first(doc, "#glow-ingress-line2"))
+
+
+def looks_like_captcha(page_html: str, final_url: str) -> bool:
+    return "captcha" in final_url.lower() or any(marker in page_html for marker in CAPTCHA_MARKERS)
+
+
+def missing_fields(site: str, data: dict) -> list:
+    return [field for field in REQUIRED_FIELDS[site] if data.get(field) in (None, "")]
+
+
+# --- Fetching ---
+
+def _zip_cookie_header(url: str, zip_code: str) -> Optional[str]:
+    """Cookie header from the saved browser session for `zip_code`, if any."""
+    storage_state = load_zip_session(zip_code)
+    if not storage_state:
+        return None
+    host = urlparse(url).hostname or ""
+    cookies = [
+        f"{c['name']}={c['value']}"
+        for c in storage_state.get("cookies", [])
+        if host.endswith(c.get("domain", "").lstrip("."))
+    ]
+    return "; ".join(cookies) or None
+
+
+async def _fetch(url: str, headers: Optional[dict] = None):
+    response = await get_http_client().get(url, headers=headers)
+    response.raise_for_status()
+    return response.text, str(response.url)
+
+
+async def fetch_ebay_http(item_url: str) -> Optional[dict]:
+    """Scrape an eBay item over plain HTTP. Returns None when the browser is needed."""
+    try:
+        page_html, final_url = await _fetch(item_url)
+    except Exception as e:
+        log.warning("HTTP fetch failed", url=item_url, error=str(e))
+        return None
+
+    if looks_like_captcha(page_html, final_url):
+        log.info("Captcha on HTTP fetch, falling back to browser", url=item_url)
+        captcha_hits.inc("ebay")
+        identity_pool.record_captcha()
+        return None
+
+    data = extract_ebay_html(page_html, final_url)
+    missing = missing_fields("ebay", data)
+    if missing:
+        log.info("Missing fields over HTTP, falling back to browser", url=item_url, missing=missing)
+        return None
+
+    data["url"] = item_url
+    data["source"] = "http"
+    return {"success": True, "data": data}
+
+
+async def fetch_ebay_listing_http(page_url: str) -> Optional[dict]:
+    """Scrape one eBay search/store page over plain HTTP. Returns None when the browser is needed."""
+    try:
+        page_html, final_url = await _fetch(page_url)
+    except Exception as e:
+        log.warning("HTTP fetch failed", url=page_url, error=str(e))
+        return None
+
+    if looks_like_captcha(page_html, final_url):
+        log.info("Captcha on HTTP fetch, falling back to browser", url=page_url)
+        captcha_hits.inc("ebay_listing")
+        identity_pool.record_captcha()
+        return None
+
+    data = extract_ebay_listing_html(page_html, final_url)
+    if not data["items"]:
+        log.info("No items over HTTP, falling back to browser", url=page_url)
+        return None
+
+    data["url"] = page_url
+    data["source"] = "http"
+    return {"success": True, "data": data}
+
+
+async def fetch_amazon_http(product_url: str, zip_code: str) -> Optional[dict]:
+    """
+    Scrape an Amazon product over plain HTTP using the saved session for
+    `zip_code`. Returns None when the browser is needed (no session yet,
+    wrong location, captcha or missing fields).
+    """
+    cookie_header = _zip_cookie_header(product_url, zip_code)
+    if cookie_header is None:
+        return None
+
+    try:
+        page_html, final_url = await _fetch(product_url, headers={"Cookie": cookie_header})
+    except Exception as e:
+        log.warning("HTTP fetch failed", url=product_url, error=str(e))
+        return None
+
+    if looks_like_captcha(page_html, final_url):
+        log.info("Captcha on HTTP fetch, falling back to browser", url=product_url)
+        captcha_hits.inc("amazon")
+        identity_pool.record_captcha()
+        return None
+    # Parse once for both the location check and the extractor
+    doc = lxml_html.fromstring(page_html)
+    if zip_code not in amazon_html_location(doc):
+        return None
+
+    data = extract_amazon_html(doc, final_url, zip_code)
+    missing = missing_fields("amazon", data)
+    if missing:
+        log.info("Missing fields over HTTP, falling back to browser", url=product_url, missing=missing)
+        return None
+
+    data["url"] = product_url
+    data["source"] = "http"
+    return {"success": True, "data": data}
+
+
+# --- Fixture check ---
+
+def check_fixtures(fixtures_dir: str) -> bool:
+    """
+    Run the extractors over saved pages and compare with expected.json.
+
+    expected.json maps a fixture file name to {"site", "url", "zipCode"?,
+    "expected": {field: value}}.
+    """
+    with open(os.path.join(fixtures_dir, "expected.json"), "r") as f:
+        cases = json.load(f)
+
+    all_ok = True
+    for file_name, case in cases.items():
+        with open(os.path.join(fixtures_dir, file_name), "r", encoding="utf-8") as f:
+            page_html = f.read()
+
+        if case["site"] == "ebay":
+            data = extract_ebay_html(page_html, case["url"])
+        elif case["site"] == "ebay_listing":
+            data = extract_ebay_listing_html(page_html, case["url"])
+        else:
+            data = extract_amazon_html(page_html, case["url"], case.get("zipCode", "75007"))
+
+        mismatches = {
+            field: (data.get(field), expected)
+            for field, expected in case["expected"].items()
+            if data.get(field) != expected
+        }
+        if mismatches:
+            all_ok = False
+            print(f"❌ {file_name}: {mismatches}")
+        else:
+            print(f"✅ {file_name}")
+    return all_ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the HTTP extractors against saved HTML pages.")
+    parser.add_argument("--check", metavar="DIR", default="fixtures", help="fixtures directory")
+    args = parser.parse_args()
+    sys.exit(0 if check_fixtures(args.check) else 1)
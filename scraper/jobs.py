@@ -0,0 +1,281 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+from .csv_batch import DEFAULT_CHUNK_SIZE, ResultWriter, count_csv_urls, stream_csv_batch
+from .ebay_scraper import stream_amazon_from_csv, stream_ebay_from_csv
+from .logs import correlation_id, get_logger
+from .scheduler import RetryStats
+
+log = get_logger(__name__)
+
+MAX_FINISHED_JOBS = 100
+# Finished jobs older than this (seconds) are dropped, with the result files of
+# /upload jobs, when the next job is submitted
+FINISHED_JOB_TTL = float(os.environ.get("FINISHED_JOB_TTL", str(24 * 60 * 60)))
+
+STREAMS = {"ebay": stream_ebay_from_csv, "amazon": stream_amazon_from_csv}
+
+
+class ScrapeJob:
+    """
+    One submitted batch. Runs as a task on the scraper event loop; other
+    threads only read its counters and results.
+    """
+
+    def __init__(self, site: str, urls: List[str], options: dict):
+        self.id = uuid.uuid4().hex
+        self.site = site
+        self.urls = urls
+        self.total = len(urls)
+        self.options = options
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.results: List[dict] = []
+        self.failed_urls: List[str] = []
+        self.retry_stats = RetryStats()
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def successful_count(self) -> int:
+        return len(self.results)
+
+    @property
+    def failed_count(self) -> int:
+        return len(self.failed_urls)
+
+    @property
+    def done_count(self) -> int:
+        return self.successful_count + self.failed_count
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "cancelled", "error")
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished or not self.done_count:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / self.done_count * (self.total - self.done_count), 1)
+
+    def progress(self) -> dict:
+        return {
+            "jobId": self.id,
+            "site": self.site,
+            "status": self.status,
+            "totalUrls": self.total,
+            "done": self.successful_count,
+            "failed": self.failed_count,
+            "remaining": self.total - self.done_count,
+            "etaSeconds": self.eta_seconds(),
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "error": self.error,
+        }
+
+    def summary(self, offset: int = 0) -> dict:
+        """Results so far, in the usual batch-summary shape (from `offset` on)."""
+        return {
+            "results": self.results[offset:],
+            "totalUrls": len(self.urls),
+            "successfulScrapes": len(self.results),
+            "failedScrapes": len(self.failed_urls),
+            "failedUrls": list(self.failed_urls),
+            "cacheHits": sum(1 for data in self.results if data.get("cached")),
+            **self.retry_stats.to_dict(),
+        }
+
+    def stream(self):
+        return STREAMS[self.site](self.urls, **self.options)
+
+    def open(self):
+        pass
+
+    def add_result(self, event: dict):
+        self.retry_stats.add(event)
+        if event["success"]:
+            self.results.append(event["data"])
+        else:
+            self.failed_urls.append(event["url"])
+
+    def close(self):
+        pass
+
+    def remove_files(self):
+        pass
+
+
+class FileScrapeJob(ScrapeJob):
+    """
+    A job over a CSV file (see csv_batch.py). URLs are read as they are
+    needed and results go straight to `output_path`, so only counters stay
+    in memory.
+    """
+
+    def __init__(self, site: str, input_path: str, output_path: str, fmt: str, total: int,
+                 options: dict, chunk_size: int = DEFAULT_CHUNK_SIZE, column: Optional[str] = None):
+        super().__init__(site, [], options)
+        self.input_path = input_path
+        self.output_path = output_path
+        self.format = fmt
+        self.total = total
+        self.chunk_size = chunk_size
+        self.column = column
+        self.successful = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.writer: Optional[ResultWriter] = None
+
+    @property
+    def successful_count(self) -> int:
+        return self.successful
+
+    @property
+    def failed_count(self) -> int:
+        return self.failed
+
+    def progress(self) -> dict:
+        return {**super().progress(), "format": self.format}
+
+    def summary(self, offset: int = 0) -> dict:
+        """Counts only; the results themselves are in the output file."""
+        return {
+            "totalUrls": self.total,
+            "successfulScrapes": self.successful,
+            "failedScrapes": self.failed,
+            "cacheHits": self.cache_hits,
+            "format": self.format,
+            **self.retry_stats.to_dict(),
+        }
+
+    def stream(self):
+        return stream_csv_batch(self.site, self.input_path, self.chunk_size, self.column, **self.options)
+
+    def open(self):
+        self.writer = ResultWriter(self.output_path, self.site, self.format)
+
+    def add_result(self, event: dict):
+        self.retry_stats.add(event)
+        self.writer.write(event)
+        if event["success"]:
+            self.successful += 1
+            self.cache_hits += bool(event["data"].get("cached"))
+        else:
+            self.failed += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        # The uploaded CSV is read once; the results stay until the job is pruned
+        _remove_file(self.input_path)
+
+    def remove_files(self):
+        _remove_file(self.input_path)
+        _remove_file(self.output_path)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # e.g. still open for a download on Windows
+        log.warning("Could not remove job file", path=path, error=str(e))
+
+
+class JobManager:
+    """Keeps submitted jobs and runs them on the scraper loop."""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+
+    async def _run(self, job: ScrapeJob):
+        # Everything logged for this job, its scrapes included, carries its id
+        correlation_id.set(job.id)
+        job.status = "running"
+        job.started_at = time.time()
+        log.info("Job started", site=job.site, urls=job.total)
+        try:
+            job.open()
+            async for event in job.stream():
+                if event["type"] == "result":
+                    job.add_result(event)
+            job.status = "done"
+            log.info("Job done", done=job.successful_count, failed=job.failed_count)
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            log.error("Job failed", job=job.id, error=str(e))
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            job.close()
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """Drop the oldest finished jobs past MAX_FINISHED_JOBS or FINISHED_JOB_TTL, and their files."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        expired = time.time() - FINISHED_JOB_TTL
+        excess = max(0, len(finished) - MAX_FINISHED_JOBS)
+        for index, job_id in enumerate(finished):
+            job = self.jobs[job_id]
+            if index < excess or job.finished_at < expired:
+                del self.jobs[job_id]
+                job.remove_files()
+
+    async def submit(self, site: str, urls: List[str], **options) -> ScrapeJob:
+        """Create a job and start it. Must be awaited on the scraper loop."""
+        if site not in STREAMS:
+            raise ValueError(f"Unknown site: {site}")
+        return self._start(ScrapeJob(site, urls, options))
+
+    async def submit_file(self, site: str, input_path: str, output_path: str, fmt: str = "csv",
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, column: Optional[str] = None,
+                          **options) -> FileScrapeJob:
+        """Create and start a FileScrapeJob. Must be awaited on the scraper loop."""
+        if site not in STREAMS:
+            raise ValueError(f"Unknown site: {site}")
+        try:
+            total = await asyncio.to_thread(count_csv_urls, input_path, column)
+        except Exception:
+            _remove_file(input_path)
+            raise
+        job = FileScrapeJob(site, input_path, output_path, fmt, total, options, chunk_size, column)
+        return self._start(job)
+
+    def _start(self, job: ScrapeJob) -> ScrapeJob:
+        self.jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[ScrapeJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[dict]:
+        return [job.progress() for job in self.jobs.values()]
+
+    async def cancel(self, job_id: str) -> Optional[ScrapeJob]:
+        """Cancel a running job; finished jobs are left untouched."""
+        job = self.jobs.get(job_id)
+        if job is not None and job.task is not None and not job.task.done():
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+            if not job.finished:
+                # Cancelled before it ever started running
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+
+job_manager = JobManager()
@@ -0,0 +1,217 @@
+"""
+Structured, non-blocking logging for the scraper.
+
+    log = get_logger(__name__)
+    log.info("Retrying", url=url, delay=1.5)
+    log.exception("Request failed", route=path)   # in an except block: adds a `traceback` field
+
+A log call on the scraping path only checks the level and puts the record
+on a bounded queue; a background thread formats it, writes it to stdout
+and keeps it in memory. When the queue is full the record is dropped (and
+counted, see log_stats()) rather than waiting.
+
+Every record carries the current correlation id, e.g. the job id set by
+JobManager, and lands in two ring buffers: the LOG_BUFFER_SIZE most recent
+records overall and the LOG_JOB_BUFFER_SIZE most recent per correlation id
+(for the last MAX_LOG_BUFFERS ids). recent_logs() reads them for the /logs
+and /jobs/<id>/logs routes.
+
+Settings (env):
+    LOG_LEVEL                 DEBUG, INFO (default), WARNING or ERROR
+    LOG_FORMAT                "text" (default) or "json" lines on stdout
+    PAGE_CONSOLE_SAMPLE_RATE  share of browser console messages to log,
+                              0 (default) attaches no console listener at all
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_BUFFER_SIZE = int(os.environ.get("LOG_BUFFER_SIZE", "2000"))
+LOG_JOB_BUFFER_SIZE = int(os.environ.get("LOG_JOB_BUFFER_SIZE", "500"))
+MAX_LOG_BUFFERS = 100
+PAGE_CONSOLE_SAMPLE_RATE = float(os.environ.get("PAGE_CONSOLE_SAMPLE_RATE", "0"))
+
+# Set per job (or per request); asyncio tasks inherit it from their creator
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+
+class StructuredLogger:
+    """A stdlib logger taking keyword fields; below-level calls cost one check."""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level: int, message: str, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra={"fields": fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields)
+
+    def exception(self, message: str, **fields):
+        """An ERROR record with the traceback of the exception being handled."""
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(message, exc_info=True, extra={"fields": fields})
+
+
+def record_to_dict(record: logging.LogRecord) -> dict:
+    return {
+        "time": record.created,
+        "level": record.levelname,
+        "logger": record.name,
+        "correlationId": getattr(record, "correlation_id", None),
+        "message": record.getMessage(),
+        **getattr(record, "fields", {}),
+    }
+
+
+_exc_formatter = logging.Formatter()
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Stamps the correlation id and never waits for room in the queue."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        record.correlation_id = correlation_id.get()
+        if record.exc_info:
+            # A field rather than part of the message, which prepare() would fold it into
+            traceback = _exc_formatter.formatException(record.exc_info)
+            record.fields = {**getattr(record, "fields", {}), "traceback": traceback}
+            record.exc_info = None
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} "
+        cid = getattr(record, "correlation_id", None)
+        if cid:
+            line += f"[{str(cid)[:8]}] "
+        line += record.getMessage()
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record_to_dict(record), default=str)
+
+
+class LogBuffer(logging.Handler):
+    """Ring buffers of recent records: one overall and one per correlation id."""
+
+    def __init__(self):
+        super().__init__()
+        self.recent = deque(maxlen=LOG_BUFFER_SIZE)
+        self.by_id: "OrderedDict[str, deque]" = OrderedDict()
+        self._buffer_lock = threading.Lock()
+
+    def emit(self, record):
+        entry = record_to_dict(record)
+        cid = entry["correlationId"]
+        with self._buffer_lock:
+            self.recent.append(entry)
+            if cid is not None:
+                buffer = self.by_id.get(cid)
+                if buffer is None:
+                    buffer = self.by_id[cid] = deque(maxlen=LOG_JOB_BUFFER_SIZE)
+                    while len(self.by_id) > MAX_LOG_BUFFERS:
+                        self.by_id.popitem(last=False)
+                buffer.append(entry)
+
+    def read(self, cid: Optional[str] = None, level: Optional[str] = None, limit: int = 200) -> List[dict]:
+        with self._buffer_lock:
+            entries = list(self.recent if cid is None else self.by_id.get(cid, ()))
+        if level:
+            threshold = logging.getLevelName(level.upper())
+            if isinstance(threshold, int):
+                entries = [e for e in entries if logging.getLevelName(e["level"]) >= threshold]
+        return entries[-limit:] if limit > 0 else entries
+
+
+log_buffer = LogBuffer()
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+_queue_handler = _NonBlockingQueueHandler(_log_queue)
+
+
+def _configure():
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(_JsonFormatter() if LOG_FORMAT == "json" else _TextFormatter())
+    listener = QueueListener(_log_queue, console, log_buffer)
+    listener.start()
+    atexit.register(listener.stop)  # flush what is still queued
+
+    root = logging.getLogger("scraper")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+
+_configure()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Logger under the "scraper" namespace, e.g. get_logger(__name__)."""
+    return StructuredLogger(name if name.startswith("scraper") else f"scraper.{name}")
+
+
+def recent_logs(cid: Optional[str] = None, level: Optional[str] = None, limit: int = 200) -> List[dict]:
+    """The newest `limit` buffered records, overall or for one correlation id."""
+    return log_buffer.read(cid, level, limit)
+
+
+def log_stats() -> dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger("scraper").level),
+        "queued": _log_queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "pageConsoleSampleRate": PAGE_CONSOLE_SAMPLE_RATE,
+    }
+
+
+_page_log = get_logger("scraper.page")
+
+
+def log_page_console(page, site: str):
+    """Log a sample of the page's console messages (none unless PAGE_CONSOLE_SAMPLE_RATE > 0)."""
+    if PAGE_CONSOLE_SAMPLE_RATE <= 0:
+        return
+
+    def on_console(msg):
+        if random.random() < PAGE_CONSOLE_SAMPLE_RATE:
+            _page_log.info("Page console", site=site, type=msg.type, text=msg.text[:500], url=page.url)
+
+    page.on("console", on_console)
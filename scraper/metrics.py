@@ -0,0 +1,231 @@
+"""
+In-process counters and histograms, rendered in the Prometheus text format
+by the /metrics route. Updates are a dict lookup and a few additions under
+an uncontended lock, so they stay on in production.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from .retry_policy import classify_failure
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def clear(self):
+        """Drop every series (e.g. before setting one per live browser)."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._values[label_values] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for label_values, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labels + ("le",), label_values + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            base_labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{base_labels} {series[-2]}")
+            lines.append(f"{self.name}_count{base_labels} {series[-1]}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        metric = Gauge(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "scraper_stage_seconds", "Time spent in each stage of a scrape.", ("site", "stage")
+)
+scrape_seconds = registry.histogram(
+    "scraper_url_seconds", "Total time to scrape one URL.", ("site", "source")
+)
+scrape_results = registry.counter(
+    "scraper_results_total", "Scrape outcomes by status and failure reason.", ("site", "status", "reason")
+)
+captcha_hits = registry.counter(
+    "scraper_captcha_total", "Captcha or 'Continue shopping' pages encountered.", ("site",)
+)
+zip_modal_runs = registry.counter(
+    "scraper_zip_modal_total", "Times the Amazon ZIP modal had to be run instead of a saved session.", ("outcome",)
+)
+cache_hits = registry.counter(
+    "scraper_cache_hits_total", "Results served from the result cache.", ("site",)
+)
+scrape_retries = registry.counter(
+    "scraper_retries_total", "Scrapes retried after a transient failure, by reason.", ("site", "reason")
+)
+blocked_requests = registry.counter(
+    "scraper_blocked_requests_total", "Page subrequests aborted by the request blocker, by resource type.",
+    ("site", "type"),
+)
+allowed_bytes = registry.counter(
+    "scraper_allowed_bytes_total", "Declared Content-Length of the responses browser pages let through.", ("site",)
+)
+http_fallbacks = registry.counter(
+    "scraper_http_fallback_total", "HTTP fast-path attempts that fell back to the browser.", ("site",)
+)
+rss_bytes = registry.gauge(
+    "scraper_rss_bytes", "Resident memory of the Python process, the Playwright driver and each browser.", ("process",)
+)
+open_pages = registry.gauge(
+    "scraper_open_pages", "Pages currently open per pooled browser.", ("browser",)
+)
+memory_pressure = registry.gauge(
+    "scraper_memory_pressure", "Resource governor pressure level: 0 ok, 1 high, 2 critical."
+)
+browser_recycles = registry.counter(
+    "scraper_browser_recycles_total", "Browsers relaunched by the resource governor, by reason.", ("reason",)
+)
+identity_health = registry.gauge(
+    "scraper_identity_health", "Health score (0-1) of each proxy identity.", ("identity",)
+)
+identity_benches = registry.counter(
+    "scraper_identity_benched_total", "Times an identity was benched for low health.", ("identity",)
+)
+
+
+class StageTimer:
+    """
+    Times the stages of one scrape:
+
+        timer = StageTimer("ebay")
+        with timer.stage("goto"):
+            await page.goto(...)
+
+    Each stage is observed in `scraper_stage_seconds` and kept in
+    `timer.stages` so it can be attached to the result.
+    """
+
+    def __init__(self, site: str):
+        self.site = site
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = round(self.stages.get(name, 0) + elapsed, 4)
+            stage_seconds.observe(elapsed, self.site, name)
+
+    def finish(self, source: Optional[str] = None) -> dict:
+        """Record the total and return {stage: seconds, ..., "total": seconds}."""
+        total = time.perf_counter() - self.started
+        scrape_seconds.observe(total, self.site, source or "unknown")
+        return {**self.stages, "total": round(total, 4)}
+
+
+def record_result(site: str, result: dict):
+    if result.get("success"):
+        scrape_results.inc(site, "success", "")
+    else:
+        scrape_results.inc(site, "failed", classify_failure(result))
+    blocked = result.get("blocked")
+    if blocked:
+        for resource_type, count in blocked["blockedByType"].items():
+            blocked_requests.inc(site, resource_type, amount=count)
+        allowed_bytes.inc(site, amount=blocked["allowedBytes"])
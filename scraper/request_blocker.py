@@ -0,0 +1,75 @@
+from typing import Iterable
+from urllib.parse import urlparse
+from playwright.async_api import Page, Route
+from .sites import get_site
+
+
+def _host_matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class BlockStats:
+    """Per-page counters for what the request blocker let through or dropped."""
+
+    def __init__(self):
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "blockedRequests": self.blocked_requests,
+            "blockedByType": dict(self.blocked_by_type),
+            "allowedRequests": self.allowed_requests,
+            "allowedBytes": self.allowed_bytes,
+        }
+
+
+async def install_request_blocking(page: Page, site: str) -> BlockStats:
+    """
+    Abort requests the extractors don't need (see sites.SITES for the rules).
+
+    Aborted requests are never downloaded, so the bytes they would have
+    cost can't be measured; the returned stats count them by resource type
+    and total the declared Content-Length of what was let through
+    (`allowedBytes`, so before/after runs show the saving).
+    """
+    settings = get_site(site)
+    blocked_types = set(settings.get("block_resource_types", []))
+    allow_domains = settings.get("allow_domains") or []
+    deny_domains = settings.get("deny_domains") or []
+    stats = BlockStats()
+
+    def should_block(request) -> bool:
+        if request.is_navigation_request() and request.frame == page.main_frame:
+            return False
+        if request.resource_type in blocked_types:
+            return True
+
+        host = (urlparse(request.url).hostname or "").lower()
+        if _host_matches(host, deny_domains):
+            return True
+        page_host = (urlparse(page.url).hostname or "").lower()
+        if allow_domains and host != page_host and not _host_matches(host, allow_domains):
+            return True
+        return False
+
+    async def handle(route: Route):
+        request = route.request
+        if should_block(request):
+            stats.blocked_requests += 1
+            stats.blocked_by_type[request.resource_type] = stats.blocked_by_type.get(request.resource_type, 0) + 1
+            await route.abort()
+        else:
+            stats.allowed_requests += 1
+            await route.continue_()
+
+    def on_response(response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            stats.allowed_bytes += int(length)
+
+    await page.route("**/*", handle)
+    page.on("response", on_response)
+    return stats
@@ -0,0 +1,278 @@
+"""
+Resource governor: keeps long-running scrapes memory-bounded.
+
+Every GOVERNOR_INTERVAL seconds it measures the RSS of this process, the
+Playwright driver and each pooled browser (renderers included), and the
+host's memory use. Then:
+
+  - a browser past BROWSER_MAX_RSS_MB or BROWSER_MAX_AGE seconds is
+    recycled: drained, closed and relaunched on its next page
+  - under memory pressure, idle browser contexts are closed and the
+    scheduler gets backpressure through page_slot():
+
+        ok        no extra limit
+        high      at most half of the scheduler's global page slots
+        critical  one page at a time; the biggest browser is recycled
+
+Pressure is high past MEMORY_HIGH_PERCENT of host memory (or of
+PROCESS_MAX_RSS_MB for this process tree, when set) and critical past
+MEMORY_CRITICAL_PERCENT.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import psutil
+from .browser_pool import get_browser_pool_if_started
+from .logs import get_logger
+from .metrics import browser_recycles, memory_pressure, open_pages, rss_bytes
+
+log = get_logger(__name__)
+
+GOVERNOR_INTERVAL = float(os.environ.get("GOVERNOR_INTERVAL", "5"))
+BROWSER_MAX_RSS_MB = float(os.environ.get("BROWSER_MAX_RSS_MB", "1500"))
+BROWSER_MAX_AGE = float(os.environ.get("BROWSER_MAX_AGE", "3600"))
+PROCESS_MAX_RSS_MB = float(os.environ.get("PROCESS_MAX_RSS_MB", "0"))  # 0 = host memory only
+MEMORY_HIGH_PERCENT = float(os.environ.get("MEMORY_HIGH_PERCENT", "85"))
+MEMORY_CRITICAL_PERCENT = float(os.environ.get("MEMORY_CRITICAL_PERCENT", "93"))
+# Under critical pressure, don't relaunch the same fresh browser over and over
+PRESSURE_RECYCLE_MIN_AGE = 60.0
+
+PRESSURE_LEVELS = ("ok", "high", "critical")
+MB = 1024 * 1024
+
+
+def _process_rss(process: psutil.Process) -> int:
+    try:
+        return process.memory_info().rss
+    except psutil.Error:
+        return 0
+
+
+def _tree_rss(process: psutil.Process) -> int:
+    """RSS of `process` and all its descendants."""
+    total = _process_rss(process)
+    try:
+        children = process.children(recursive=True)
+    except psutil.Error:
+        return total
+    return total + sum(_process_rss(child) for child in children)
+
+
+class ResourceGovernor:
+    """Samples memory, recycles browsers and throttles new pages (see module docstring)."""
+
+    def __init__(self):
+        self.interval = GOVERNOR_INTERVAL
+        self.browser_max_rss = BROWSER_MAX_RSS_MB * MB
+        self.browser_max_age = BROWSER_MAX_AGE
+        self.process_max_rss = PROCESS_MAX_RSS_MB * MB
+        self.high_percent = MEMORY_HIGH_PERCENT
+        self.critical_percent = MEMORY_CRITICAL_PERCENT
+        self.max_pages: Optional[int] = None  # normal page limit, set from the scheduler
+        self.pressure = "ok"
+        self.in_flight = 0
+        self.recycles: Dict[str, int] = {}
+        self.last_sample: dict = {}
+        self.task: Optional[asyncio.Task] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._process = psutil.Process()
+        self._browser_processes: Dict[str, psutil.Process] = {}
+
+    def configure(self, **settings):
+        """Override thresholds, e.g. configure(browser_max_rss=800 * MB, interval=2)."""
+        for key, value in settings.items():
+            if not hasattr(self, key):
+                raise AttributeError(f"Unknown governor setting: {key}")
+            setattr(self, key, value)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def page_limit(self) -> Optional[int]:
+        if self.pressure == "critical":
+            return 1
+        if self.pressure == "high":
+            return max(1, (self.max_pages or 2) // 2)
+        return None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new loop (CLI runs, tests): rebind to it
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.task = None
+            self.in_flight = 0
+        if not self.running:
+            self.task = asyncio.create_task(self._run())
+
+    @asynccontextmanager
+    async def page_slot(self):
+        """Hold one page slot; waits while memory pressure lowers the limit."""
+        self._ensure_started()
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.page_limit() is None or self.in_flight < self.page_limit()
+            )
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    async def stop(self):
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                log.error("Resource governor check failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    def _browser_process(self, marker: str) -> Optional[psutil.Process]:
+        """The Chromium process launched with `marker` (see BrowserPool._launch)."""
+        process = self._browser_processes.get(marker)
+        if process is not None and process.is_running():
+            return process
+        try:
+            children = self._process.children(recursive=True)
+        except psutil.Error:
+            return None
+        for child in children:
+            try:
+                if marker in child.cmdline():
+                    self._browser_processes[marker] = child
+                    return child
+            except psutil.Error:
+                continue
+        return None
+
+    def sample(self, slots) -> dict:
+        """Measure memory (blocking psutil calls; run it in a thread)."""
+        browsers = []
+        browsers_rss = 0
+        # Forget browsers that have been relaunched since
+        live = {slot.marker for slot in slots}
+        self._browser_processes = {m: p for m, p in self._browser_processes.items() if m in live}
+        for slot in slots:
+            process = self._browser_process(slot.marker) if slot.browser is not None and slot.marker else None
+            rss = _tree_rss(process) if process is not None else 0
+            browsers_rss += rss
+            browsers.append({
+                "index": slot.index,
+                "rssBytes": rss,
+                "ageSeconds": round(slot.age, 1),
+                "openPages": slot.open_pages,
+                "contexts": len(slot.contexts),
+                "recycling": slot.recycle_reason,
+            })
+        python_rss = _process_rss(self._process)
+        total_rss = _tree_rss(self._process)
+        return {
+            "time": time.time(),
+            "systemMemoryPercent": psutil.virtual_memory().percent,
+            "pythonRssBytes": python_rss,
+            # Mostly the Playwright (node) driver
+            "otherRssBytes": max(0, total_rss - python_rss - browsers_rss),
+            "totalRssBytes": total_rss,
+            "browsers": browsers,
+        }
+
+    def _pressure_for(self, sample: dict) -> str:
+        percent = sample["systemMemoryPercent"]
+        if self.process_max_rss:
+            percent = max(percent, sample["totalRssBytes"] / self.process_max_rss * 100)
+        if percent >= self.critical_percent:
+            return "critical"
+        if percent >= self.high_percent:
+            return "high"
+        return "ok"
+
+    async def _recycle(self, pool, slot, reason: str):
+        self.recycles[reason] = self.recycles.get(reason, 0) + 1
+        browser_recycles.inc(reason)
+        await pool.recycle_browser(slot, reason)
+
+    async def check(self):
+        """One governor pass: sample, recycle, update pressure and metrics."""
+        pool = get_browser_pool_if_started()
+        slots = pool.slots if pool is not None else []
+        sample = await asyncio.to_thread(self.sample, slots)
+        self.last_sample = sample
+
+        previous = self.pressure
+        self.pressure = self._pressure_for(sample)
+        if self.pressure != previous:
+            (log.info if self.pressure == "ok" else log.warning)(
+                "Memory pressure changed",
+                previous=previous,
+                pressure=self.pressure,
+                host_percent=round(sample["systemMemoryPercent"]),
+                scraper_mb=round(sample["totalRssBytes"] / MB),
+            )
+
+        if pool is not None:
+            by_index = {slot.index: slot for slot in slots}
+            for browser in sample["browsers"]:
+                slot = by_index[browser["index"]]
+                if slot.recycle_reason is not None or slot.browser is None:
+                    continue
+                if browser["rssBytes"] > self.browser_max_rss:
+                    await self._recycle(pool, slot, "rss")
+                elif slot.age > self.browser_max_age:
+                    await self._recycle(pool, slot, "age")
+            if self.pressure != "ok":
+                await pool.close_idle_contexts()
+            if self.pressure == "critical" and sample["browsers"]:
+                biggest = max(sample["browsers"], key=lambda b: b["rssBytes"])
+                slot = by_index[biggest["index"]]
+                if slot.recycle_reason is None and slot.browser is not None and slot.age > PRESSURE_RECYCLE_MIN_AGE:
+                    await self._recycle(pool, slot, "pressure")
+
+        rss_bytes.clear()
+        rss_bytes.set(sample["pythonRssBytes"], "python")
+        rss_bytes.set(sample["otherRssBytes"], "driver")
+        open_pages.clear()
+        for browser in sample["browsers"]:
+            rss_bytes.set(browser["rssBytes"], f"browser{browser['index']}")
+            open_pages.set(browser["openPages"], str(browser["index"]))
+        memory_pressure.set(PRESSURE_LEVELS.index(self.pressure))
+
+        # A lower pressure may admit waiting pages again
+        if self._condition is not None:
+            async with self._condition:
+                self._condition.notify_all()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "pressure": self.pressure,
+            "pageLimit": self.page_limit(),
+            "pagesInFlight": self.in_flight,
+            "recycles": dict(self.recycles),
+            "thresholds": {
+                "browserMaxRssBytes": self.browser_max_rss,
+                "browserMaxAgeSeconds": self.browser_max_age,
+                "processMaxRssBytes": self.process_max_rss or None,
+                "memoryHighPercent": self.high_percent,
+                "memoryCriticalPercent": self.critical_percent,
+            },
+            **self.last_sample,
+        }
+
+
+resource_governor = ResourceGovernor()
@@ -0,0 +1,79 @@
+import copy
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "5000"))
+
+_EBAY_ITEM = re.compile(r"/itm/(?:[^/?#]+/)?(\d{9,15})")
+_AMAZON_ASIN = re.compile(r"/(?:dp|gp/product|gp/aw/d|exec/obidos/ASIN)/([A-Z0-9]{10})", re.I)
+
+
+def canonical_key(url: str, zip_code: Optional[str] = None) -> Optional[Tuple[str, str, str, Optional[str]]]:
+    """
+    Reduce a product URL to (site, market, item ID, ZIP).
+
+    Tracking params, slugs and subdomains (www., m., smile.) are ignored.
+    eBay item numbers are global, so every eBay host maps to one market;
+    Amazon ASINs are priced per store, so the store's domain is kept.
+    Returns None for URLs that aren't recognised product pages.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+
+    if "ebay." in host:
+        match = _EBAY_ITEM.search(parsed.path)
+        return ("ebay", "ebay", match.group(1), None) if match else None
+
+    if "amazon." in host:
+        match = _AMAZON_ASIN.search(parsed.path)
+        if not match:
+            return None
+        market = host[host.index("amazon."):]
+        return ("amazon", market, match.group(1).upper(), zip_code)
+
+    return None
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key, value: dict):
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+result_cache = TTLCache()
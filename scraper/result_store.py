@@ -0,0 +1,228 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+from utils.config_manager import CONFIG_DIR
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+RESULTS_DB = os.environ.get("RESULTS_DB", os.path.join(CONFIG_DIR, "results.db"))
+STORE_RESULTS = os.environ.get("STORE_RESULTS", "1") != "0"
+STORE_BATCH_SIZE = 200
+# Seconds a write waits for another process (e.g. worker.py) to release the database
+STORE_BUSY_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    item_id TEXT,
+    zip_code TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL,
+    title TEXT,
+    price REAL,
+    list_price REAL,
+    in_stock INTEGER,
+    stock_count INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    scraped_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_item
+    ON snapshots (site, item_id, zip_code, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_time
+    ON snapshots (scraped_at);
+
+-- One row per item: the most recent successful snapshot
+CREATE TABLE IF NOT EXISTS latest (
+    site TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    zip_code TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL,
+    title TEXT,
+    price REAL,
+    list_price REAL,
+    in_stock INTEGER,
+    stock_count INTEGER,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (site, item_id, zip_code)
+);
+CREATE INDEX IF NOT EXISTS idx_latest_time
+    ON latest (site, scraped_at);
+"""
+
+_COLUMNS = [
+    "site", "item_id", "zip_code", "url", "title", "price", "list_price",
+    "in_stock", "stock_count", "status", "error", "scraped_at",
+]
+
+
+def snapshot_row(site: str, result: dict, zip_code: Optional[str] = None,
+                 item_id: Optional[str] = None) -> dict:
+    """
+    Flatten an eBay or Amazon scrape result into one snapshot row.
+    `item_id` is used when the result itself has none (e.g. failures).
+    """
+    data = result.get("data") or {}
+    stock_count = data.get("stockCount", data.get("numberInStock"))
+    in_stock = data.get("inStock")
+    if in_stock is None and stock_count is not None:
+        in_stock = stock_count > 0
+    return {
+        "site": site,
+        "item_id": data.get("itemNumber") or item_id,
+        "zip_code": zip_code or data.get("locationZipCode") or "",
+        "url": data.get("url") or result.get("url"),
+        "title": data.get("title"),
+        "price": data.get("price", data.get("discountedPrice")),
+        "list_price": data.get("actualPrice"),
+        "in_stock": None if in_stock is None else int(bool(in_stock)),
+        "stock_count": stock_count,
+        "status": "success" if result.get("success") else "failed",
+        "error": result.get("error"),
+        "scraped_at": time.time(),
+    }
+
+
+class ResultStore:
+    """
+    Local SQLite store of every scrape, in WAL mode.
+
+    Rows are buffered and written with executemany in one transaction per
+    batch. Reads use one connection per thread so the API can query while
+    the scraper writes.
+    """
+
+    def __init__(self, path: str = RESULTS_DB, batch_size: int = STORE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[dict] = []
+        # record() runs on the scraper loop, flush() in worker threads
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(STORE_BUSY_TIMEOUT * 1000)}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _writer(self) -> sqlite3.Connection:
+        if self._write_conn is None:
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            self._write_conn = conn
+        return self._write_conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._writer()  # make sure the schema exists
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def record(self, site: str, result: dict, zip_code: Optional[str] = None,
+               item_id: Optional[str] = None) -> bool:
+        """Buffer one result. Returns True once the buffer should be flushed."""
+        row = snapshot_row(site, result, zip_code, item_id)
+        with self._pending_lock:
+            self._pending.append(row)
+            return len(self._pending) >= self.batch_size
+
+    def flush(self):
+        """
+        Write all buffered rows in a single transaction. If that fails the
+        rows go back into the buffer for the next flush, and the error is raised.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                self._write(rows)
+            except sqlite3.Error:
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                raise
+
+    def _write(self, rows: List[dict]):
+        conn = self._writer()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO snapshots ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in _COLUMNS)})",
+                rows,
+            )
+            conn.executemany(
+                """
+                INSERT INTO latest (site, item_id, zip_code, url, title, price,
+                                    list_price, in_stock, stock_count, scraped_at)
+                VALUES (:site, :item_id, :zip_code, :url, :title, :price,
+                        :list_price, :in_stock, :stock_count, :scraped_at)
+                ON CONFLICT (site, item_id, zip_code) DO UPDATE SET
+                    url = excluded.url,
+                    title = excluded.title,
+                    price = excluded.price,
+                    list_price = excluded.list_price,
+                    in_stock = excluded.in_stock,
+                    stock_count = excluded.stock_count,
+                    scraped_at = excluded.scraped_at
+                WHERE excluded.scraped_at >= latest.scraped_at
+                """,
+                [r for r in rows if r["status"] == "success" and r["item_id"]],
+            )
+
+    async def flush_async(self):
+        """
+        Flush from the event loop without blocking it. A failed write (e.g.
+        the database stayed locked) is logged, not raised, so the batch
+        goes on; the rows are retried with the next flush.
+        """
+        try:
+            await asyncio.to_thread(self.flush)
+        except sqlite3.Error as e:
+            log.error("Result store flush failed", path=self.path, pending=len(self._pending), error=str(e))
+
+    def latest(self, site: Optional[str] = None, zip_code: Optional[str] = None,
+               limit: int = 100, offset: int = 0) -> List[dict]:
+        """Most recent successful snapshot per item, newest first."""
+        query = "SELECT * FROM latest"
+        clauses, params = [], []
+        if site:
+            clauses.append("site = ?")
+            params.append(site)
+        if zip_code is not None:
+            clauses.append("zip_code = ?")
+            params.append(zip_code)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY scraped_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        return [dict(row) for row in self._reader().execute(query, params)]
+
+    def history(self, site: str, item_id: str, zip_code: Optional[str] = None,
+                limit: int = 500, include_failed: bool = False) -> List[dict]:
+        """Snapshots of one item (price/stock history), newest first."""
+        query = "SELECT * FROM snapshots WHERE site = ? AND item_id = ?"
+        params = [site, item_id]
+        if zip_code is not None:
+            query += " AND zip_code = ?"
+            params.append(zip_code)
+        if not include_failed:
+            query += " AND status = 'success'"
+        query += " ORDER BY scraped_at DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._reader().execute(query, params)]
+
+
+result_store = ResultStore()
@@ -0,0 +1,170 @@
+"""
+Failure classification, retry backoff and per-host circuit breakers.
+
+Every failed scrape gets a `reason`:
+
+    timeout         navigation or readiness wait ran out
+    network         connection refused/reset, DNS, ...
+    blocked         captcha, "robot check" or HTTP 403/429/503
+    not_found       HTTP 404 / item removed
+    missing_fields  page loaded but required fields weren't on it
+    zip_code        the Amazon ZIP modal failed
+    error           anything else
+
+Only transient reasons (RETRYABLE_REASONS) are retried, with jittered
+exponential backoff. Blocked responses are retried at most once, and only
+through another healthy identity (see scheduler.iter_scrape_batch), since
+the same identity would only send more traffic to a host already refusing
+it; they also feed a per-host circuit breaker: when too many recent requests to a host are
+blocked, new requests to it wait out a cool-down instead of hitting the
+same wall.
+"""
+
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from typing import Dict
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+RETRYABLE_REASONS = {"timeout", "network", "zip_code"}
+
+RETRY_BASE_DELAY = 2.0   # seconds before the first retry (before jitter)
+RETRY_MAX_DELAY = 30.0
+
+BREAKER_WINDOW = 20          # recent requests looked at per host
+BREAKER_MIN_REQUESTS = 5     # don't trip on the first few requests
+BREAKER_BLOCK_RATE = 0.5     # share of blocked requests that opens the breaker
+BREAKER_COOLDOWN = 60.0      # first pause; doubles on each consecutive trip
+BREAKER_MAX_COOLDOWN = 600.0
+
+_URL = re.compile(r"\b(?:https?|wss?|file)://\S+", re.I)
+
+
+class ScrapeError(Exception):
+    """A scrape failure whose reason is already known."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def classify_error(error) -> str:
+    """
+    Map an exception (or error message) to one of the failure reasons.
+
+    Known reasons come first: ScrapeError (HTTP status checks), then the
+    exception type and Chromium's "net::ERR_" codes. Only then is the
+    message text matched, with URLs taken out so an item id or path can't
+    read as "404" or "blocked".
+    """
+    if isinstance(error, ScrapeError):
+        return error.reason
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, OSError):
+        return "network"
+    text = _URL.sub("", str(error or "")).lower()
+    if "net::err_timed_out" in text:
+        return "timeout"
+    if "net::err_" in text or "connection" in text or "connecterror" in text:
+        return "network"
+    if "timeout" in text or "timed out" in text:
+        return "timeout"
+    if "captcha" in text or "robot" in text or "blocked" in text:
+        return "blocked"
+    if "not found" in text:
+        return "not_found"
+    if "zip code" in text:
+        return "zip_code"
+    return "error"
+
+
+def classify_failure(result: dict) -> str:
+    """The `reason` of a failed result, classifying its error if it has none."""
+    return result.get("reason") or classify_error(result.get("error"))
+
+
+def backoff_delay(retry: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff for the `retry`-th retry (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (retry - 1)))
+
+
+class CircuitBreaker:
+    """Tracks the recent block rate of one host and pauses it when it spikes."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.open_until = 0.0
+        self.trips = 0
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    async def wait(self):
+        """Sleep until the breaker is closed again."""
+        while self.is_open:
+            await asyncio.sleep(self.open_until - time.monotonic())
+
+    def record(self, blocked: bool):
+        if self.is_open:
+            return
+        self.outcomes.append(blocked)
+        if not blocked:
+            self.trips = 0
+            return
+        if len(self.outcomes) < BREAKER_MIN_REQUESTS:
+            return
+        if sum(self.outcomes) / len(self.outcomes) >= BREAKER_BLOCK_RATE:
+            cooldown = min(BREAKER_MAX_COOLDOWN, BREAKER_COOLDOWN * 2 ** self.trips)
+            self.trips += 1
+            self.open_until = time.monotonic() + cooldown
+            # Judge the host afresh once the pause is over
+            self.outcomes.clear()
+            log.warning("Host circuit breaker open", host=self.host, block_rate=BREAKER_BLOCK_RATE, cooldown=round(cooldown))
+
+    def to_dict(self) -> dict:
+        return {
+            "host": self.host,
+            "open": self.is_open,
+            "resumesIn": round(max(0.0, self.open_until - time.monotonic()), 1),
+            "trips": self.trips,
+            "recentRequests": len(self.outcomes),
+            "recentBlocked": sum(self.outcomes),
+        }
+
+
+class HostCircuitBreakers:
+    """One CircuitBreaker per host, created lazily."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).netloc.lower()
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            self._breakers[host] = breaker
+        return breaker
+
+    async def wait(self, url: str):
+        await self.breaker_for(url).wait()
+
+    def record(self, url: str, result: dict):
+        blocked = not result.get("success") and classify_failure(result) == "blocked"
+        self.breaker_for(url).record(blocked)
+
+    def status(self) -> list:
+        return [breaker.to_dict() for breaker in self._breakers.values()]
+
+
+# Shared across batches, like scheduler.host_rate_limiter
+host_breakers = HostCircuitBreakers()
@@ -0,0 +1,447 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from .identity_pool import Identity, current_identity, identity_pool, scrape_captchas
+from .logs import get_logger
+from .metrics import cache_hits as cache_hit_counter, record_result, scrape_retries
+from .resource_governor import resource_governor
+from .result_cache import result_cache
+from .result_store import STORE_RESULTS, result_store
+from .retry_policy import RETRYABLE_REASONS, backoff_delay, classify_failure, host_breakers
+
+log = get_logger(__name__)
+
+# Per-site defaults. Any of these can be overridden per call, but per-call
+# rate keys can only slow a batch down: they get a bucket of their own,
+# waited on before the shared one for the host. Identities (see
+# identity_pool.py) may set their own rate keys, and each identity gets
+# its own shared token bucket per host.
+#   concurrency          - max URLs of this batch in flight at once (identities may cap their own share)
+#   requests_per_second  - token-bucket refill rate per host (and identity)
+#   burst                - token-bucket capacity per host (and identity)
+#   min_delay            - minimum seconds between two requests to the same host (and identity)
+#   max_retries          - retries per URL for transient failures (see retry_policy.py)
+SITE_LIMITS = {
+    "ebay": {"concurrency": 4, "requests_per_second": 1.0, "burst": 2, "min_delay": 0.5, "max_retries": 2},
+    # Search/store pages are walked one after another (see ebay_listing.py)
+    "ebay_listing": {"concurrency": 1, "requests_per_second": 1.0, "burst": 2, "min_delay": 0.5, "max_retries": 2},
+    "amazon": {"concurrency": 3, "requests_per_second": 0.5, "burst": 1, "min_delay": 1.0, "max_retries": 2},
+    "default": {"concurrency": 2, "requests_per_second": 0.5, "burst": 1, "min_delay": 1.0, "max_retries": 1},
+}
+
+# Cap on pages in flight across every batch/job in the process, so several
+# jobs share the browser pool instead of each adding its own concurrency
+GLOBAL_MAX_CONCURRENCY = int(os.environ.get("SCRAPE_MAX_CONCURRENCY", "8"))
+_global_slots: Optional[asyncio.Semaphore] = None
+# Under memory pressure the governor lowers this further (see resource_governor.py)
+resource_governor.configure(max_pages=GLOBAL_MAX_CONCURRENCY)
+
+
+# Per-call rate overrides, applied per batch on top of the shared host buckets
+RATE_KEYS = ("requests_per_second", "burst", "min_delay")
+# "0" turns the shared per-host buckets off, e.g. for the local benchmarks
+HOST_RATE_LIMITS = os.environ.get("HOST_RATE_LIMITS", "1") != "0"
+
+
+def get_global_slots() -> asyncio.Semaphore:
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(GLOBAL_MAX_CONCURRENCY)
+    return _global_slots
+
+
+def get_site_limits(site: str, overrides: Optional[dict] = None) -> dict:
+    """Merge the site's default limits with any non-None per-call overrides."""
+    limits = dict(SITE_LIMITS.get(site, SITE_LIMITS["default"]))
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            limits[key] = value
+    return limits
+
+
+class TokenBucket:
+    """
+    Token bucket with an extra minimum spacing between requests.
+
+    Waiters are served one at a time so a burst of tasks can't all grab
+    the same refilled token.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_delay: float = 0.0):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.min_delay = max(min_delay, 0.0)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.last_request = 0.0
+        self._lock = asyncio.Lock()
+
+    def configure(self, rate: float, capacity: float, min_delay: float = 0.0):
+        """Change the limits; tokens earned so far are kept (up to the new capacity)."""
+        self._refill(time.monotonic())
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.min_delay = max(min_delay, 0.0)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait_tokens = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+                wait_spacing = max(0.0, self.last_request + self.min_delay - now)
+                wait = max(wait_tokens, wait_spacing)
+                if wait <= 0:
+                    self.tokens -= 1
+                    self.last_request = now
+                    return
+                await asyncio.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    Keeps one TokenBucket per (identity, host), created lazily. Each wait
+    applies the caller's limits to the bucket, so the shared limiter is
+    only ever given site defaults and identity budgets, never per-call
+    overrides (those get a per-batch limiter, see iter_scrape_batch).
+    """
+
+    def __init__(self):
+        self._buckets: Dict[tuple, TokenBucket] = {}
+
+    def bucket_for(self, url: str, limits: dict, identity: str = "direct") -> TokenBucket:
+        key = (identity, urlparse(url).netloc.lower())
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(
+                rate=limits["requests_per_second"],
+                capacity=limits["burst"],
+                min_delay=limits["min_delay"],
+            )
+            self._buckets[key] = bucket
+        else:
+            bucket.configure(limits["requests_per_second"], limits["burst"], limits["min_delay"])
+        return bucket
+
+    async def wait(self, url: str, limits: dict, identity: str = "direct"):
+        await self.bucket_for(url, limits, identity).acquire()
+
+
+# Shared across batches so two concurrent batches can't double a host's rate
+host_rate_limiter = HostRateLimiter()
+
+
+async def scrape_with_fresh_identity(url: str, site: str, scrape: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Run `scrape()` through a healthy identity other than the current one,
+    e.g. the browser fallback after the HTTP fast path drew a captcha. The
+    result is scored against that identity. When no other identity is
+    free right now it runs on the current one: the caller holds page
+    slots, so waiting here could stall the tasks it is waiting for.
+    """
+    flagged = current_identity.get()
+    identity = identity_pool.try_acquire(avoid=flagged) if flagged is not None else None
+    if identity is None:
+        return await scrape()
+    try:
+        if HOST_RATE_LIMITS:
+            await host_rate_limiter.wait(url, get_site_limits(site, identity.rate_budget), identity.name)
+        captchas = []
+        token = current_identity.set(identity)
+        captcha_token = scrape_captchas.set(captchas)
+        try:
+            result = await scrape()
+        finally:
+            current_identity.reset(token)
+            scrape_captchas.reset(captcha_token)
+        if not result.get("success"):
+            result["reason"] = classify_failure(result)
+        identity_pool.record(identity, result, captcha_scored=bool(captchas))
+        return result
+    finally:
+        identity_pool.release(identity)
+
+
+def _result_for(url: str, result: dict, cached: bool, include_timings: bool = False) -> dict:
+    """Copy a shared result for one of the URLs that asked for it."""
+    if cached:
+        result = {**result, "retries": 0, "retryReasons": []}
+    if not result.get("success"):
+        return {**result, "url": url}
+    data = dict(result["data"])
+    data["url"] = url
+    data["cached"] = cached
+    if include_timings and not cached:
+        if "timings" in result:
+            data["timings"] = result["timings"]
+        if "blocked" in result:
+            data["blocked"] = result["blocked"]
+    return {**result, "data": data}
+
+
+async def iter_scrape_batch(
+    urls: Iterable[str],
+    scrape_one: Callable[[str], Awaitable[dict]],
+    site: str,
+    cache_key: Optional[Callable[[str], Optional[Hashable]]] = None,
+    use_cache: bool = True,
+    include_timings: bool = False,
+    store_results: bool = True,
+    window: Optional[int] = None,
+    **overrides,
+):
+    """
+    Scrape `urls` concurrently, yielding `(index, result)` as each finishes.
+
+    `urls` may be any iterable. With `window`, it is read lazily and at
+    most `window` scrapes are started but unfinished at a time, topped up
+    as each one finishes, so a long input never sits in memory at once.
+
+    When `cache_key` is given, URLs with the same canonical key are fetched
+    once and the result is fanned out to every index. Recent results are
+    served from result_cache unless `use_cache` is False. Successful
+    results carry `data["cached"]`. Every fresh scrape is also written to
+    result_store (price/stock history) unless `store_results` is False.
+    With `include_timings`, freshly scraped items also carry
+    `data["timings"]` (seconds per stage) and, from browser pages,
+    `data["blocked"]` (request blocker stats).
+
+    Every request first waits on the per-host circuit breaker, then goes
+    out through an identity from identity_pool and waits on that identity's
+    token bucket for the host. Rate overrides in `overrides` add a bucket
+    for this batch only, so they can lower the host's rate but not raise
+    it for other batches. Concurrency is capped per batch (however
+    many identities there are), per identity (its own "concurrency", if
+    set), and process-wide (GLOBAL_MAX_CONCURRENCY, lowered by the resource
+    governor under memory pressure) once the rate token is in hand.
+    Failures get a `reason`; transient ones are retried up to `max_retries`
+    times with jittered backoff, and a blocked one is retried once through
+    another healthy identity, if there is one. Every result carries
+    `retries` and `retryReasons`. `overrides` may set any key of SITE_LIMITS.
+    """
+    limits = get_site_limits(site, overrides)
+    semaphore = asyncio.Semaphore(max(1, int(limits["concurrency"])))
+    # An identity's own rate budget replaces the site defaults, not per-call overrides
+    explicit = {key: value for key, value in overrides.items() if value is not None}
+    batch_rate_limiter = HostRateLimiter() if any(key in explicit for key in RATE_KEYS) else None
+
+    async def attempt(url: str, avoid: Optional[Identity] = None):
+        await host_breakers.wait(url)
+        async with semaphore:
+            identity = await identity_pool.acquire(avoid)
+            try:
+                if batch_rate_limiter is not None:
+                    batch_limits = get_site_limits(site, {**identity.rate_budget, **explicit})
+                    await batch_rate_limiter.wait(url, batch_limits, identity.name)
+                if HOST_RATE_LIMITS:
+                    await host_rate_limiter.wait(url, get_site_limits(site, identity.rate_budget), identity.name)
+                # Shared slots only once the request can go out, so a batch
+                # waiting on one host's rate limit doesn't hold up the others
+                async with get_global_slots(), resource_governor.page_slot():
+                    log.debug("Scraping", site=site, url=url, identity=identity.name)
+                    captchas = []
+                    token = current_identity.set(identity)
+                    captcha_token = scrape_captchas.set(captchas)
+                    try:
+                        result = await scrape_one(url)
+                    except Exception as e:
+                        result = {"success": False, "url": url, "error": str(e)}
+                    finally:
+                        current_identity.reset(token)
+                        scrape_captchas.reset(captcha_token)
+                if not result.get("success"):
+                    result["reason"] = classify_failure(result)
+                identity_pool.record(identity, result, captcha_scored=bool(captchas))
+            finally:
+                identity_pool.release(identity)
+        host_breakers.record(url, result)
+        record_result(site, result)
+        return result, identity
+
+    async def run(key: Hashable, url: str):
+        retry_reasons = []
+        blocked_identity = None
+        while True:
+            result, identity = await attempt(url, blocked_identity)
+            if result.get("success") or len(retry_reasons) >= limits["max_retries"]:
+                break
+            if result["reason"] == "blocked":
+                # Once, through another identity: this one may be flagged, the host fine
+                if blocked_identity is not None or not identity_pool.has_alternative(identity):
+                    break
+                blocked_identity = identity
+                delay = 0.0
+            elif result["reason"] in RETRYABLE_REASONS:
+                # Back off outside the semaphore so other URLs keep going meanwhile
+                delay = backoff_delay(len(retry_reasons) + 1)
+            else:
+                break
+            retry_reasons.append(result["reason"])
+            scrape_retries.inc(site, result["reason"])
+            log.info("Retrying", url=url, reason=result["reason"], delay=round(delay, 1),
+                     retry=f"{len(retry_reasons)}/{limits['max_retries']}")
+            await asyncio.sleep(delay)
+        result["retries"] = len(retry_reasons)
+        result["retryReasons"] = retry_reasons
+        canonical = key if key[0] != "url" else None
+        if result.get("success") and canonical is not None:
+            result_cache.set(key, result)
+        if STORE_RESULTS and store_results:
+            zip_code, item_id = (canonical[3], canonical[2]) if canonical else (None, None)
+            if result_store.record(site, result, zip_code=zip_code, item_id=item_id):
+                await result_store.flush_async()
+        return key, result
+
+    # key -> (index, url) of every URL waiting on that key's scrape
+    waiting: Dict[Hashable, List[Tuple[int, str]]] = {}
+    pending = set()
+    entries = enumerate(urls)
+    try:
+        while True:
+            for index, url in entries:
+                key = cache_key(url) if cache_key else None
+                key = key if key is not None else ("url", url)
+                if key in waiting:
+                    waiting[key].append((index, url))
+                    continue
+                cached = result_cache.get(key) if use_cache and key[0] != "url" else None
+                if cached is not None:
+                    cache_hit_counter.inc(site)
+                    yield index, _result_for(url, cached, cached=True)
+                    continue
+                waiting[key] = [(index, url)]
+                pending.add(asyncio.create_task(run(key, url)))
+                if window is not None and len(pending) >= window:
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                key, result = finished.result()
+                for index, url in waiting.pop(key):
+                    yield index, _result_for(url, result, cached=False, include_timings=include_timings)
+    finally:
+        for task in pending:
+            task.cancel()
+        if STORE_RESULTS:
+            await result_store.flush_async()
+
+
+async def run_scrape_batch(
+    urls: List[str],
+    scrape_one: Callable[[str], Awaitable[dict]],
+    site: str,
+    **overrides,
+) -> dict:
+    """Scrape every URL and return the usual batch summary, in input order."""
+    ordered: List[Optional[dict]] = [None] * len(urls)
+    async for index, result in iter_scrape_batch(urls, scrape_one, site, **overrides):
+        ordered[index] = result
+    return summarize_results(urls, ordered)
+
+
+async def stream_scrape_batch(
+    urls: Iterable[str],
+    scrape_one: Callable[[str], Awaitable[dict]],
+    site: str,
+    **overrides,
+):
+    """
+    Like run_scrape_batch, but yields one event per URL as soon as it is
+    done, then a final summary. Item data is not kept once it is yielded,
+    and `urls` may be any iterable (see iter_scrape_batch's `window`).
+
+        {"type": "result", "index": 3, "success": True, "data": {...}, "retries": 0, "retryReasons": []}
+        {"type": "result", "index": 4, "success": False, "url": "...", "error": "...",
+         "reason": "timeout", "retries": 2, "retryReasons": ["timeout", "timeout"]}
+        {"type": "summary", "totalUrls": ..., "successfulScrapes": ..., "failedScrapes": ...,
+         "failedUrls": [...], "cacheHits": ..., "retries": ..., "retryReasons": {...},
+         "failureReasons": {...}}
+    """
+    successful = 0
+    cache_hits = 0
+    failed_urls = []
+    retry_stats = RetryStats()
+    async for index, result in iter_scrape_batch(urls, scrape_one, site, **overrides):
+        retry_stats.add(result)
+        retries = {"retries": result.get("retries", 0), "retryReasons": result.get("retryReasons", [])}
+        if result.get("success"):
+            successful += 1
+            cache_hits += bool(result["data"].get("cached"))
+            yield {"type": "result", "index": index, "success": True, "data": result["data"], **retries}
+        else:
+            url = result["url"]
+            failed_urls.append(url)
+            yield {
+                "type": "result",
+                "index": index,
+                "success": False,
+                "url": url,
+                "error": result.get("error"),
+                "reason": result.get("reason"),
+                **retries,
+            }
+
+    yield {
+        "type": "summary",
+        "totalUrls": successful + len(failed_urls),
+        "successfulScrapes": successful,
+        "failedScrapes": len(failed_urls),
+        "failedUrls": failed_urls,
+        "cacheHits": cache_hits,
+        **retry_stats.to_dict(),
+    }
+
+
+class RetryStats:
+    """Retry and failure-reason totals for a batch summary."""
+
+    def __init__(self):
+        self.retries = 0
+        self.retry_reasons = Counter()
+        self.failure_reasons = Counter()
+
+    def add(self, result: dict):
+        """Count a scheduler result or a stream result event."""
+        self.retries += result.get("retries", 0)
+        self.retry_reasons.update(result.get("retryReasons", []))
+        if not result.get("success"):
+            self.failure_reasons[result.get("reason") or classify_failure(result)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "retries": self.retries,
+            "retryReasons": dict(self.retry_reasons),
+            "failureReasons": dict(self.failure_reasons),
+        }
+
+
+def summarize_results(urls: List[str], scrape_results: List[dict]) -> dict:
+    """Build the `results` / `failedUrls` summary returned by the API."""
+    results = []
+    failed_urls = []
+    retry_stats = RetryStats()
+    for url, result in zip(urls, scrape_results):
+        retry_stats.add(result or {"success": False, "reason": "error"})
+        if result and result.get("success"):
+            results.append(result["data"])
+        else:
+            failed_urls.append((result or {}).get("url", url))
+
+    return {
+        "results": results,
+        "totalUrls": len(urls),
+        "successfulScrapes": len(results),
+        "failedScrapes": len(failed_urls),
+        "failedUrls": failed_urls,
+        "cacheHits": sum(1 for data in results if data.get("cached")),
+        **retry_stats.to_dict(),
+    }
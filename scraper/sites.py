@@ -0,0 +1,202 @@
+"""
+Per-site page settings.
+
+`ready` is a list of selector groups: the page counts as ready once every
+group has at least one matching element. `interstitial` selectors mark
+pages (captcha, "Continue shopping") that will never become ready, so the
+wait returns immediately and the caller can deal with them.
+
+Request blocking (see request_blocker.py) drops any request whose resource
+type is in `block_resource_types` or whose host is in `deny_domains`. When
+`allow_domains` is set, third-party hosts outside it are dropped as well;
+the page's own host is always allowed.
+
+`fields` describes what to extract; see extractors.py for the rule format.
+Adding a site is a matter of adding an entry here.
+"""
+
+import os
+
+# Ad, analytics and tracking hosts seen on both sites
+TRACKER_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "facebook.net",
+    "facebook.com",
+    "scorecardresearch.com",
+    "criteo.com",
+    "criteo.net",
+    "adnxs.com",
+    "quantserve.com",
+    "amazon-adsystem.com",
+    "fls-na.amazon.com",
+    "unagi.amazon.com",
+]
+
+SITES = {
+    "ebay": {
+        "ready": [
+            ['[data-testid="x-price-primary"]', ".x-price-primary", ".x-bin-price__content"],
+            ['h1[data-testid="vi-VR-cvipPrice-title"]', "h1"],
+        ],
+        "interstitial": ["#captcha_form", "iframe[src*='captcha']"],
+        "ready_timeout": 15000,
+        "block_resource_types": ["image", "media", "font"],
+        "allow_domains": ["ebay.com", "ebaystatic.com", "ebayimg.com", "ebaycdn.net"],
+        "deny_domains": TRACKER_DOMAINS + ["ebay-us.com", "ebayadservices.com"],
+        "fields": {
+            "title": [
+                {"selectors": ['h1[data-testid="vi-VR-cvipPrice-title"]', "h1", '[role="heading"]']},
+            ],
+            "price": [
+                {
+                    "selectors": ['[data-testid="x-price-primary"]', ".x-price-primary", ".x-bin-price__content"],
+                    "regex": r"[\d,.]+",
+                    "type": "float",
+                },
+            ],
+            "stockCount": [
+                {
+                    "selectors": [".x-quantity__availability span", "#qtySubTxt span", "#qtySubTxt"],
+                    "all": True,
+                    "regex": r"(\d+)\s*(?:in stock|available)",
+                    "flags": "i",
+                    "group": 1,
+                    "type": "int",
+                },
+                {
+                    "selectors": [".x-quantity__availability", "#qtySubTxt", ".d-quantity__availability"],
+                    "regex": r"only\s+(\d+)\s+left",
+                    "flags": "i",
+                    "group": 1,
+                    "type": "int",
+                },
+            ],
+            "itemNumber": [{"url": True, "regex": r"/itm/(\d+)", "group": 1}],
+        },
+    },
+    # Search results (/sch/, including a seller's items via _ssn=) and store
+    # pages: every result card is an item, see extractors.py for `cards`
+    "ebay_listing": {
+        "ready": [
+            ["li.s-item", "li.s-card", "li.str-item-card", ".srp-save-null-search"],
+        ],
+        "interstitial": ["#captcha_form", "iframe[src*='captcha']"],
+        "ready_timeout": 15000,
+        "block_resource_types": ["image", "media", "font"],
+        "allow_domains": ["ebay.com", "ebaystatic.com", "ebayimg.com", "ebaycdn.net"],
+        "deny_domains": TRACKER_DOMAINS + ["ebay-us.com", "ebayadservices.com"],
+        "fields": {
+            "nextPage": [
+                {"selectors": ["a.pagination__next", "nav.pagination a[type='next']", "a[rel='next']"], "attr": "href"},
+            ],
+            "totalResults": [
+                {
+                    "selectors": [".srp-controls__count-heading", ".str-search-header__count"],
+                    "regex": r"[\d,]+",
+                    "type": "int",
+                },
+            ],
+        },
+        "cards": {
+            "selectors": ["li.s-item", "li.s-card", "li.str-item-card"],
+            "fields": {
+                # The first card is an "ad" whose link has a short fake item id
+                "itemNumber": [{"selectors": ["a[href*='/itm/']"], "attr": "href", "regex": r"/itm/(?:[^/?#]+/)?(\d{9,15})", "group": 1}],
+                "title": [
+                    {
+                        "selectors": [
+                            ".s-item__title span[role='heading']",
+                            ".s-item__title",
+                            ".s-card__title .su-styled-text",
+                            ".s-card__title",
+                            ".str-item-card__property-title",
+                        ],
+                    },
+                ],
+                # Price ranges ("$10.00 to $25.00") give the low end
+                "price": [
+                    {
+                        "selectors": [".s-item__price", ".s-card__price", ".str-item-card__property-displayPrice"],
+                        "regex": r"[\d,.]+",
+                        "type": "float",
+                    },
+                ],
+                "url": [{"selectors": ["a[href*='/itm/']"], "attr": "href"}],
+            },
+        },
+    },
+    "amazon": {
+        "ready": [
+            ["#productTitle"],
+            ["#availability-string", "#availability", "#outOfStock"],
+        ],
+        "interstitial": ["form[action*='validateCaptcha']"],
+        "ready_timeout": 15000,
+        "block_resource_types": ["image", "media", "font"],
+        # The ZIP modal's scripts are served from the media/images CDNs
+        "allow_domains": ["amazon.com", "media-amazon.com", "ssl-images-amazon.com", "images-amazon.com"],
+        "deny_domains": TRACKER_DOMAINS,
+        "fields": {
+            "itemNumber": [{"url": True, "regex": r"/dp/([A-Z0-9]+)", "group": 1}],
+            "title": [{"selectors": ["#productTitle"]}],
+            "discountedPrice": [
+                {
+                    "selectors": [
+                        ".a-price.aok-align-center.reinventPricePriceToPayMargin .a-offscreen",
+                        ".a-price[data-a-size='xl'] .a-offscreen",
+                    ],
+                    "regex": r"\$(\d+[.,]?\d*)",
+                    "group": 1,
+                    "type": "float",
+                },
+            ],
+            # "Typical price" sits next to the price block, so only look there
+            "actualPrice": [
+                {
+                    "selectors": [
+                        "#corePriceDisplay_desktop_feature_div_basisPrice",
+                        "#corePriceDisplay_desktop_feature_div .basisPrice",
+                        "#corePriceDisplay_desktop_feature_div",
+                        "#corePrice_feature_div",
+                    ],
+                    "all": True,
+                    "regex": r"Typical price[:\s]+\$(\d+[.,]?\d*)",
+                    "flags": "i",
+                    "group": 1,
+                    "type": "float",
+                },
+                {"field": "discountedPrice"},
+            ],
+            "inStock": [
+                {"selectors": ["#availability-string"], "regex": r"in stock|only\s+\d+\s+left", "flags": "i", "value": True},
+                {"value": False},
+            ],
+            "numberInStock": [
+                {
+                    "selectors": ["#availability-string"],
+                    "regex": r"only\s+(\d+)\s+left",
+                    "flags": "i",
+                    "group": 1,
+                    "type": "int",
+                },
+                # In stock, quantity not specified
+                {"selectors": ["#availability-string"], "regex": "in stock", "flags": "i", "value": 999},
+            ],
+            # The ZIP the page is actually priced for ("Deliver to Dallas 75007")
+            "deliveryZip": [{"selectors": ["#glow-ingress-line2"], "regex": r"\b(\d{5})\b", "group": 1}],
+        },
+    },
+}
+
+# Fail fast: a page that hasn't reached DOMContentLoaded by now is retried
+# (see retry_policy.py) rather than waited on
+NAVIGATION_TIMEOUT = int(os.environ.get("NAVIGATION_TIMEOUT", "30000"))
+
+
+def get_site(site: str) -> dict:
+    """Return the settings for `site`, raising KeyError for unknown sites."""
+    return SITES[site]
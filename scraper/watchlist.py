@@ -0,0 +1,343 @@
+"""
+Watch list: items that are re-scraped on their own schedule.
+
+Each item keeps a decayed estimate of how often its price or stock
+changes, seeded from result_store history when it is added. The next
+check is spaced so that about TARGET_CHANGES_PER_CHECK changes are
+expected in between, clamped to the item's [min_interval, max_interval]
+and shortened for items that are low on stock. max_interval is the
+freshness budget: no item goes unchecked for longer than that.
+
+WatchMonitor spends a fixed number of scrapes per hour on the due items
+most likely to have changed, so static items are checked rarely and
+volatile ones often.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from typing import List, Optional
+from .ebay_scraper import stream_amazon_from_csv, stream_ebay_from_csv
+from .logs import get_logger
+from .result_cache import canonical_key
+from .result_store import RESULTS_DB, result_store, snapshot_row
+
+log = get_logger(__name__)
+
+WATCH_DB = os.environ.get("WATCH_DB", RESULTS_DB)
+DEFAULT_MIN_INTERVAL = 15 * 60
+DEFAULT_MAX_INTERVAL = 24 * 60 * 60
+TARGET_CHANGES_PER_CHECK = 0.5
+LOW_STOCK_THRESHOLD = 5
+LOW_STOCK_FACTOR = 0.25          # low/out-of-stock items are checked 4x as often
+CHANGE_HALF_LIFE = 7 * 24 * 60 * 60
+MONITOR_TICK = 30                # seconds between monitor rounds
+DUE_CANDIDATES_FACTOR = 4        # due() ranks this many times `limit` of the longest-overdue items
+
+STREAMS = {"ebay": stream_ebay_from_csv, "amazon": stream_amazon_from_csv}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watch_items (
+    site TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    zip_code TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL,
+    min_interval REAL NOT NULL,
+    max_interval REAL NOT NULL,
+    changes REAL NOT NULL DEFAULT 0,
+    observed REAL NOT NULL DEFAULT 0,
+    price REAL,
+    in_stock INTEGER,
+    stock_count INTEGER,
+    checks INTEGER NOT NULL DEFAULT 0,
+    last_checked REAL,
+    next_due REAL NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (site, item_id, zip_code)
+);
+CREATE INDEX IF NOT EXISTS idx_watch_due ON watch_items (next_due);
+"""
+
+
+def change_rate(item: dict) -> float:
+    """Estimated price/stock changes per second (weak prior: one per 2x max_interval)."""
+    return (item["changes"] + 0.5) / (item["observed"] + item["max_interval"])
+
+
+def is_low_stock(item: dict) -> bool:
+    if item["in_stock"] == 0:
+        return True
+    return item["stock_count"] is not None and item["stock_count"] <= LOW_STOCK_THRESHOLD
+
+
+def next_interval(item: dict) -> float:
+    """Seconds until the next check of `item`."""
+    interval = TARGET_CHANGES_PER_CHECK / change_rate(item)
+    if is_low_stock(item):
+        interval *= LOW_STOCK_FACTOR
+    return max(item["min_interval"], min(item["max_interval"], interval))
+
+
+def urgency(item: dict, now: float) -> float:
+    """Expected changes missed since the last check; never-checked items come first."""
+    if item["last_checked"] is None:
+        return float("inf")
+    missed = (now - item["last_checked"]) * change_rate(item)
+    return missed / LOW_STOCK_FACTOR if is_low_stock(item) else missed
+
+
+def _state(row: dict) -> tuple:
+    return (row["price"], row["in_stock"], row["stock_count"])
+
+
+def history_stats(site: str, item_id: str, zip_code: str) -> dict:
+    """Changes and observed seconds in an item's stored history (oldest first)."""
+    snapshots = list(reversed(result_store.history(site, item_id, zip_code=zip_code)))
+    changes = sum(1 for a, b in zip(snapshots, snapshots[1:]) if _state(a) != _state(b))
+    observed = snapshots[-1]["scraped_at"] - snapshots[0]["scraped_at"] if snapshots else 0.0
+    last = snapshots[-1] if snapshots else None
+    return {
+        "changes": changes,
+        "observed": observed,
+        "price": last and last["price"],
+        "in_stock": last and last["in_stock"],
+        "stock_count": last and last["stock_count"],
+        "last_checked": last and last["scraped_at"],
+    }
+
+
+class WatchList:
+    """SQLite table of watched items and their re-scrape schedule."""
+
+    def __init__(self, path: str = WATCH_DB):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use so importing the module doesn't create the database
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add(self, site: str, url: str, zip_code: Optional[str] = None,
+            min_interval: Optional[float] = None, max_interval: Optional[float] = None) -> Optional[dict]:
+        """Watch `url`. Returns the item, or None if it isn't a product URL of `site`."""
+        if site == "amazon":
+            zip_code = zip_code or "75007"
+        key = canonical_key(url, zip_code)
+        if key is None or key[0] != site:
+            return None
+        item_id, zip_code = key[2], key[3] or ""
+        min_interval = float(min_interval or DEFAULT_MIN_INTERVAL)
+        max_interval = max(min_interval, float(max_interval or DEFAULT_MAX_INTERVAL))
+
+        stats = history_stats(site, item_id, zip_code)
+        now = time.time()
+        item = {
+            "site": site, "item_id": item_id, "zip_code": zip_code, "url": url,
+            "min_interval": min_interval, "max_interval": max_interval,
+            **stats, "checks": 0, "added_at": now,
+        }
+        item["next_due"] = now if item["last_checked"] is None else item["last_checked"] + next_interval(item)
+        with self._lock, self.conn:
+            # Re-adding keeps the item's statistics and only updates its settings
+            self.conn.execute(
+                """
+                INSERT INTO watch_items (site, item_id, zip_code, url, min_interval, max_interval,
+                                         changes, observed, price, in_stock, stock_count, checks,
+                                         last_checked, next_due, added_at)
+                VALUES (:site, :item_id, :zip_code, :url, :min_interval, :max_interval,
+                        :changes, :observed, :price, :in_stock, :stock_count, :checks,
+                        :last_checked, :next_due, :added_at)
+                ON CONFLICT (site, item_id, zip_code) DO UPDATE SET
+                    url = excluded.url,
+                    min_interval = excluded.min_interval,
+                    max_interval = excluded.max_interval
+                """,
+                item,
+            )
+        return self.get(site, item_id, zip_code)
+
+    def remove(self, site: str, item_id: str, zip_code: str = "") -> bool:
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM watch_items WHERE site = ? AND item_id = ? AND zip_code = ?",
+                (site, item_id, zip_code),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, site: str, item_id: str, zip_code: str = "") -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM watch_items WHERE site = ? AND item_id = ? AND zip_code = ?",
+                (site, item_id, zip_code),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def items(self, site: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[dict]:
+        """Watched items, soonest due first."""
+        query = "SELECT * FROM watch_items"
+        params = []
+        if site:
+            query += " WHERE site = ?"
+            params.append(site)
+        query += " ORDER BY next_due LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def due(self, now: float, limit: int) -> List[dict]:
+        """
+        Up to `limit` due items, most likely to have changed first. Only the
+        longest-overdue few are read, so a backlog after downtime is worked
+        off round by round instead of loaded at once.
+        """
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(
+                "SELECT * FROM watch_items WHERE next_due <= ? ORDER BY next_due LIMIT ?",
+                (now, max(1, limit) * DUE_CANDIDATES_FACTOR),
+            )]
+        rows.sort(key=lambda item: urgency(item, now), reverse=True)
+        return rows[:limit]
+
+    def record(self, item: dict, result: dict):
+        """Update an item's change statistics and schedule after a check."""
+        now = time.time()
+        item = dict(item)
+        item["checks"] += 1
+        if result.get("success"):
+            row = snapshot_row(item["site"], result)
+            if item["last_checked"] is not None:
+                elapsed = max(0.0, now - item["last_checked"])
+                decay = 0.5 ** (elapsed / CHANGE_HALF_LIFE)
+                changed = _state(item) != _state(row)
+                item["changes"] = item["changes"] * decay + changed
+                item["observed"] = item["observed"] * decay + elapsed
+            item.update(price=row["price"], in_stock=row["in_stock"], stock_count=row["stock_count"])
+            item["last_checked"] = now
+            item["next_due"] = now + next_interval(item)
+        else:
+            # Try again soon, without counting the failure as a change
+            item["next_due"] = now + item["min_interval"]
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE watch_items SET changes = :changes, observed = :observed, price = :price,
+                                       in_stock = :in_stock, stock_count = :stock_count,
+                                       checks = :checks, last_checked = :last_checked,
+                                       next_due = :next_due
+                WHERE site = :site AND item_id = :item_id AND zip_code = :zip_code
+                """,
+                item,
+            )
+
+
+def item_to_dict(item: dict) -> dict:
+    """API shape of a watch-list row."""
+    return {
+        "site": item["site"],
+        "itemId": item["item_id"],
+        "zipCode": item["zip_code"] or None,
+        "url": item["url"],
+        "price": item["price"],
+        "inStock": None if item["in_stock"] is None else bool(item["in_stock"]),
+        "stockCount": item["stock_count"],
+        "checks": item["checks"],
+        "lastChecked": item["last_checked"],
+        "nextDue": item["next_due"],
+        "intervalSeconds": round(next_interval(item)),
+        "changesPerDay": round(change_rate(item) * 86400, 3),
+        "lowStock": is_low_stock(item),
+    }
+
+
+class WatchMonitor:
+    """
+    Checks due watch-list items on the scraper loop, at most
+    `budget_per_hour` scrapes per hour.
+    """
+
+    def __init__(self, watch_list: WatchList):
+        self.watch_list = watch_list
+        self.budget_per_hour = 0.0
+        self.tokens = 0.0
+        self.checks = 0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self, budget_per_hour: float):
+        """Start the monitor, or change the budget of a running one."""
+        self.budget_per_hour = float(budget_per_hour)
+        if not self.running:
+            self.tokens = self._max_tokens()
+            self.task = asyncio.create_task(self._run())
+            log.info("Watch monitor started", budget_per_hour=self.budget_per_hour)
+
+    async def stop(self):
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            log.info("Watch monitor stopped")
+
+    def _max_tokens(self) -> float:
+        # Let up to five minutes of budget build up while nothing is due
+        return max(1.0, self.budget_per_hour / 12)
+
+    async def _run(self):
+        updated = time.monotonic()
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self._max_tokens(), self.tokens + (now - updated) * self.budget_per_hour / 3600)
+            updated = now
+            if self.tokens >= 1:
+                try:
+                    items = await asyncio.to_thread(self.watch_list.due, time.time(), int(self.tokens))
+                    if items:
+                        self.tokens -= len(items)
+                        await self.check(items)
+                except Exception as e:
+                    # Keep monitoring: the next round picks the items up again
+                    log.error("Watch monitor round failed", error=str(e))
+            await asyncio.sleep(MONITOR_TICK)
+
+    async def check(self, items: List[dict]):
+        """Scrape `items` (bypassing the result cache) and reschedule them."""
+        items = sorted(items, key=lambda item: (item["site"], item["zip_code"]))
+        for (site, zip_code), group in groupby(items, key=lambda item: (item["site"], item["zip_code"])):
+            group = list(group)
+            options = {"use_cache": False}
+            if site == "amazon" and zip_code:
+                options["zip_code"] = zip_code
+            async for event in STREAMS[site]([item["url"] for item in group], **options):
+                if event["type"] != "result":
+                    continue
+                await asyncio.to_thread(self.watch_list.record, group[event["index"]], event)
+                self.checks += 1
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "budgetPerHour": self.budget_per_hour,
+            "checks": self.checks,
+        }
+
+
+watch_list = WatchList()
+watch_monitor = WatchMonitor(watch_list)
@@ -0,0 +1,220 @@
+"""
+Shared work queue for worker mode (see worker.py).
+
+URLs are stored in SQLite and handed to worker processes as time-limited
+leases. A worker that crashes stops renewing its leases; once they expire
+the URLs become available to other workers again. Any number of worker
+processes on one host can share the queue. The database runs in WAL mode,
+which relies on shared memory between the processes and does not work
+over network filesystems (NFS, SMB): don't put QUEUE_DB on a shared
+volume. To spread workers over several machines, swap this class for a
+networked queue with the same methods.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from utils.config_manager import CONFIG_DIR
+
+QUEUE_DB = os.environ.get("QUEUE_DB", os.path.join(CONFIG_DIR, "queue.db"))
+DEFAULT_LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    options TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER NOT NULL REFERENCES batches (id),
+    idx INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_tasks_batch ON tasks (batch_id, idx);
+CREATE INDEX IF NOT EXISTS idx_tasks_owner ON tasks (lease_owner, status);
+"""
+
+
+class WorkQueue:
+    """SQLite-backed queue of URL tasks with expiring leases."""
+
+    def __init__(self, path: str = QUEUE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # isolation_level=None: we manage transactions (BEGIN IMMEDIATE) ourselves
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        # The connection is shared by the worker's heartbeat and scrape threads
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, site: str, urls: List[str], options: Optional[dict] = None) -> int:
+        """Add a batch of URLs. Returns the batch id."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.execute(
+                    "INSERT INTO batches (site, options, created_at) VALUES (?, ?, ?)",
+                    (site, json.dumps(options or {}), time.time()),
+                )
+                batch_id = cursor.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO tasks (batch_id, idx, url) VALUES (?, ?, ?)",
+                    [(batch_id, i, url) for i, url in enumerate(urls)],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return batch_id
+
+    def lease(self, worker_id: str, limit: int, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[dict]:
+        """
+        Atomically claim up to `limit` tasks: pending ones, or leased ones
+        whose lease has expired (their worker died). Tasks that have already
+        been attempted MAX_ATTEMPTS times are marked failed instead.
+        """
+        with self._lock:
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    """
+                    UPDATE tasks SET status = 'failed', error = 'lease expired too many times',
+                                     lease_owner = NULL, finished_at = ?
+                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+                    """,
+                    (now, now, MAX_ATTEMPTS),
+                )
+                rows = self.conn.execute(
+                    """
+                    SELECT t.id, t.batch_id, t.idx, t.url, b.site, b.options
+                    FROM tasks t JOIN batches b ON b.id = t.batch_id
+                    WHERE t.status = 'pending' OR (t.status = 'leased' AND t.lease_expires < ?)
+                    ORDER BY t.batch_id, t.idx
+                    LIMIT ?
+                    """,
+                    (now, limit),
+                ).fetchall()
+                self.conn.executemany(
+                    """
+                    UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                     attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    [(worker_id, now + lease_seconds, row["id"]) for row in rows],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return [
+                {
+                    "id": row["id"],
+                    "batchId": row["batch_id"],
+                    "index": row["idx"],
+                    "url": row["url"],
+                    "site": row["site"],
+                    "options": json.loads(row["options"]),
+                }
+                for row in rows
+            ]
+
+    def renew_leases(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """Heartbeat: push back the expiry of every task this worker holds."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE lease_owner = ? AND status = 'leased'",
+                (time.time() + lease_seconds, worker_id),
+            )
+
+    def complete(self, task_id: int, worker_id: str, result: dict) -> bool:
+        """
+        Store a task's result. Ignored (returns False) if the lease was lost
+        to another worker in the meantime.
+        """
+        with self._lock:
+            success = bool(result.get("success"))
+            cursor = self.conn.execute(
+                """
+                UPDATE tasks SET status = ?, result = ?, error = ?, lease_owner = NULL, finished_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+                """,
+                (
+                    "done" if success else "failed",
+                    json.dumps(result.get("data")) if success else None,
+                    None if success else result.get("error"),
+                    time.time(),
+                    task_id,
+                    worker_id,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, worker_id: str):
+        """Give back every task this worker still holds (clean shutdown)."""
+        with self._lock:
+            self.conn.execute(
+                """
+                UPDATE tasks SET status = 'pending', lease_owner = NULL, lease_expires = NULL,
+                                 attempts = MAX(attempts - 1, 0)
+                WHERE lease_owner = ? AND status = 'leased'
+                """,
+                (worker_id,),
+            )
+
+    def counts(self, batch_id: Optional[int] = None) -> Dict[str, int]:
+        with self._lock:
+            query = "SELECT status, COUNT(*) AS n FROM tasks"
+            params = []
+            if batch_id is not None:
+                query += " WHERE batch_id = ?"
+                params.append(batch_id)
+            query += " GROUP BY status"
+            counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+            for row in self.conn.execute(query, params):
+                counts[row["status"]] = row["n"]
+            return counts
+
+    def summary(self, batch_id: int) -> dict:
+        """Merge a batch's results into the usual results/failedUrls summary."""
+        with self._lock:
+            results = []
+            failed_urls = []
+            total = 0
+            for row in self.conn.execute(
+                "SELECT url, status, result FROM tasks WHERE batch_id = ? ORDER BY idx", (batch_id,)
+            ):
+                total += 1
+                if row["status"] == "done":
+                    results.append(json.loads(row["result"]))
+                elif row["status"] == "failed":
+                    failed_urls.append(row["url"])
+
+            return {
+                "results": results,
+                "totalUrls": total,
+                "successfulScrapes": len(results),
+                "failedScrapes": len(failed_urls),
+                "failedUrls": failed_urls,
+                "remaining": total - len(results) - len(failed_urls),
+            }
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+from utils.config_manager import CONFIG_DIR
+
+# Saved Amazon sessions (cookies + localStorage) per delivery ZIP code
+SESSION_DIR = os.environ.get("AMAZON_SESSION_DIR", os.path.join(CONFIG_DIR, "amazon_sessions"))
+SESSION_TTL_SECONDS = int(os.environ.get("AMAZON_SESSION_TTL", str(6 * 60 * 60)))
+
+_memory_cache: Dict[str, dict] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _session_file(zip_code: str) -> str:
+    safe_zip = "".join(c for c in zip_code if c.isalnum())
+    return os.path.join(SESSION_DIR, f"{safe_zip}.json")
+
+
+def _is_fresh(entry: dict) -> bool:
+    return time.time() - entry.get("savedAt", 0) < SESSION_TTL_SECONDS
+
+
+def load_zip_session(zip_code: str) -> Optional[dict]:
+    """
+    Return the saved Playwright storage state for `zip_code`, or None if
+    there is none or it has expired. Disk is only read on a memory miss.
+    """
+    entry = _memory_cache.get(zip_code)
+    if entry is None:
+        path = _session_file(zip_code)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _memory_cache[zip_code] = entry
+
+    if not _is_fresh(entry):
+        invalidate_zip_session(zip_code)
+        return None
+    return entry["storageState"]
+
+
+def save_zip_session(zip_code: str, storage_state: dict):
+    """Cache a storage state for `zip_code` in memory and on disk."""
+    entry = {"zipCode": zip_code, "savedAt": time.time(), "storageState": storage_state}
+    _memory_cache[zip_code] = entry
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    with open(_session_file(zip_code), "w") as f:
+        json.dump(entry, f)
+
+
+def invalidate_zip_session(zip_code: str):
+    """Forget the saved session for `zip_code`."""
+    _memory_cache.pop(zip_code, None)
+    try:
+        os.remove(_session_file(zip_code))
+    except OSError:
+        pass
+
+
+def get_zip_lock(zip_code: str) -> asyncio.Lock:
+    """Lock held while a ZIP's session is being created, so it happens once."""
+    lock = _locks.get(zip_code)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[zip_code] = lock
+    return lock
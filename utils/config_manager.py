@@ -1,12 +1,20 @@
 import os
 import json
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import sys
+import threading
 
 # ✅ Persistent config folder inside user's home directory
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".ebay_scraper")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
 
+# No dialogs on servers: set SCRAPER_NO_GUI=1, or run on Linux without a display
+NO_GUI = os.environ.get("SCRAPER_NO_GUI", "").lower() in ("1", "true", "yes") or (
+    sys.platform.startswith("linux") and not os.environ.get("DISPLAY")
+)
+
+_config = None
+_config_lock = threading.Lock()
+
 
 def ensure_config_dir():
     """Ensure config directory exists."""
@@ -15,60 +23,37 @@ def ensure_config_dir():
 
 
 def load_config():
-    """Load existing configuration from persistent config file, if available."""
-    ensure_config_dir()
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-
-def save_config(config):
-    """Save configuration dictionary to persistent file."""
-    ensure_config_dir()
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-
-
-def setup_chromium_path():
     """
-    Open a window to let the user select the Chromium executable.
-    Saves the selected path into config.json (in ~/.ebay_scraper).
+    Return the configuration, reading config.json only the first time.
+    Callers get a copy; use save_config() to change it.
     """
-    root = tk.Tk()
-    root.withdraw()
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = {}
+            if os.path.exists(CONFIG_FILE):
+                try:
+                    with open(CONFIG_FILE, "r") as f:
+                        _config = json.load(f)
+                except (OSError, ValueError) as e:
+                    # Imported here: the scraper package imports this module
+                    from scraper.logs import get_logger
+                    get_logger(__name__).warning("Could not read config file", path=CONFIG_FILE, error=str(e))
+        return dict(_config)
 
-    messagebox.showinfo(
-        "Setup",
-        "Please select the Chromium executable file (chrome.exe or chromium.exe)."
-    )
 
-    chromium_path = filedialog.askopenfilename(
-        title="Select Chromium executable",
-        filetypes=[("Executable files", "*.exe"), ("All files", "*.*")]
-    )
+def save_config(config):
+    """Replace the configuration in memory and in the persistent file."""
+    global _config
+    with _config_lock:
+        _config = dict(config)
+        ensure_config_dir()
+        with open(CONFIG_FILE, "w") as f:
+            json.dump(_config, f, indent=4)
 
-    if not chromium_path:
-        messagebox.showwarning("Setup Cancelled", "No file selected. Setup aborted.")
-        return None
 
+def update_config(**values):
+    """Set some keys and keep the rest of the saved configuration."""
     config = load_config()
-    config["chromium_path"] = chromium_path
+    config.update(values)
     save_config(config)
-
-    messagebox.showinfo("Setup Complete", f"Chromium path saved:\n{chromium_path}")
-    return chromium_path
-
-
-def get_chromium_path():
-    """
-    Retrieve Chromium path from config.
-    If not found or invalid, trigger setup window.
-    """
-    config = load_config()
-    path = config.get("chromium_path")
-
-    if not path or not os.path.exists(path):
-        return setup_chromium_path()
-
-    return path
@@ -0,0 +1,70 @@
+import asyncio
+import queue
+import threading
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def get_background_loop():
+    """
+    Return the long-lived event loop that owns the scraping resources.
+
+    Playwright objects are bound to the loop that created them, so the
+    browser pool and every scrape must run on this same loop. The loop is
+    started in a daemon thread on first use.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="scraper-loop", daemon=True)
+            _thread.start()
+    return _loop
+
+
+def run_coroutine(coro, timeout=None):
+    """Run a coroutine on the background loop and block until it finishes."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    return future.result(timeout)
+
+
+def submit_coroutine(coro):
+    """Schedule a coroutine on the background loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+
+
+def iterate_async(async_iterable):
+    """
+    Consume an async iterator on the background loop from a normal thread.
+
+    Items are handed over through a queue as soon as they are produced.
+    Closing the returned generator early (e.g. the HTTP client went away)
+    cancels the async side.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in async_iterable:
+                items.put_nowait(item)
+        except Exception as e:
+            items.put_nowait(e)
+        finally:
+            if hasattr(async_iterable, "aclose"):
+                await async_iterable.aclose()
+            items.put_nowait(done)
+
+    future = submit_coroutine(pump())
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
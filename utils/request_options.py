@@ -0,0 +1,226 @@
+"""
+Request body parsing shared by the Flask app (app.py) and the ASGI app
+(asgi_app.py), so both accept exactly the same options. The parse_*
+helpers return plain values plus an error message (None when the request
+is fine); each app turns the message into its 400 response.
+"""
+
+SITES = ("ebay", "amazon")
+UPLOAD_FORMATS = ("csv", "jsonl")
+
+# Numeric body options: (type, minimum, maximum). Left out or null means the site default.
+OPTION_RANGES = {
+    "concurrency": (int, 1, 64),
+    "requestsPerSecond": (float, 0.01, 100),
+    "burst": (int, 1, 100),
+    "minDelay": (float, 0, 60),
+    "maxRetries": (int, 0, 10),
+    "maxPages": (int, 1, 1000),
+    "zipConcurrency": (int, 1, 64),
+    "chunkSize": (int, 1, 100000),
+}
+FLAG_OPTIONS = ("fastPath", "useCache", "timings")
+# Watch list intervals, in seconds (up to 30 days)
+WATCH_OPTION_RANGES = {
+    "minInterval": (float, 1, 30 * 24 * 3600),
+    "maxInterval": (float, 1, 30 * 24 * 3600),
+}
+
+
+def _check_ranges(data, ranges):
+    for key, (kind, low, high) in ranges.items():
+        value = data.get(key)
+        if value is None:
+            continue
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if valid and kind is int:
+            valid = float(value).is_integer()
+        if not valid or not low <= value <= high:
+            kind_name = "an integer" if kind is int else "a number"
+            return f"{key} must be {kind_name} between {low} and {high}"
+    return None
+
+
+def check_batch_options(data):
+    """Return an error message for the first out-of-range or mistyped option in a request body, else None."""
+    for key in FLAG_OPTIONS:
+        if data.get(key) is not None and not isinstance(data[key], bool):
+            return f"{key} must be true or false"
+    detail_fields = data.get("detailFields")
+    if detail_fields is not None and not isinstance(detail_fields, str) and not _is_string_list(detail_fields):
+        return "detailFields must be a string or a list of strings"
+    return _check_ranges(data, OPTION_RANGES)
+
+
+def check_watch_options(data):
+    """Return an error message for bad 'minInterval'/'maxInterval' values in a /watch body, else None."""
+    message = _check_ranges(data, WATCH_OPTION_RANGES)
+    if message:
+        return message
+    if data.get("minInterval") is not None and data.get("maxInterval") is not None:
+        if data["minInterval"] > data["maxInterval"]:
+            return "minInterval must not be greater than maxInterval"
+    return None
+
+
+def query_limit(args, default: int, maximum: int) -> int:
+    """The 'limit' query param, clamped to 1..maximum."""
+    return max(1, min(args.get("limit", default=default, type=int), maximum))
+
+
+def _is_string_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def parse_request_urls(data):
+    """Return (urls, error_message) for a scrape request body, its batch options checked too."""
+    if not isinstance(data, dict) or "urls" not in data:
+        return None, "No URLs provided"
+    if not _is_string_list(data["urls"]):
+        return None, "urls must be a list of strings"
+
+    urls = [u.strip() for u in data["urls"] if u.strip()]
+    if not urls:
+        return None, "URL list is empty"
+    message = check_batch_options(data)
+    if message:
+        return None, message
+    return urls, None
+
+
+def get_batch_options(data):
+    """Read optional per-call batch options (fast path, scheduler limits) from a request body."""
+    return {
+        "fast_path": bool(data.get("fastPath", False)),
+        "use_cache": bool(data.get("useCache", True)),
+        "concurrency": data.get("concurrency"),
+        "requests_per_second": data.get("requestsPerSecond"),
+        "burst": data.get("burst"),
+        "min_delay": data.get("minDelay"),
+        "max_retries": data.get("maxRetries"),
+        "include_timings": bool(data.get("timings", False)),
+    }
+
+
+def get_listing_options(data):
+    """Batch options plus the listing-only 'maxPages' and 'detailFields' (checked by parse_request_urls)."""
+    options = get_batch_options(data)
+    if data.get("maxPages"):
+        options["max_pages"] = int(data["maxPages"])
+    detail_fields = data.get("detailFields")
+    if isinstance(detail_fields, str):
+        detail_fields = [detail_fields]
+    options["detail_fields"] = detail_fields or None
+    return options
+
+
+def parse_matrix_request(data):
+    """Return (items, zip_codes, error_message) for an ASIN x ZIP matrix request body."""
+    if not isinstance(data, dict):
+        return None, None, "No ASINs provided"
+    for key in ("asins", "urls", "zipCodes"):
+        if data.get(key) is not None and not _is_string_list(data[key]):
+            return None, None, f"{key} must be a list of strings"
+    items = [item.strip() for item in data.get("asins") or data.get("urls") or [] if item.strip()]
+    if not items:
+        return None, None, "No ASINs provided"
+    zip_codes = [z.strip() for z in data.get("zipCodes") or [] if z.strip()]
+    if not zip_codes:
+        return None, None, "No zipCodes provided"
+    message = check_batch_options(data)
+    if message:
+        return None, None, message
+    return items, zip_codes, None
+
+
+def get_job_options(site, data):
+    """Batch options plus the Amazon 'zipCode', for job_manager and the watch list."""
+    options = get_batch_options(data)
+    if site == "amazon" and data.get("zipCode"):
+        options["zip_code"] = str(data["zipCode"])
+    return options
+
+
+def parse_job_request(data):
+    """Return (site, urls, options, error_message) for a POST /jobs body."""
+    urls, message = parse_request_urls(data)
+    if message:
+        return None, None, None, message
+    site = data.get("site")
+    if site not in SITES:
+        return None, None, None, "site must be 'ebay' or 'amazon'"
+    return site, urls, get_job_options(site, data), None
+
+
+def parse_upload_request(data):
+    """
+    Return (site, fmt, options, error_message) for the /upload form fields
+    (see form_to_options). `options` are job_manager.submit_file's keyword
+    arguments, 'chunkSize' and 'column' included when given.
+    """
+    site = data.get("site")
+    if site not in SITES:
+        return None, None, None, "site must be 'ebay' or 'amazon'"
+    fmt = data.get("format", "csv")
+    if fmt not in UPLOAD_FORMATS:
+        return None, None, None, "format must be 'csv' or 'jsonl'"
+    message = check_batch_options(data)
+    if message:
+        return None, None, None, message
+    options = get_job_options(site, data)
+    if data.get("chunkSize"):
+        options["chunk_size"] = int(data["chunkSize"])
+    if data.get("column") is not None:
+        options["column"] = str(data["column"])
+    return site, fmt, options, None
+
+
+def parse_watch_request(data):
+    """Return (site, urls, error_message) for a POST /watch body."""
+    urls, message = parse_request_urls(data)
+    if message:
+        return None, None, message
+    site = data.get("site")
+    if site not in SITES:
+        return None, None, "site must be 'ebay' or 'amazon'"
+    message = check_watch_options(data)
+    if message:
+        return None, None, message
+    return site, urls, None
+
+
+def parse_watch_budget(data):
+    """Return (budget_per_hour, error_message) for a POST /watch/monitor body."""
+    budget = (data or {}).get("budgetPerHour")
+    if not isinstance(budget, (int, float)) or isinstance(budget, bool) or budget < 0:
+        return None, "budgetPerHour must be a number >= 0"
+    return budget, None
+
+
+def get_matrix_options(data):
+    """Batch options plus the matrix-only 'zipConcurrency'."""
+    options = get_batch_options(data)
+    if data.get("zipConcurrency"):
+        options["zip_concurrency"] = int(data["zipConcurrency"])
+    return options
+
+
+def form_to_options(form) -> dict:
+    """
+    Turn multipart form fields into the JSON-style values get_batch_options
+    expects: "true"/"false" for FLAG_OPTIONS, numbers for OPTION_RANGES.
+    Everything else (zipCode, column, ...) stays a string, leading zeros and all.
+    """
+    data = {}
+    for key, value in form.items():
+        lowered = value.strip().lower()
+        if key in FLAG_OPTIONS and lowered in ("true", "false"):
+            data[key] = lowered == "true"
+        elif key in OPTION_RANGES:
+            try:
+                data[key] = int(value) if value.strip().isdigit() else float(value)
+            except ValueError:
+                data[key] = value  # check_batch_options rejects it
+        else:
+            data[key] = value
+    return data
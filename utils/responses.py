@@ -0,0 +1,121 @@
+"""
+Response bodies shared by the Flask app (app.py) and the ASGI app
+(asgi_app.py), so both answer with exactly the same JSON. Each helper
+returns a plain dict for the app to jsonify; the ones that read SQLite
+(history, watch list) are synchronous, so the ASGI app runs them in a
+thread.
+"""
+
+import os
+from scraper.logs import log_stats, recent_logs
+from scraper.result_store import result_store
+from scraper.watchlist import item_to_dict, watch_list, watch_monitor
+from utils.request_options import query_limit
+
+
+def error_body(message: str) -> dict:
+    return {"status": "error", "message": message}
+
+
+def logs_body(args) -> dict:
+    """GET /logs: query params level, correlationId, limit (max 2000)."""
+    limit = query_limit(args, 200, 2000)
+    return {
+        "status": "success",
+        "logging": log_stats(),
+        "logs": recent_logs(args.get("correlationId"), args.get("level"), limit),
+    }
+
+
+def job_body(job) -> dict:
+    return {"status": "success", "job": job.progress()}
+
+
+def upload_body(job) -> dict:
+    return {**job_body(job), "downloadUrl": f"/jobs/{job.id}/download"}
+
+
+def job_results_body(job, args) -> dict:
+    offset = args.get("offset", default=0, type=int)
+    return {**job_body(job), "data": job.summary(offset)}
+
+
+def job_logs_body(job_id: str, args) -> dict:
+    limit = query_limit(args, 200, 2000)
+    return {"status": "success", "logs": recent_logs(job_id, args.get("level"), limit)}
+
+
+def download_info(job):
+    """
+    Return (size, mimetype, headers) for an /upload job's results file as
+    it is right now (it keeps growing while the job runs), or None if
+    there are no results yet.
+    """
+    if not os.path.exists(job.output_path):
+        return None
+    size = os.path.getsize(job.output_path)
+    headers = {
+        "Content-Disposition": f"attachment; filename={job.site}_results.{job.format}",
+        "Content-Length": str(size),
+        "Cache-Control": "no-store",
+    }
+    return size, "text/csv" if job.format == "csv" else "application/x-ndjson", headers
+
+
+def latest_snapshots_body(args) -> dict:
+    """GET /history/latest: query params site, zipCode, limit (max 1000), offset."""
+    items = result_store.latest(
+        site=args.get("site"),
+        zip_code=args.get("zipCode"),
+        limit=query_limit(args, 100, 1000),
+        offset=args.get("offset", default=0, type=int),
+    )
+    return {"status": "success", "items": items}
+
+
+def item_history_body(site: str, item_id: str, args) -> dict:
+    """GET /history/<site>/<item_id>: query params zipCode, limit (max 5000), includeFailed."""
+    snapshots = result_store.history(
+        site,
+        item_id,
+        zip_code=args.get("zipCode"),
+        limit=query_limit(args, 500, 5000),
+        include_failed=args.get("includeFailed", "false").lower() == "true",
+    )
+    return {"status": "success", "site": site, "itemId": item_id, "snapshots": snapshots}
+
+
+def add_watch_items_body(site: str, urls, data) -> dict:
+    """Watch every URL of a POST /watch body (parsed by parse_watch_request)."""
+    items, rejected = [], []
+    for url in urls:
+        item = watch_list.add(
+            site,
+            url,
+            zip_code=str(data["zipCode"]) if data.get("zipCode") else None,
+            min_interval=data.get("minInterval"),
+            max_interval=data.get("maxInterval"),
+        )
+        if item is None:
+            rejected.append(url)
+        else:
+            items.append(item_to_dict(item))
+    return {"status": "success", "items": items, "rejectedUrls": rejected}
+
+
+def watch_items_body(args) -> dict:
+    """GET /watch: query params site, limit (max 1000), offset."""
+    items = watch_list.items(
+        site=args.get("site"),
+        limit=query_limit(args, 100, 1000),
+        offset=args.get("offset", default=0, type=int),
+    )
+    return {
+        "status": "success",
+        "monitor": watch_monitor.status(),
+        "items": [item_to_dict(item) for item in items],
+    }
+
+
+def watch_monitor_body() -> dict:
+    return {"status": "success", "monitor": watch_monitor.status()}
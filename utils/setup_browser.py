@@ -1,59 +1,114 @@
 import os
-from tkinter import Tk, filedialog, messagebox
-from .config_manager import load_config, save_config
 import glob
+import sys
+import threading
+from .config_manager import NO_GUI, load_config, update_config
+
+_chromium_path = None
+_resolved = False
+_resolve_lock = threading.Lock()
+
+
+def _playwright_browser_dirs():
+    """Where Playwright keeps its downloaded browsers on this platform."""
+    custom = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if custom and custom != "0":
+        yield custom
+    if sys.platform.startswith("win"):
+        local_app_data = os.getenv("LOCALAPPDATA") or os.path.join(os.getenv("USERPROFILE") or "", "AppData", "Local")
+        yield os.path.join(local_app_data, "ms-playwright")
+    elif sys.platform == "darwin":
+        yield os.path.expanduser("~/Library/Caches/ms-playwright")
+    else:
+        yield os.path.expanduser("~/.cache/ms-playwright")
+
+
+_CHROMIUM_BINARIES = [
+    os.path.join("chrome-win", "chrome.exe"),
+    os.path.join("chrome-linux", "chrome"),
+    os.path.join("chrome-mac", "Chromium.app", "Contents", "MacOS", "Chromium"),
+]
+
 
 def find_playwright_chromium():
     """
     Try to automatically find the Chromium binary installed by Playwright.
     """
-    base_path = os.path.join(os.getenv("USERPROFILE") or "", "AppData", "Local", "ms-playwright")
-    if not os.path.exists(base_path):
-        return None
-
-    # Search for chrome.exe inside ms-playwright folders
-    pattern = os.path.join(base_path, "chromium-*", "chrome-win", "chrome.exe")
-    matches = glob.glob(pattern)
-    if matches:
-        return matches[0]
+    for base_path in _playwright_browser_dirs():
+        if not os.path.exists(base_path):
+            continue
+        # Newest chromium-<revision> folder first
+        for folder in sorted(glob.glob(os.path.join(base_path, "chromium-*")), reverse=True):
+            for binary in _CHROMIUM_BINARIES:
+                path = os.path.join(folder, binary)
+                if os.path.exists(path):
+                    return path
     return None
 
 
+def prompt_for_chromium_path():
+    """Ask the user to pick the Chromium executable (desktop use only)."""
+    # Imported here so servers and the frozen app's startup never load tkinter
+    from tkinter import Tk, filedialog, messagebox
+
+    root = Tk()
+    root.withdraw()  # hide main window
+    try:
+        messagebox.showinfo("Chromium Setup", "Please select your Chromium or Chrome executable file.")
+        chromium_path = filedialog.askopenfilename(
+            title="Select Chromium/Chrome Executable",
+            filetypes=[("Executable files", "*.exe"), ("All files", "*.*")]
+        )
+        if not chromium_path:
+            messagebox.showerror("Error", "No Chromium path selected. Exiting.")
+            raise FileNotFoundError("Chromium executable not selected")
+        messagebox.showinfo("Saved", f"Chromium path saved: {chromium_path}")
+        return chromium_path
+    finally:
+        root.destroy()
+
+
 def get_chromium_path():
     """
-    Ensures a valid Chromium path exists.  
-    - Checks config.json first  
-    - Tries auto-detect  
-    - Prompts user if not found
+    Resolve the Chromium executable once per process and cache it:
+    - CHROMIUM_PATH environment variable
+    - chromium_path saved in config.json
+    - auto-detected Playwright Chromium (saved for next time)
+    - a file dialog, unless running without a GUI (NO_GUI) or off the
+      main thread (tkinter needs the main thread)
+
+    Without a dialog and with nothing found, returns None so Playwright
+    falls back to its own bundled browser.
     """
-    config = load_config()
-    chromium_path = config.get("chromium_path")
+    global _chromium_path, _resolved
+    if _resolved:
+        return _chromium_path
 
-    # If path is saved and valid
-    if chromium_path and os.path.exists(chromium_path):
-        return chromium_path
+    with _resolve_lock:
+        if _resolved:
+            return _chromium_path
+
+        # Imported here: the scraper package imports this module
+        from scraper.logs import get_logger
+        log = get_logger(__name__)
+
+        chromium_path = os.environ.get("CHROMIUM_PATH")
+        if not chromium_path or not os.path.exists(chromium_path):
+            chromium_path = load_config().get("chromium_path")
+
+        if not chromium_path or not os.path.exists(chromium_path):
+            chromium_path = find_playwright_chromium()
+            if chromium_path:
+                update_config(chromium_path=chromium_path)
+                log.info("Found Playwright Chromium", path=chromium_path)
+
+        if not chromium_path:
+            if NO_GUI or threading.current_thread() is not threading.main_thread():
+                log.warning("No Chromium path configured; using Playwright's bundled browser")
+            else:
+                chromium_path = prompt_for_chromium_path()
+                update_config(chromium_path=chromium_path)
 
-    # Try auto-detecting Playwright Chromium
-    auto_path = find_playwright_chromium()
-    if auto_path:
-        save_config({"chromium_path": auto_path})
-        print(f"✅ Found Playwright Chromium at: {auto_path}")
-        return auto_path
-
-    # Ask user manually if not found
-    Tk().withdraw()  # hide main window
-    messagebox.showinfo("Chromium Setup", "Please select your Chromium or Chrome executable file.")
-    chromium_path = filedialog.askopenfilename(
-        title="Select Chromium/Chrome Executable",
-        filetypes=[("Executable files", "*.exe"), ("All files", "*.*")]
-    )
-
-    if not chromium_path:
-        messagebox.showerror("Error", "No Chromium path selected. Exiting.")
-        raise FileNotFoundError("Chromium executable not selected")
-
-    # Save for future use
-    save_config({"chromium_path": chromium_path})
-    messagebox.showinfo("Saved", f"Chromium path saved: {chromium_path}")
-
-    return chromium_path
+        _chromium_path = chromium_path
+        _resolved = True
+        return _chromium_path
@@ -0,0 +1,161 @@
+"""
+Worker mode: scrape very large URL lists with several processes on one
+host pulling from a shared SQLite queue (see scraper/work_queue.py for
+why not across machines). Each process runs its own event loop and
+browser pool.
+
+    python worker.py enqueue --site ebay --file urls.txt
+    python worker.py work --processes 4
+    python worker.py status --batch 1
+    python worker.py results --batch 1 --output results.json
+
+Rate limits in SITE_LIMITS apply per process, so lower
+--requests-per-second when running many workers against one site.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import uuid
+from itertools import groupby
+from scraper import stream_amazon_from_csv, stream_ebay_from_csv
+from scraper.browser_pool import shutdown_browser_pool
+from scraper.logs import correlation_id, get_logger
+from scraper.work_queue import DEFAULT_LEASE_SECONDS, QUEUE_DB, WorkQueue
+
+STREAMS = {"ebay": stream_ebay_from_csv, "amazon": stream_amazon_from_csv}
+
+log = get_logger(__name__)
+
+
+def read_urls(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def run_worker(queue_path: str, worker_id: str, chunk_size: int, lease_seconds: float, exit_when_idle: bool):
+    queue = WorkQueue(queue_path)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            await asyncio.to_thread(queue.renew_leases, worker_id, lease_seconds)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    log.info("Worker started", worker=worker_id)
+    try:
+        while True:
+            tasks = await asyncio.to_thread(queue.lease, worker_id, chunk_size, lease_seconds)
+            if not tasks:
+                if exit_when_idle:
+                    break
+                await asyncio.sleep(2)
+                continue
+
+            for _, group in groupby(tasks, key=lambda t: t["batchId"]):
+                group = list(group)
+                site = group[0]["site"]
+                options = group[0]["options"]
+                urls = [t["url"] for t in group]
+                correlation_id.set(str(group[0]["batchId"]))
+                async for event in STREAMS[site](urls, **options):
+                    if event["type"] != "result":
+                        continue
+                    task = group[event["index"]]
+                    await asyncio.to_thread(queue.complete, task["id"], worker_id, event)
+    finally:
+        heartbeat_task.cancel()
+        queue.release(worker_id)
+        queue.close()
+        await shutdown_browser_pool()
+        log.info("Worker stopped", worker=worker_id)
+
+
+def worker_process(queue_path: str, chunk_size: int, lease_seconds: float, exit_when_idle: bool):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    try:
+        asyncio.run(run_worker(queue_path, worker_id, chunk_size, lease_seconds, exit_when_idle))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queue-based multi-process scraping.")
+    parser.add_argument("--queue", default=QUEUE_DB, help="path of the shared queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add a URL list to the queue")
+    enqueue.add_argument("--site", choices=sorted(STREAMS), required=True)
+    enqueue.add_argument("--file", required=True, help="text file with one URL per line")
+    enqueue.add_argument("--zip", dest="zip_code", help="Amazon delivery ZIP code")
+    enqueue.add_argument("--fast-path", action="store_true")
+    enqueue.add_argument("--concurrency", type=int)
+    enqueue.add_argument("--requests-per-second", type=float)
+    enqueue.add_argument("--max-retries", type=int)
+
+    work = commands.add_parser("work", help="run worker processes")
+    work.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    work.add_argument("--chunk-size", type=int, default=20, help="URLs leased per round")
+    work.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    work.add_argument("--exit-when-idle", action="store_true", help="stop once the queue is empty")
+
+    status = commands.add_parser("status", help="show queue progress")
+    status.add_argument("--batch", type=int)
+
+    results = commands.add_parser("results", help="print or save a batch summary")
+    results.add_argument("--batch", type=int, required=True)
+    results.add_argument("--output", help="write JSON here instead of stdout")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "enqueue":
+        options = {"fast_path": args.fast_path}
+        if args.zip_code and args.site == "amazon":
+            options["zip_code"] = args.zip_code
+        if args.concurrency:
+            options["concurrency"] = args.concurrency
+        if args.requests_per_second:
+            options["requests_per_second"] = args.requests_per_second
+        if args.max_retries is not None:
+            options["max_retries"] = args.max_retries
+        urls = read_urls(args.file)
+        batch_id = WorkQueue(args.queue).enqueue(args.site, urls, options)
+        log.info("Queued URLs", urls=len(urls), batch=batch_id)
+
+    elif args.command == "work":
+        processes = [
+            multiprocessing.Process(
+                target=worker_process,
+                args=(args.queue, args.chunk_size, args.lease_seconds, args.exit_when_idle),
+            )
+            for _ in range(max(1, args.processes))
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
+
+    elif args.command == "status":
+        print(json.dumps(WorkQueue(args.queue).counts(args.batch), indent=2))
+
+    elif args.command == "results":
+        summary = WorkQueue(args.queue).summary(args.batch)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            log.info("Wrote results", results=summary["successfulScrapes"], path=args.output)
+        else:
+            json.dump(summary, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()